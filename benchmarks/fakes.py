@@ -0,0 +1,162 @@
+"""
+Generated stand-ins for the services called by the collection: Kraken API and the currencies page of investing.com.
+
+They are used by the benchmarks and by the tests.
+"""
+
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from modules.models.config import Currency
+
+END_TMSP = 1672531200  # 2023-01-01
+
+ROW_TEMPLATE = (
+    '<tr i="{i}">'
+    '<td class="flag"><span class="ceFlags" title=""></span></td>'
+    '<td class="left noWrap elp symb js-currency-symbol" title="{symbol}">{symbol}</td>'
+    '<td class="left bold elp name cryptoName first js-currency-name" title="{name}">'
+    '<a href="/crypto/{slug}">{name}</a></td>'
+    '<td class="price js-currency-price"><a href="/crypto/{slug}">{price:.2f}</a></td>'
+    '<td class="js-market-cap" data-value="{cap}">${cap}</td>'
+    '<td class="js-24h-volume">${volume}</td>'
+    '<td class="js-currency-change-24h greenFont">+{change:.2f}%</td>'
+    '</tr>'
+)
+
+
+def generate_asset_pairs(nbr_of_pairs: int) -> Dict[str, Dict[str, str]]:
+    """
+    Generate an `AssetPairs` payload, currencies alternate between the common ones.
+
+    :param nbr_of_pairs: number of asset pairs
+    :return: asset pairs, ex. {'XA0001ZEUR': {'wsname': 'A0001/EUR', ...}}
+    """
+    currencies = [currency.value for currency in Currency]
+    asset_pairs = {}
+    for i in range(nbr_of_pairs):
+        asset, currency = f'A{i // len(currencies):04d}', currencies[i % len(currencies)]
+        asset_pairs[f'X{asset}Z{currency}'] = {
+            'altname': f'{asset}{currency}',
+            'wsname': f'{asset}/{currency}',
+            'base': f'X{asset}',
+            'quote': f'Z{currency}'
+        }
+    return asset_pairs
+
+
+def generate_candles(
+        nbr_of_candles: int,
+        interval_in_minutes: int,
+        end_tmsp: int = END_TMSP,
+        seed: int = 0
+) -> List[List]:
+    """
+    Generate OHLC candles as returned by Kraken (prices and volumes as strings), prices follow a random walk.
+
+    :param nbr_of_candles: number of candles
+    :param interval_in_minutes: interval between candles
+    :param end_tmsp: timestamp of the last candle
+    :param seed: seed of the random walk
+    :return: candles [time, open, high, low, close, vwap, volume, count], sorted by time
+    """
+    rng = np.random.default_rng(seed)
+    tmsp = end_tmsp - interval_in_minutes * 60 * np.arange(nbr_of_candles)[::-1]
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, nbr_of_candles)))
+    open_ = np.concatenate([[100.], close[:-1]])
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, nbr_of_candles))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, nbr_of_candles))
+    vwap = (high + low) / 2
+    volume = rng.uniform(0, 1000, nbr_of_candles)
+    count = rng.integers(1, 500, nbr_of_candles)
+    prices = [np.char.mod('%.6f', values).tolist() for values in (open_, high, low, close, vwap)]
+    volumes = np.char.mod('%.8f', volume).tolist()
+    return [list(candle) for candle in zip(tmsp.tolist(), *prices, volumes, count.tolist())]
+
+
+class FakeKrakenClient:
+    """
+    Local stand-in for `krakenex.API`, serving `AssetPairs` and paged `OHLC` payloads.
+
+    Each call waits for the configured latency, like a network round trip.
+    """
+
+    def __init__(
+            self,
+            nbr_of_pairs: int,
+            nbr_of_candles: int,
+            interval_in_minutes: int = 1440,
+            latency_in_seconds: float = 0.,
+            page_size: int = 720
+    ):
+        self.interval_in_minutes = interval_in_minutes
+        self.latency_in_seconds = latency_in_seconds
+        self.page_size = page_size
+        self.asset_pairs = generate_asset_pairs(nbr_of_pairs=nbr_of_pairs)
+        self.candles = {
+            asset_pair: generate_candles(
+                nbr_of_candles=nbr_of_candles, interval_in_minutes=interval_in_minutes, seed=seed
+            )
+            for seed, asset_pair in enumerate(self.asset_pairs)
+        }
+        self.candle_tmsp = {
+            asset_pair: np.array([candle[0] for candle in candles], dtype=np.int64)
+            for asset_pair, candles in self.candles.items()
+        }
+
+    def query_public(self, method: str, data: Optional[Dict] = None) -> Dict:
+        """
+        Answer a public query, as Kraken would.
+
+        :param method: 'AssetPairs' or 'OHLC'
+        :param data: query parameters ('pair', 'interval', 'since' for OHLC)
+        :return: payload
+        """
+        time.sleep(self.latency_in_seconds)
+        if method == 'AssetPairs':
+            return {'error': [], 'result': self.asset_pairs}
+        if method == 'OHLC':
+            asset_pair = data['pair']
+            if asset_pair not in self.candles:
+                return {'error': ['EQuery:Unknown asset pair'], 'result': {}}
+            first = int(self.candle_tmsp[asset_pair].searchsorted(int(data.get('since', 0)), side='left'))
+            page = self.candles[asset_pair][first:first + self.page_size]
+            return {
+                'error': [],
+                'result': {asset_pair: page, 'last': page[-1][0] if page else int(data.get('since', 0))}
+            }
+        return {'error': [f'EGeneral:Unknown method {method}'], 'result': {}}
+
+
+def generate_currencies_page(nbr_of_currencies: int, nbr_of_other_elements: int = 2000) -> str:
+    """
+    Generate a page with a table of currencies, surrounded by other markup (navigation, scripts, etc.).
+
+    :param nbr_of_currencies: number of rows of the currency table
+    :param nbr_of_other_elements: number of elements outside of the table
+    :return: html source code
+    """
+    header = (
+        '<tr><th class="flag"></th><th>Symbol</th><th>Name</th><th>Price (USD)</th>'
+        '<th>Market Cap</th><th>Vol (24H)</th><th>Chg (24H)</th></tr>'
+    )
+    rows = ''.join(
+        ROW_TEMPLATE.format(
+            i=i, symbol=f'C{i:04d}', name=f'Currency {i}', slug=f'currency-{i}',
+            price=1.5 * (i + 1), cap=10 ** 6 * (i + 1), volume=10 ** 4 * (i + 1), change=i % 10 / 3
+        )
+        for i in range(nbr_of_currencies)
+    )
+    navigation = ''.join(
+        f'<li class="navItem"><a href="/section-{i}" class="navLink">Section {i}</a><span class="arrow"></span></li>'
+        for i in range(nbr_of_other_elements)
+    )
+    return (
+        '<!DOCTYPE html><html><head><title>Cryptocurrencies</title>'
+        '<script>var page = {"name": "currencies"};</script></head>'
+        f'<body><nav><ul>{navigation}</ul></nav>'
+        f'<div id="fullColumn"><table class="genTbl openTbl js-all-crypto-table">{header}{rows}</table></div>'
+        '<footer><p>Risk disclosure</p></footer></body></html>'
+    )
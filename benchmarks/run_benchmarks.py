@@ -0,0 +1,235 @@
+"""
+Benchmarks of the collection and app data paths, against a local stand-in for Kraken API.
+
+Results are written as json, so that they can be compared across commits:
+python -m benchmarks.run_benchmarks --scales 10x720 50x2000 --output results.json --compare previous.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from benchmarks.fakes import FakeKrakenClient, generate_currencies_page
+from modules.assets_mapping.update_assets_mapping import AssetMappingUpdater
+from modules.models.collect_data import KrakenDataCollector
+from modules.models.config import OHLC_DATA
+from modules.models.utils import (build_df_from_schema_and_data,
+                                  compute_max_for_given_filter, read_csv_as_df)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'modules', 'app'))
+from comparison import (build_price_matrix, correlation_matrix,  # noqa: E402
+                        normalized_performance, rolling_correlation)
+from data_model import MarketDataModel  # noqa: E402
+from downsampling import downsample  # noqa: E402
+from settings import MAX_CHART_POINTS  # noqa: E402
+from view import CryptolutionView  # noqa: E402
+
+logger = logging.getLogger('benchmarks')
+logging.basicConfig(level=logging.INFO)
+logging.getLogger('collect data').setLevel(logging.WARNING)
+
+DEFAULT_SCALES = ['10x720', '50x2000', '200x5000']
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """
+    Measure the duration and the peak memory of a function.
+
+    Durations are measured without tracing memory, the peak memory is measured on an extra run.
+
+    :param func: function to measure, without arguments
+    :param repeat: number of timed runs
+    :return: best and mean durations (in seconds), peak memory allocated (in MB)
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'best_s': min(durations),
+        'mean_s': statistics.mean(durations),
+        'peak_memory_mb': peak / 2 ** 20
+    }
+
+
+def build_collector(client: FakeKrakenClient) -> KrakenDataCollector:
+    """
+    Build a collector on top of the fake client, calls are not throttled.
+
+    :param client: fake Kraken client
+    :return: the collector, with asset pairs cleaned
+    """
+    collector = KrakenDataCollector(
+        collection_settings={'query_period_in_minutes': str(client.interval_in_minutes)},
+        kraken_client=client,
+        client_settings={'calls_per_second': 1e9, 'burst': 1e9}
+    )
+    collector.clean_assets(collector.get_assets())
+    return collector
+
+
+def run_scale(nbr_of_pairs: int, nbr_of_candles: int, latency_in_seconds: float, repeat: int) -> List[Dict]:
+    """
+    Run all the benchmarks at a given scale.
+
+    :param nbr_of_pairs: number of asset pairs
+    :param nbr_of_candles: number of candles per asset pair
+    :param latency_in_seconds: latency of each call to the fake client
+    :param repeat: number of timed runs of each benchmark
+    :return: results of the benchmarks
+    """
+    client = FakeKrakenClient(
+        nbr_of_pairs=nbr_of_pairs, nbr_of_candles=nbr_of_candles, latency_in_seconds=latency_in_seconds
+    )
+    empty_df = pd.DataFrame(columns=OHLC_DATA['schema'])
+    data_df = build_collector(client=client).get_differential_ohlc_data(existing_data_df=empty_df)
+    first_asset_pair = str(data_df['asset_pair'].iloc[0])
+    data_model = MarketDataModel(data=data_df)
+    view = CryptolutionView(
+        title='benchmark',
+        data_summary=None,
+        data_model_loader=lambda granularity: data_model if granularity is None else None,
+        pairs={},
+        asset_name_mapping={}
+    )
+
+    def filter_explorer_data() -> None:
+        for asset, currency in data_model.slices:
+            downsample(
+                df=view.get_explorer_data(asset=asset, currency=currency),
+                x_field='tmsp',
+                y_field='close_price',
+                max_points=MAX_CHART_POINTS
+            )
+
+    price_matrix = build_price_matrix(data=data_model.data)
+
+    def compare_asset_pairs() -> None:
+        correlation_matrix(returns=price_matrix.returns)
+        rolling_correlation(returns=price_matrix.returns, reference=0, window=30)
+        normalized_performance(values=price_matrix.values)
+
+    mapping_updater = AssetMappingUpdater(html=generate_currencies_page(nbr_of_currencies=nbr_of_pairs))
+
+    def soupify_whole_page() -> None:
+        mapping_updater.build_mapping(table=BeautifulSoup(mapping_updater.html, 'html.parser').find_all('tr'))
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, 'data.csv')
+        data_df.to_csv(csv_path, index=False, date_format='%Y-%m-%d %H:%M:%S')
+        benchmarks: List[Tuple[str, Callable[[], object]]] = [
+            ('get_differential_ohlc_data', lambda: build_collector(client=client).get_differential_ohlc_data(
+                existing_data_df=empty_df
+            )),
+            ('read_csv_as_df', lambda: read_csv_as_df(path=csv_path, dtypes=OHLC_DATA['dtypes'])),
+            ('compute_max_for_given_filter', lambda: compute_max_for_given_filter(
+                df=data_df, maxed_field='tmsp', filter_field='asset_pair', filter_value=first_asset_pair
+            )),
+            ('build_df_from_schema_and_data', lambda: build_df_from_schema_and_data(
+                schema=OHLC_DATA['schema'], data=[data_df[field].values for field in OHLC_DATA['schema']]
+            )),
+            ('market_data_model', lambda: MarketDataModel(data=data_df)),
+            ('explorer_filtering', filter_explorer_data),
+            ('build_price_matrix', lambda: build_price_matrix(data=data_model.data)),
+            ('compare_asset_pairs', compare_asset_pairs),
+            ('asset_mapping_html_parser', soupify_whole_page),
+            ('asset_mapping_extract', mapping_updater.extract_mapping)
+        ]
+        results = []
+        for name, func in benchmarks:
+            result = {'benchmark': name, 'pairs': nbr_of_pairs, 'candles': nbr_of_candles, 'rows': len(data_df)}
+            result.update(measure(func=func, repeat=repeat))
+            logger.info(
+                f"{time.strftime('%Y-%m-%d %H:%M:%S')} : {name} ({nbr_of_pairs}x{nbr_of_candles}) "
+                f"best {result['best_s']:.4f}s, peak memory {result['peak_memory_mb']:.1f}MB"
+            )
+            results.append(result)
+    return results
+
+
+def get_commit() -> Optional[str]:
+    """
+    Get the current git commit, if any.
+
+    :return: commit hash
+    """
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict, previous_results: Dict) -> List[Dict]:
+    """
+    Compare results with previous ones (ex. from another commit), benchmark by benchmark.
+
+    :param results: results
+    :param previous_results: previous results
+    :return: ratios of best durations and peak memories (current / previous) for the benchmarks in both
+    """
+    previous = {
+        (result['benchmark'], result['pairs'], result['candles']): result for result in previous_results['results']
+    }
+    comparison = []
+    for result in results['results']:
+        key = (result['benchmark'], result['pairs'], result['candles'])
+        if key in previous:
+            comparison.append({
+                'benchmark': result['benchmark'],
+                'pairs': result['pairs'],
+                'candles': result['candles'],
+                'duration_ratio': result['best_s'] / previous[key]['best_s'] if previous[key]['best_s'] else None,
+                'memory_ratio': (
+                    result['peak_memory_mb'] / previous[key]['peak_memory_mb'] if previous[key]['peak_memory_mb'] else None
+                )
+            })
+    return comparison
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the collection and app data paths.')
+    parser.add_argument('--scales', nargs='+', default=DEFAULT_SCALES, help='<pairs>x<candles per pair>')
+    parser.add_argument('--latency', type=float, default=0., help='latency of each Kraken call, in seconds')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs of each benchmark')
+    parser.add_argument('--output', default='benchmark_results.json', help='path of the json results')
+    parser.add_argument('--compare', default=None, help='path of previous json results to compare with')
+    args = parser.parse_args()
+
+    results = {
+        'commit': get_commit(),
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'latency_in_seconds': args.latency,
+        'results': []
+    }
+    for scale in args.scales:
+        nbr_of_pairs, nbr_of_candles = (int(value) for value in scale.split('x'))
+        results['results'] += run_scale(
+            nbr_of_pairs=nbr_of_pairs, nbr_of_candles=nbr_of_candles, latency_in_seconds=args.latency, repeat=args.repeat
+        )
+    if args.compare:
+        with open(args.compare) as previous_file:
+            results['comparison'] = compare(results=results, previous_results=json.load(previous_file))
+    with open(args.output, 'w') as output_file:
+        json.dump(results, output_file, indent=4)
+    logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Results written in {args.output}")
@@ -2,32 +2,122 @@
 Code for streamlit app.
 """
 
+import hashlib
 import json
 from os import getenv
+from typing import Dict, Optional
 
-import pandas as pd
 import streamlit as st
+from comparison import PriceMatrix, build_price_matrix
+from data_model import MarketDataModel
+from indicators import IndicatorCache
 from view import CryptolutionView
 
+from modules.models.config import COLLECTION_SETTINGS, ROLLUP_DATA
+from modules.models.exceptions import NoExistingFile
+from modules.models.local_cache import LocalDatasetCache
+from modules.models.rollups import get_rollup_storage
+from modules.models.storage import get_storage
+from modules.models.utils import read_json
+
 AWS_ACCESS_KEY_ID = getenv('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = getenv('AWS_SECRET_ACCESS_KEY')
+DATA_VERSION_TTL_IN_SECONDS = 300
+LOCAL_CACHE_DIR = getenv('CRYPTOLUTION_CACHE_DIR', '.cache')
 
 st.set_page_config()
 st.title('Cryptolution')
 
 
-@st.cache
-def get_historical_market_data() -> pd.DataFrame:
+@st.cache_data(ttl=DATA_VERSION_TTL_IN_SECONDS)
+def get_data_version() -> str:
+    """
+    Get the version of market data, it changes whenever a collection run adds data.
+
+    It is based on the watermarks written by each collection run, and checked at most every
+    `DATA_VERSION_TTL_IN_SECONDS`.
+
+    :return: data version
+    """
+    try:
+        watermarks = read_json(path=COLLECTION_SETTINGS['watermarks_path'])
+    except NoExistingFile:
+        return ''
+    return hashlib.md5(json.dumps(watermarks, sort_keys=True).encode()).hexdigest()
+
+
+@st.cache_data(ttl=DATA_VERSION_TTL_IN_SECONDS)
+def get_data_summary() -> Optional[Dict]:
     """
-    Get hitorical market data from previous collections.
+    Get the summary of market data written by the last collection run.
+
+    It is checked at most every `DATA_VERSION_TTL_IN_SECONDS`, no market data is read.
+
+    :return: summary of market data, None if no summary has been written yet
+    """
+    try:
+        return read_json(path=COLLECTION_SETTINGS['summary_path'])
+    except NoExistingFile:
+        return None
+
+
+@st.cache_resource(max_entries=len(ROLLUP_DATA['granularities']) + 1)
+def get_market_data_model(data_version: str, granularity: Optional[str] = None) -> Optional[MarketDataModel]:
+    """
+    Get hitorical market data from previous collections, shared by all the sessions.
+
+    Data is read from its local copy (see `LOCAL_CACHE_DIR`), only downloaded if it changed since it was copied.
 
-    :return: historical market data
+    :param data_version: version of market data, the model is rebuilt when it changes
+    :param granularity: granularity of the rollup to get, raw data if not provided
+    :return: historical market data model, None if the rollup is not available
     """
-    df = pd.read_csv("s3://cryptolution/data.csv")
-    return df
+    local_cache = LocalDatasetCache(cache_dir=LOCAL_CACHE_DIR)
+    if granularity is None:
+        storage = get_storage(
+            path=COLLECTION_SETTINGS['storage_path'],
+            backend=COLLECTION_SETTINGS['storage_backend']
+        )
+        return MarketDataModel(data=local_cache.read(storage=storage), version=data_version)
+    try:
+        rollup_df = local_cache.read(
+            storage=get_rollup_storage(collection_settings=COLLECTION_SETTINGS, granularity=granularity)
+        )
+    except NoExistingFile:
+        return None
+    return MarketDataModel(data=rollup_df, version=data_version, granularity=granularity)
 
 
-data = get_historical_market_data()
+@st.cache_resource(max_entries=len(ROLLUP_DATA['granularities']) + 1)
+def get_price_matrix(data_version: str, granularity: Optional[str] = None) -> Optional[PriceMatrix]:
+    """
+    Get the time-aligned matrix of close prices (one column per asset pair), shared by all the sessions.
+
+    It is pivoted once per data version from the data model.
+
+    :param data_version: version of market data, the matrix is rebuilt when it changes
+    :param granularity: granularity of the rollup to get, raw data if not provided
+    :return: price matrix, None if the rollup is not available
+    """
+    data_model = get_market_data_model(data_version=data_version, granularity=granularity)
+    if data_model is None:
+        return None
+    return build_price_matrix(data=data_model.data, field='close_price')
+
+
+@st.cache_resource
+def get_indicator_cache() -> IndicatorCache:
+    """
+    Get the cache of technical indicators, shared by all the sessions.
+
+    It outlives data models: when the data version changes, cached indicators are extended with new candles.
+
+    :return: cache of technical indicators
+    """
+    return IndicatorCache()
+
+
+data_version = get_data_version()
 with open('modules/assets_mapping/mapping.json') as json_mapping_file:
     asset_name_mapping = json.load(json_mapping_file)
 with open('modules/data/pairs.json') as json_pairs:
@@ -40,9 +130,12 @@ with open('modules/data/pairs.json') as json_pairs:
 
 cryptolution_view = CryptolutionView(
     title='Cryptolution',
-    data=data,
+    data_summary=get_data_summary(),
+    data_model_loader=lambda granularity: get_market_data_model(data_version=data_version, granularity=granularity),
     pairs=pairs,
-    asset_name_mapping=asset_name_mapping
+    asset_name_mapping=asset_name_mapping,
+    indicator_cache=get_indicator_cache(),
+    price_matrix_loader=lambda granularity: get_price_matrix(data_version=data_version, granularity=granularity)
 )
 cryptolution_view.overview()
 
@@ -51,10 +144,16 @@ currency_options = sidebar["currency_options"]
 asset_options = sidebar["asset_options"]
 asset_disabled = sidebar["asset_disabled"]
 metric_options = sidebar["metric_options"]
+indicator_options = sidebar["indicator_options"]
+indicator_params = sidebar["indicator_params"]
 
 cryptolution_view.explorer(
     asset_disabled=asset_disabled,
     currency=currency_options,
     metric=metric_options,
-    asset_name=asset_options
+    asset_name=asset_options,
+    indicator=indicator_options,
+    indicator_params=indicator_params
 )
+
+cryptolution_view.comparison(currency=currency_options, asset=asset_disabled)
@@ -0,0 +1,174 @@
+"""Comparison of asset pairs over a time-aligned matrix of prices."""
+
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class PriceMatrix:
+    """
+    Class for a time-aligned matrix of prices: one row per timestamp, one column per asset pair.
+
+    Prices are float64, missing candles (ex. before an asset pair was listed) are NaN.
+    Log returns are computed once with the matrix, so that comparisons only slice them.
+    """
+
+    def __init__(self, tmsp: np.ndarray, pairs: pd.DataFrame, values: np.ndarray, returns: Optional[np.ndarray] = None):
+        self.tmsp = tmsp
+        self.pairs = pairs.reset_index(drop=True)  # asset_pair, asset & currency of each column
+        self.values = values
+        if returns is None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                returns = np.diff(np.log(values), axis=0, prepend=np.nan)
+        self.returns = returns
+
+    def select(
+            self,
+            currency: Optional[str] = None,
+            start: Optional[datetime] = None,
+            end: Optional[datetime] = None
+    ) -> 'PriceMatrix':
+        """
+        Select the asset pairs of a currency over a period, without recomputing returns.
+
+        :param currency: only keep asset pairs of this currency, all of them if not provided
+        :param start: only keep rows from this date (included)
+        :param end: only keep rows until this date (included)
+        :return: the selected matrix
+        """
+        first = self.tmsp.searchsorted(pd.Timestamp(start).timestamp(), side='left') if start else 0
+        last = self.tmsp.searchsorted(pd.Timestamp(end).timestamp(), side='right') if end else len(self.tmsp)
+        columns = np.flatnonzero(self.pairs['currency'].values == currency) if currency else np.arange(len(self.pairs))
+        returns = self.returns[first:last, columns]  # indexing columns copies the rows
+        if len(returns):
+            returns[0] = np.nan  # the return of the first row comes from outside the period
+        return PriceMatrix(
+            tmsp=self.tmsp[first:last],
+            pairs=self.pairs.iloc[columns],
+            values=self.values[first:last, columns],
+            returns=returns
+        )
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        """
+        Get the date of each row.
+
+        :return: dates
+        """
+        return pd.to_datetime(self.tmsp, unit='s')
+
+
+def build_price_matrix(data: pd.DataFrame, field: str = 'close_price') -> PriceMatrix:
+    """
+    Build the matrix of a field with a single pivot of market data.
+
+    Rows and columns are the sorted unique timestamps and asset pairs, each candle is scattered into its cell.
+
+    :param data: market data (asset_pair, asset, currency, tmsp and the field)
+    :param field: field to pivot
+    :return: the matrix
+    """
+    tmsp, rows = np.unique(data['tmsp'].values, return_inverse=True)
+    codes, asset_pairs = pd.factorize(data['asset_pair'], sort=True)  # no string comparison for categories
+    values = np.full((len(tmsp), len(asset_pairs)), np.nan)
+    values[rows, codes] = data[field].values.astype(np.float64)
+    first_rows = np.unique(codes, return_index=True)[1]
+    pairs = data[['asset_pair', 'asset', 'currency']].iloc[first_rows].astype(str)
+    return PriceMatrix(tmsp=tmsp, pairs=pairs, values=values)
+
+
+def normalized_performance(values: np.ndarray) -> np.ndarray:
+    """
+    Compute the performance of each column since its first price (0 at its first price).
+
+    :param values: prices, one column per asset pair
+    :return: performance, NaN before the first price of a column
+    """
+    valid = ~np.isnan(values)
+    if not len(values):
+        return values.copy()
+    first_prices = values[valid.argmax(axis=0), np.arange(values.shape[1])]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return values / first_prices - 1
+
+
+def correlation_matrix(returns: np.ndarray, min_periods: int = 2) -> np.ndarray:
+    """
+    Compute the correlation of returns between every two columns, over the rows where both are available.
+
+    Sums over pairwise available rows are computed with matrix products of masked returns.
+
+    :param returns: returns, one column per asset pair
+    :param min_periods: minimum number of rows shared by two columns, their correlation is NaN otherwise
+    :return: correlations, one row & one column per asset pair
+    """
+    mask = (~np.isnan(returns)).astype(np.float64)
+    filled = np.where(mask > 0, returns, 0.)
+    counts = mask.T @ mask
+    sums = filled.T @ mask  # sums[i, j]: sum of column i over the rows where column j is available
+    squares = (filled ** 2).T @ mask
+    products = filled.T @ filled
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = products - sums * sums.T / counts
+        variances = squares - sums ** 2 / counts
+        correlation = covariance / np.sqrt(variances * variances.T)
+    correlation[counts < min_periods] = np.nan
+    return np.clip(correlation, -1., 1.)
+
+
+def rolling_correlation(
+        returns: np.ndarray,
+        reference: int,
+        window: int,
+        min_periods: Optional[int] = None
+) -> np.ndarray:
+    """
+    Compute the rolling correlation of returns between a reference column and every column.
+
+    Sums over each window are differences of cumulative sums, computed for all the columns at once.
+
+    :param returns: returns, one column per asset pair
+    :param reference: position of the reference column
+    :param window: number of rows in a window
+    :param min_periods: minimum number of rows available in a window, `window` if not provided
+    :return: correlations, one row per row of returns and one column per asset pair
+    """
+    min_periods = window if min_periods is None else min_periods
+    x = returns[:, [reference]]
+    mask = (~np.isnan(returns) & ~np.isnan(x)).astype(np.float64)
+    x = np.where(mask > 0, x, 0.)
+    y = np.where(mask > 0, returns, 0.)
+
+    def window_sums(values: np.ndarray) -> np.ndarray:
+        cumsum = np.cumsum(values, axis=0)
+        sums = cumsum.copy()
+        sums[window:] -= cumsum[:-window]
+        return sums
+
+    counts = window_sums(mask)
+    sum_x, sum_y = window_sums(x), window_sums(y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = window_sums(x * y) - sum_x * sum_y / counts
+        variance_x = window_sums(x ** 2) - sum_x ** 2 / counts
+        variance_y = window_sums(y ** 2) - sum_y ** 2 / counts
+        correlation = covariance / np.sqrt(variance_x * variance_y)
+    correlation[counts < max(min_periods, 2)] = np.nan
+    return np.clip(correlation, -1., 1.)
+
+
+def most_correlated(correlation: np.ndarray, reference: int, top: int) -> List[int]:
+    """
+    Get the columns most correlated with a reference column.
+
+    :param correlation: correlation matrix
+    :param reference: position of the reference column
+    :param top: number of columns to get
+    :return: positions of the columns, the most correlated first (the reference is excluded)
+    """
+    scores = np.nan_to_num(correlation[reference], nan=-np.inf)
+    scores[reference] = -np.inf
+    ranked = np.argsort(-scores, kind='stable')
+    return [int(column) for column in ranked[:top] if np.isfinite(scores[column])]
@@ -0,0 +1,58 @@
+"""Data model for the streamlit app."""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+
+class MarketDataModel:
+    """
+    Class for market data, pre-indexed by (asset, currency).
+
+    It is built once per data version and shared by all the sessions of the app:
+    - dates are parsed once
+    - rows are sorted by (asset, currency, tmsp), so that each selection is a contiguous slice
+    """
+
+    def __init__(self, data: pd.DataFrame, version: str = '', granularity: Optional[str] = None):
+        self.version = version
+        self.granularity = granularity  # of the rollup, None for raw data
+        data = data.sort_values(['asset', 'currency', 'tmsp'], kind='mergesort').reset_index(drop=True)
+        data['date'] = pd.to_datetime(data['time'])
+        self.data = data
+        self.slices: Dict[Tuple[str, str], slice] = {
+            (str(asset), str(currency)): slice(positions[0], positions[-1] + 1)
+            for (asset, currency), positions in data.groupby(
+                ['asset', 'currency'], sort=False, observed=True
+            ).indices.items()
+        }
+        self.assets: List[str] = sorted({asset for asset, _ in self.slices})
+        self.date_min = data['date'].min()
+        self.date_max = data['date'].max()
+
+    def get_slice(
+            self,
+            asset: str,
+            currency: str,
+            start: Optional[datetime] = None,
+            end: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        """
+        Get data for a given asset and currency, in O(slice) time.
+
+        The period is located by binary search, as rows are sorted by date within a selection.
+
+        :param asset: technical asset name
+        :param currency: currency
+        :param start: only get data from this date (included)
+        :param end: only get data until this date (included)
+        :return: data sorted by timestamp, empty if there is no data for the selection
+        """
+        selection = self.slices.get((asset, currency), slice(0, 0))
+        if start is not None or end is not None:
+            dates = self.data['date'].values[selection]
+            first = dates.searchsorted(pd.Timestamp(start).to_datetime64(), side='left') if start else 0
+            last = dates.searchsorted(pd.Timestamp(end).to_datetime64(), side='right') if end else len(dates)
+            selection = slice(selection.start + first, selection.start + last)
+        return self.data.iloc[selection]
@@ -0,0 +1,59 @@
+"""Downsampling of series before charting."""
+
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Select the points to keep with the Largest-Triangle-Three-Buckets algorithm.
+
+    First and last points are kept, other points are split into n_out - 2 buckets
+    and the point forming the largest triangle with the previously selected point and the average
+    of the next bucket is selected in each bucket. The shape of the series is preserved.
+
+    :param x: x values, sorted
+    :param y: y values
+    :param n_out: number of points to keep
+    :return: positions of the points to keep, sorted
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    selected = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket == n_out - 3:
+            next_x, next_y = x[n - 1], y[n - 1]
+        else:
+            next_end = edges[bucket + 2]
+            next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        areas = np.abs(
+            (x[selected] - next_x) * (y[start:end] - y[selected]) -
+            (x[selected] - x[start:end]) * (next_y - y[selected])
+        )
+        selected = start + int(np.argmax(areas))
+        indices[bucket + 1] = selected
+    return indices
+
+
+def downsample(df: pd.DataFrame, x_field: str, y_field: str, max_points: int) -> pd.DataFrame:
+    """
+    Downsample data so that at most max_points are charted, whatever the length of the history.
+
+    :param df: data, sorted by x_field
+    :param x_field: field used as x axis (numeric)
+    :param y_field: field used as y axis
+    :param max_points: maximum number of points to keep
+    :return: downsampled data
+    """
+    if len(df) <= max_points:
+        return df
+    return df.iloc[lttb_indices(x=df[x_field].values, y=df[y_field].values, n_out=max_points)]
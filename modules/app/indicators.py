@@ -0,0 +1,283 @@
+"""Technical indicators computed over the series of asset pairs, memoized and extended incrementally."""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def sma(values: np.ndarray, context: int, seed: Optional[Dict[str, float]], window: int) -> Dict[str, np.ndarray]:
+    """
+    Compute the simple moving average.
+
+    :param values: values, starting with `context` values already computed
+    :param context: number of leading values only used as context
+    :param seed: last computed row, None if nothing has been computed yet
+    :param window: number of values averaged
+    :return: the indicator for the values after the context
+    """
+    return {'sma': pd.Series(values).rolling(window).mean().values[context:]}
+
+
+def ema(values: np.ndarray, context: int, seed: Optional[Dict[str, float]], span: int) -> Dict[str, np.ndarray]:
+    """
+    Compute the exponential moving average, resumed from the last computed average.
+
+    :param values: values, starting with `context` values already computed
+    :param context: number of leading values only used as context
+    :param seed: last computed row, None if nothing has been computed yet
+    :param span: span of the average (its decay is 2 / (span + 1))
+    :return: the indicator for the values after the context
+    """
+    series = pd.Series(values[context:])
+    if seed is None:
+        return {'ema': series.ewm(span=span, adjust=False).mean().values}
+    resumed = pd.concat([pd.Series([seed['ema']]), series], ignore_index=True)
+    return {'ema': resumed.ewm(span=span, adjust=False).mean().values[1:]}
+
+
+def rsi(values: np.ndarray, context: int, seed: Optional[Dict[str, float]], window: int) -> Dict[str, np.ndarray]:
+    """
+    Compute the relative strength index, with Wilder's smoothing of gains and losses.
+
+    Smoothed gains and losses are kept (`rsi_gain`, `rsi_loss`), so that they can be resumed.
+    The index is not defined for the first `window` values.
+
+    :param values: values, starting with `context` values already computed (the previous value is needed)
+    :param context: number of leading values only used as context
+    :param seed: last computed row, None if nothing has been computed yet
+    :param window: smoothing window
+    :return: the indicator for the values after the context
+    """
+    deltas = np.diff(values, prepend=values[0])[context:]
+    smoothed = {}
+    for field, moves in (('rsi_gain', np.clip(deltas, 0, None)), ('rsi_loss', np.clip(-deltas, 0, None))):
+        series = pd.Series(moves if seed is None else np.concatenate([[seed[field]], moves]))
+        smoothed[field] = series.ewm(alpha=1 / window, adjust=False).mean().values[0 if seed is None else 1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        index = 100 * smoothed['rsi_gain'] / (smoothed['rsi_gain'] + smoothed['rsi_loss'])
+    if seed is None:
+        index[:window] = np.nan
+    elif seed['rows'] < window:
+        index[:window - int(seed['rows'])] = np.nan
+    return {'rsi': index, **smoothed}
+
+
+def bollinger(
+        values: np.ndarray,
+        context: int,
+        seed: Optional[Dict[str, float]],
+        window: int,
+        num_std: float
+) -> Dict[str, np.ndarray]:
+    """
+    Compute Bollinger bands: the moving average, shifted by a number of moving standard deviations.
+
+    :param values: values, starting with `context` values already computed
+    :param context: number of leading values only used as context
+    :param seed: last computed row, None if nothing has been computed yet
+    :param window: number of values in the moving window
+    :param num_std: number of standard deviations between the average and the bands
+    :return: the indicator for the values after the context
+    """
+    rolling = pd.Series(values).rolling(window)
+    middle = rolling.mean().values[context:]
+    deviation = num_std * rolling.std(ddof=0).values[context:]
+    return {'bollinger_lower': middle - deviation, 'bollinger_middle': middle, 'bollinger_upper': middle + deviation}
+
+
+def volatility(
+        values: np.ndarray,
+        context: int,
+        seed: Optional[Dict[str, float]],
+        window: int
+) -> Dict[str, np.ndarray]:
+    """
+    Compute the rolling volatility: the standard deviation of log returns over a moving window (not annualized).
+
+    :param values: values, starting with `context` values already computed
+    :param context: number of leading values only used as context
+    :param seed: last computed row, None if nothing has been computed yet
+    :param window: number of returns in the moving window
+    :return: the indicator for the values after the context
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_returns = np.diff(np.log(values), prepend=np.nan)
+    return {'volatility': pd.Series(log_returns).rolling(window).std().values[context:]}
+
+
+def returns(values: np.ndarray, context: int, seed: Optional[Dict[str, float]]) -> Dict[str, np.ndarray]:
+    """
+    Compute returns from the previous value, and the drawdown from the running maximum.
+
+    The running maximum is kept (`running_max`), so that it can be resumed.
+
+    :param values: values, starting with `context` values already computed (the previous value is needed)
+    :param context: number of leading values only used as context
+    :param seed: last computed row, None if nothing has been computed yet
+    :return: the indicator for the values after the context
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        period_returns = (values[1:] / values[:-1] - 1)[max(context - 1, 0):]
+    if seed is None:
+        period_returns = np.concatenate([[np.nan], period_returns])
+    new_values = values[context:]
+    running_max = np.maximum.accumulate(new_values if seed is None else np.maximum(new_values, seed['running_max']))
+    return {'returns': period_returns, 'drawdown': new_values / running_max - 1, 'running_max': running_max}
+
+
+class Indicator:
+    """
+    Class describing an indicator: its kernel, default parameters and the context needed to extend it.
+
+    The kernel computes the indicator for new values, from `lookback` previous values and the last computed row.
+    Fields are the ones to chart, other fields returned by the kernel are only kept to resume it.
+    """
+
+    def __init__(
+            self,
+            kernel: Callable,
+            fields: List[str],
+            params: Dict,
+            lookback: Callable[..., int],
+            overlay: bool
+    ):
+        self.kernel = kernel
+        self.fields = fields
+        self.params = params
+        self.lookback = lookback
+        self.overlay = overlay  # charted on the same scale as the series
+
+
+INDICATORS = {
+    'sma': Indicator(kernel=sma, fields=['sma'], params={'window': 20}, lookback=lambda window: window - 1, overlay=True),
+    'ema': Indicator(kernel=ema, fields=['ema'], params={'span': 20}, lookback=lambda span: 0, overlay=True),
+    'rsi': Indicator(kernel=rsi, fields=['rsi'], params={'window': 14}, lookback=lambda window: 1, overlay=False),
+    'bollinger': Indicator(
+        kernel=bollinger,
+        fields=['bollinger_lower', 'bollinger_middle', 'bollinger_upper'],
+        params={'window': 20, 'num_std': 2.},
+        lookback=lambda window, num_std: window - 1,
+        overlay=True
+    ),
+    'volatility': Indicator(
+        kernel=volatility, fields=['volatility'], params={'window': 20}, lookback=lambda window: window, overlay=False
+    ),
+    'returns': Indicator(kernel=returns, fields=['returns', 'drawdown'], params={}, lookback=lambda: 1, overlay=False)
+}
+
+
+def compute_indicator(
+        indicator: str,
+        values: np.ndarray,
+        params: Optional[Dict] = None,
+        computed: Optional[Dict[str, np.ndarray]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Compute an indicator over a series, resuming a previous computation over its first values if provided.
+
+    Only values after the computed ones are processed, with the context needed by the indicator: the kernel is
+    given the last computed row as seed, along with the number of computed rows (`rows`).
+
+    :param indicator: name of the indicator, see `INDICATORS`
+    :param values: the series, sorted by timestamp
+    :param params: parameters of the indicator, defaults if not provided
+    :param computed: the indicator (all the fields of its kernel) computed over the first values of the series
+    :return: the indicator (all the fields of its kernel) over the whole series
+    """
+    spec = INDICATORS[indicator]
+    params = {**spec.params, **(params or {})}
+    values = np.asarray(values, dtype=np.float64)
+    done = len(next(iter(computed.values()))) if computed else 0
+    if done == len(values):
+        return computed
+    context = min(spec.lookback(**params), done)
+    seed = None
+    if done:
+        seed = {field: computed_values[done - 1] for field, computed_values in computed.items()}
+        seed['rows'] = done
+    new = spec.kernel(values[done - context:], context, seed, **params)
+    if not done:
+        return new
+    return {field: np.concatenate([computed[field], new[field]]) for field in new}
+
+
+class IndicatorCache:
+    """
+    Class memoizing indicators per series (ex. asset pair & metric), indicator, parameters and data version.
+
+    When the data version changes, the indicator computed for the previous version is extended:
+    only candles added (or updated) since the previous version are processed.
+    It is shared by all the sessions of the app, the least recently used entries are evicted.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.entries: 'OrderedDict[Tuple, Dict]' = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'extensions': 0, 'misses': 0}
+
+    def get(
+            self,
+            series_key: Hashable,
+            version: str,
+            indicator: str,
+            tmsp: np.ndarray,
+            values: np.ndarray,
+            params: Optional[Dict] = None
+    ) -> pd.DataFrame:
+        """
+        Get an indicator over a series, computing only what is missing.
+
+        :param series_key: key of the series, ex. (granularity, asset, currency, metric)
+        :param version: version of the data the series is read from
+        :param indicator: name of the indicator, see `INDICATORS`
+        :param tmsp: timestamps of the series, sorted
+        :param values: values of the series
+        :param params: parameters of the indicator, defaults if not provided
+        :return: fields of the indicator, one row per value of the series
+        """
+        params = {**INDICATORS[indicator].params, **(params or {})}
+        key = (series_key, indicator, tuple(sorted(params.items())))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            if entry is not None and entry['version'] == version:
+                self.stats['hits'] += 1
+                return self.to_frame(indicator=indicator, outputs=entry['outputs'])
+
+        computed = None
+        if entry is not None:
+            # the series is resumed after the candles that did not change since the cached version
+            kept = min(len(entry['tmsp']), len(tmsp))
+            changed = np.flatnonzero((entry['tmsp'][:kept] != tmsp[:kept]) | (entry['values'][:kept] != values[:kept]))
+            kept = int(changed[0]) if len(changed) else kept
+            if kept:
+                computed = {field: field_values[:kept] for field, field_values in entry['outputs'].items()}
+        outputs = compute_indicator(indicator=indicator, values=values, params=params, computed=computed)
+        with self.lock:
+            self.stats['extensions' if computed else 'misses'] += 1
+            self.entries[key] = {
+                'version': version,
+                'tmsp': np.array(tmsp),
+                'values': np.asarray(values, dtype=np.float64).copy(),
+                'outputs': outputs
+            }
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return self.to_frame(indicator=indicator, outputs=outputs)
+
+    @staticmethod
+    def to_frame(indicator: str, outputs: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """
+        Convert the fields of an indicator into a df, without the fields only kept to resume its kernel.
+
+        :param indicator: name of the indicator
+        :param outputs: all the fields of its kernel
+        :return: fields of the indicator
+        """
+        return pd.DataFrame({field: outputs[field] for field in INDICATORS[indicator].fields}, copy=False)
@@ -2,6 +2,10 @@
 
 from enum import Enum
 
+MAX_CHART_POINTS = 1000  # points sent to the front end for a chart, whatever the length of the history
+MAX_COMPARED_ASSETS = 10  # assets charted together in the comparison, the heatmap covers all of them
+CORRELATION_WINDOW = 30  # default number of periods of the rolling correlation
+
 
 class Currencies(Enum):
     """
@@ -20,3 +24,17 @@ class Metrics(Enum):
     OPEN_PRICE = 'open_price'
     CLOSE_PRICE = 'close_price'
     VOLUME = 'volume'
+
+
+class Indicators(Enum):
+    """
+    Enum for technical indicators of the selected metric.
+    """
+
+    NONE = 'none'
+    SMA = 'sma'
+    EMA = 'ema'
+    BOLLINGER = 'bollinger'
+    RSI = 'rsi'
+    VOLATILITY = 'volatility'
+    RETURNS = 'returns'
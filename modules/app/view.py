@@ -1,12 +1,24 @@
 """Views for the streamlit app."""
 
-from typing import Dict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
 
 import altair as alt
+import numpy as np
 import pandas as pd
 import streamlit as st
+from comparison import (PriceMatrix, build_price_matrix, correlation_matrix,
+                        most_correlated, normalized_performance,
+                        rolling_correlation)
 from components import column_metrics
-from settings import Currencies, Metrics
+from data_model import MarketDataModel
+from downsampling import downsample
+from indicators import INDICATORS, IndicatorCache
+from settings import (CORRELATION_WINDOW, MAX_CHART_POINTS,
+                      MAX_COMPARED_ASSETS, Currencies, Indicators, Metrics)
+
+from modules.models.config import ROLLUP_DATA
+from modules.models.rollups import GRANULARITY_IN_SECONDS, choose_granularity
 
 
 class CryptolutionView:
@@ -17,15 +29,110 @@ class CryptolutionView:
     def __init__(
             self,
             title: str,
-            data: pd.DataFrame,
+            data_summary: Optional[Dict],
+            data_model_loader: Callable[[Optional[str]], Optional[MarketDataModel]],
             pairs: Dict[str, Dict[str, str]],
-            asset_name_mapping: Dict[str, str]
+            asset_name_mapping: Dict[str, str],
+            indicator_cache: Optional[IndicatorCache] = None,
+            price_matrix_loader: Optional[Callable[[Optional[str]], Optional[PriceMatrix]]] = None
     ):
         self.title = title
-        self.data = data
+        self.data_summary = data_summary
+        self.data_model_loader = data_model_loader
         self.asset_name_mapping = asset_name_mapping
         self.asset_list_raw = [pairs[asset_pair]['asset'] for asset_pair in pairs]
         self.asset_list_business = [self.asset_name_mapping[a] for a in self.asset_list_raw]
+        self.indicator_cache = indicator_cache if indicator_cache is not None else IndicatorCache()
+        self.price_matrix_loader = price_matrix_loader
+
+    def get_data_model(self, granularity: Optional[str] = None) -> MarketDataModel:
+        """
+        Get the data model of a rollup, or of raw data if the rollup is not available.
+
+        :param granularity: granularity of the rollup, raw data if not provided
+        :return: the data model
+        """
+        data_model = self.data_model_loader(granularity) if granularity is not None else None
+        if data_model is None:
+            data_model = self.data_model_loader(None)
+        return data_model
+
+    def get_price_matrix(self, granularity: Optional[str] = None) -> PriceMatrix:
+        """
+        Get the price matrix of a rollup, or of raw data if the rollup is not available.
+
+        :param granularity: granularity of the rollup, raw data if not provided
+        :return: the price matrix
+        """
+        if self.price_matrix_loader is None:
+            return build_price_matrix(data=self.get_data_model(granularity).data)
+        price_matrix = self.price_matrix_loader(granularity) if granularity is not None else None
+        if price_matrix is None:
+            price_matrix = self.price_matrix_loader(None)
+        return price_matrix
+
+    def compute_span(self, asset: str, currency: str) -> float:
+        """
+        Compute the length of the history of a selection, from the coarsest rollup.
+
+        :param asset: technical asset name
+        :param currency: currency
+        :return: length of the history (in seconds)
+        """
+        coarsest = max(ROLLUP_DATA['granularities'], key=GRANULARITY_IN_SECONDS.get)
+        tmsp = self.get_data_model(coarsest).get_slice(asset=asset, currency=currency)['tmsp'].values
+        if len(tmsp) == 0:
+            return 0.
+        return float(tmsp[-1] - tmsp[0] + GRANULARITY_IN_SECONDS[coarsest])
+
+    def get_explorer_data(
+            self,
+            asset: str,
+            currency: str,
+            start: Optional[datetime] = None,
+            end: Optional[datetime] = None,
+            metric: Optional[str] = None,
+            indicator: str = Indicators.NONE.value,
+            indicator_params: Optional[Dict] = None
+    ) -> pd.DataFrame:
+        """
+        Get the data of a selection, to be charted.
+
+        It is read from the coarsest rollup that still provides `MAX_CHART_POINTS` points over the period,
+        raw data being used for short periods.
+        The indicator is computed over the whole history of the selection (at the granularity of the data),
+        so that it does not depend on the period; it is memoized by `indicator_cache`.
+
+        :param asset: technical asset name
+        :param currency: currency
+        :param start: only get data from this date (included), whole history if start and end are not provided
+        :param end: only get data until this date (included)
+        :param metric: metric the indicator is computed on
+        :param indicator: indicator to add to the data, see `Indicators`
+        :param indicator_params: parameters of the indicator, defaults if not provided
+        :return: data sorted by timestamp
+        """
+        if start is not None and end is not None:
+            span_in_seconds = (end - start).total_seconds()
+        else:
+            span_in_seconds = self.compute_span(asset=asset, currency=currency)
+        granularity = choose_granularity(span_in_seconds=span_in_seconds, min_points=MAX_CHART_POINTS)
+        data_model = self.get_data_model(granularity)
+        data = data_model.get_slice(asset=asset, currency=currency, start=start, end=end)
+        if indicator == Indicators.NONE.value or data.empty:
+            return data
+
+        history = data_model.get_slice(asset=asset, currency=currency)
+        indicator_df = self.indicator_cache.get(
+            series_key=(data_model.granularity, asset, currency, metric),
+            version=data_model.version,
+            indicator=indicator,
+            tmsp=history['tmsp'].values,
+            values=history[metric].values,
+            params=indicator_params
+        )
+        positions = data.index.values - history.index[0]  # rows of the data model are numbered by position
+        return data.assign(**{field: indicator_df[field].values[positions] for field in indicator_df.columns})
 
     def sidebar(self, header_title: str = 'Settings') -> Dict:
         """
@@ -55,25 +162,70 @@ class CryptolutionView:
             'Select the metric',
             tuple([m.value for m in Metrics])
         )
+        indicator_options = st.sidebar.selectbox(
+            'Select the indicator',
+            tuple([i.value for i in Indicators])
+        )
+        indicator_params = {}
+        if indicator_options != Indicators.NONE.value:
+            for param, default in INDICATORS[indicator_options].params.items():
+                indicator_params[param] = st.sidebar.number_input(
+                    f'Indicator {param}',
+                    min_value=type(default)(1),
+                    value=default
+                )
         return {
             "currency_options": currency_options,
             "asset_options": asset_options,
             "asset_disabled": asset_disabled,
-            "metric_options": metric_options
+            "metric_options": metric_options,
+            "indicator_options": indicator_options,
+            "indicator_params": indicator_params
         }
 
+    @staticmethod
+    def indicator_chart(fields: List[str], data: Optional[pd.DataFrame] = None, title: str = '') -> alt.Chart:
+        """
+        Generate the chart of the fields of an indicator, one line per field.
+
+        :param fields: fields of the indicator
+        :param data: data to chart, the data of the layer if not provided
+        :param title: title of the chart
+        :return: the chart
+        """
+        chart = alt.Chart(title=title) if data is None else alt.Chart(data=data, title=title)
+        return (
+            chart
+            .transform_fold(fields, as_=['indicator', 'value'])
+            .mark_line(strokeDash=[4, 2])
+            .encode(
+                x=alt.X("date:T", axis=alt.Axis(title="date", titleColor='#57A44C')),
+                y=alt.Y("value:Q", axis=alt.Axis(title=title or None)),
+                color=alt.Color("indicator:N")
+            )
+        )
+
     def overview(self, header_title: str = 'Overview'):
         """
         Generate overview section for the app.
 
+        Metrics are read from the summary written by the collection, data is only loaded if there is no summary.
+
         :param header_title: title of the section
         """
         st.header(header_title)
+        if self.data_summary and self.data_summary['rows']:
+            assets = self.data_summary['assets']
+            date_min = pd.Timestamp(self.data_summary['min_tmsp'], unit='s')
+            date_max = pd.Timestamp(self.data_summary['max_tmsp'], unit='s')
+        else:
+            data_model = self.get_data_model('daily')
+            assets, date_min, date_max = data_model.assets, data_model.date_min, data_model.date_max
         column_metrics(
             metrics=[
-                {"Number of cryptocurrencies": f"#{len(set(self.data.asset.values).intersection(self.asset_list_raw))}"},
-                {"Date min handled": self.data.time.min()[:10]},
-                {"Date max handled": self.data.time.max()[:10]}
+                {"Number of cryptocurrencies": f"#{len(set(assets).intersection(self.asset_list_raw))}"},
+                {"Date min handled": str(date_min)[:10]},
+                {"Date max handled": str(date_max)[:10]}
             ]
         )
 
@@ -83,30 +235,43 @@ class CryptolutionView:
             currency: str,
             metric: str,
             asset_name: str,
+            indicator: str = Indicators.NONE.value,
+            indicator_params: Optional[Dict] = None,
             header_title: str = 'Explore historical data'
     ):
         """
         Generate exploration section for the app.
 
+        Charts are built from the coarsest rollup that fits the displayed period, see `get_explorer_data`.
+        Indicators sharing the scale of the metric (moving averages, bands) are overlaid on its charts,
+        others are charted below.
+
         :param asset_disabled: technical asset name
         :param currency: currency choice
         :param metric: metric choice
         :param asset_name: asset choice
+        :param indicator: indicator choice
+        :param indicator_params: parameters of the indicator
         :param header_title: title of the section
         """
         st.header(header_title)
 
-        displayed_data = self.data[
-            (self.data.asset == asset_disabled) &
-            (self.data.currency == currency)
-        ].copy()
-
-        displayed_data['date'] = pd.to_datetime(displayed_data['time'])
+        indicator_fields = INDICATORS[indicator].fields if indicator != Indicators.NONE.value else []
+        displayed_data = self.get_explorer_data(
+            asset=asset_disabled,
+            currency=currency,
+            metric=metric,
+            indicator=indicator,
+            indicator_params=indicator_params
+        )
+        chart_data = downsample(
+            df=displayed_data, x_field='tmsp', y_field=metric, max_points=MAX_CHART_POINTS
+        )[['date', metric] + indicator_fields]
 
         brush = alt.selection(type='interval', encodings=['x'])
         line_chart = (
             alt.Chart(
-                data=displayed_data,
+                data=chart_data,
                 title=f"Evolution of {metric} for asset {asset_name}",
             )
             .mark_line()
@@ -122,11 +287,45 @@ class CryptolutionView:
             y=f'mean({metric}):Q',
             size=alt.SizeValue(3)
         ).transform_filter(brush)
-        chart = alt.layer(line_chart, line, data=displayed_data)
+        layers = [line_chart, line]
+        if indicator_fields and INDICATORS[indicator].overlay:
+            layers.append(self.indicator_chart(fields=indicator_fields))
+        chart = alt.layer(*layers, data=chart_data)
+        st.altair_chart(chart, theme="streamlit", use_container_width=True)
+        if indicator_fields and not INDICATORS[indicator].overlay:
+            st.altair_chart(
+                self.indicator_chart(fields=indicator_fields, data=chart_data, title=f"{indicator} of {metric}"),
+                theme="streamlit",
+                use_container_width=True
+            )
+
+        if len(displayed_data) < 2:
+            return
+        date_min, date_max = displayed_data['date'].iloc[0], displayed_data['date'].iloc[-1]
+        start, end = st.slider(
+            'Focus on period',
+            min_value=date_min.to_pydatetime(),
+            max_value=date_max.to_pydatetime(),
+            value=(date_min.to_pydatetime(), date_max.to_pydatetime())
+        )
+        zoomed_chart_data = downsample(
+            df=self.get_explorer_data(
+                asset=asset_disabled,
+                currency=currency,
+                start=start,
+                end=end,
+                metric=metric,
+                indicator=indicator,
+                indicator_params=indicator_params
+            ),
+            x_field='tmsp',
+            y_field=metric,
+            max_points=MAX_CHART_POINTS
+        )[['date', metric] + indicator_fields]
 
         zoomed_chart = (
             alt.Chart(
-                data=displayed_data,
+                data=zoomed_chart_data,
                 title="Focus on selected period",
             )
             .mark_line()
@@ -134,7 +333,103 @@ class CryptolutionView:
                 x=alt.X("date:T", axis=alt.Axis(title="date", titleColor='#57A44C')),
                 y=alt.Y(metric, axis=alt.Axis(title=f'{metric} ({currency})', titleColor='#57A44C'))
             )
-        ).transform_filter(
-            brush
         )
-        st.altair_chart(chart & zoomed_chart, theme="streamlit", use_container_width=True)
+        if indicator_fields and INDICATORS[indicator].overlay:
+            zoomed_chart = alt.layer(zoomed_chart, self.indicator_chart(fields=indicator_fields), data=zoomed_chart_data)
+        st.altair_chart(zoomed_chart, theme="streamlit", use_container_width=True)
+
+    def comparison(
+            self,
+            currency: str,
+            asset: str,
+            header_title: str = 'Compare assets'
+    ):
+        """
+        Generate comparison section for the app: performance, rolling correlation and correlation heatmap.
+
+        Charts are computed from the price matrix of the chosen granularity (one column per asset pair),
+        built once per data version, see `get_price_matrix`.
+
+        :param currency: currency choice
+        :param asset: technical name of the reference asset
+        :param header_title: title of the section
+        """
+        st.header(header_title)
+        granularity = st.selectbox('Select the granularity', tuple(ROLLUP_DATA['granularities']) + ('raw',))
+        matrix = self.get_price_matrix(None if granularity == 'raw' else granularity).select(currency=currency)
+        if matrix.values.shape[1] < 2 or len(matrix.tmsp) < 3:
+            st.info('Not enough data to compare assets')
+            return
+        date_min, date_max = matrix.dates[0].to_pydatetime(), matrix.dates[-1].to_pydatetime()
+        start, end = st.slider('Comparison period', min_value=date_min, max_value=date_max, value=(date_min, date_max))
+        matrix = matrix.select(start=start, end=end)
+        if len(matrix.tmsp) < 3:
+            st.info('Not enough data to compare assets')
+            return
+
+        names = [self.asset_name_mapping.get(a, a) for a in matrix.pairs['asset']]
+        reference = list(matrix.pairs['asset']).index(asset) if asset in set(matrix.pairs['asset']) else 0
+        correlation = correlation_matrix(returns=matrix.returns)
+        compared = st.multiselect(
+            'Compare with',
+            options=[name for column, name in enumerate(names) if column != reference],
+            default=[names[column] for column in most_correlated(correlation, reference=reference, top=4)],
+            help=f'At most {MAX_COMPARED_ASSETS} assets are charted'
+        )
+        window = int(st.number_input('Correlation window', min_value=2, value=CORRELATION_WINDOW))
+        columns = [reference] + [names.index(name) for name in compared[:MAX_COMPARED_ASSETS]]
+        positions = np.unique(np.linspace(0, len(matrix.tmsp) - 1, MAX_CHART_POINTS).astype(np.int64))
+        dates = matrix.dates[positions]
+
+        performance = normalized_performance(matrix.values[:, columns])[positions]
+        st.altair_chart(
+            self.lines_chart(
+                data=pd.DataFrame(performance, index=dates, columns=[names[c] for c in columns]),
+                title=f"Performance since {str(start)[:10]} ({currency})"
+            ),
+            theme="streamlit",
+            use_container_width=True
+        )
+        if len(columns) > 1:
+            rolling = rolling_correlation(returns=matrix.returns[:, columns], reference=0, window=window)[positions, 1:]
+            st.altair_chart(
+                self.lines_chart(
+                    data=pd.DataFrame(rolling, index=dates, columns=[names[c] for c in columns[1:]]),
+                    title=f"Correlation of returns with {names[reference]} ({window} periods)"
+                ),
+                theme="streamlit",
+                use_container_width=True
+            )
+
+        heatmap_data = pd.DataFrame({
+            'asset': np.repeat(names, len(names)),
+            'compared_asset': np.tile(names, len(names)),
+            'correlation': correlation.ravel()
+        })
+        heatmap = alt.Chart(data=heatmap_data, title="Correlation of returns").mark_rect().encode(
+            x=alt.X("asset:N", title=None),
+            y=alt.Y("compared_asset:N", title=None),
+            color=alt.Color("correlation:Q", scale=alt.Scale(scheme='redblue', domain=[-1, 1])),
+            tooltip=['asset', 'compared_asset', alt.Tooltip('correlation:Q', format='.2f')]
+        )
+        st.altair_chart(heatmap, theme="streamlit", use_container_width=True)
+
+    @staticmethod
+    def lines_chart(data: pd.DataFrame, title: str) -> alt.Chart:
+        """
+        Generate the chart of several series sharing the same dates, one line per column.
+
+        :param data: series, indexed by date
+        :param title: title of the chart
+        :return: the chart
+        """
+        long_data = data.rename_axis('date').reset_index().melt(id_vars='date', var_name='asset', value_name='value')
+        return (
+            alt.Chart(data=long_data, title=title)
+            .mark_line()
+            .encode(
+                x=alt.X("date:T", axis=alt.Axis(title="date", titleColor='#57A44C')),
+                y=alt.Y("value:Q", axis=alt.Axis(title=None)),
+                color=alt.Color("asset:N")
+            )
+        )
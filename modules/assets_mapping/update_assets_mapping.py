@@ -1,13 +1,48 @@
 """Script for scrapping explicit names from raw currency codes."""
 import json
+import re
 from dataclasses import dataclass
+from io import BytesIO
+from typing import Iterable, Optional, Tuple
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from bs4.element import ResultSet
 
 from modules.models.exceptions import (NotExistingHTMLClass, UnknownURLError,
                                        WrongFormatForHTML)
+from modules.models.transport import build_session
+
+try:
+    from lxml import etree
+except ImportError:  # BeautifulSoup with html.parser is used instead
+    etree = None
+
+SYMBOL_CLASS = 'js-currency-symbol'
+NAME_CLASS = 'js-currency-name'
+CURRENCY_ROWS = SoupStrainer('tr')  # the currency table is the only one of the page
+HTML_TAG = re.compile(r'<[a-zA-Z!/]')
+
+
+def read_currency_row(cells: Iterable) -> Optional[Tuple[str, str]]:
+    """
+    Read symbol & name of a currency from the cells of a row, in a single pass.
+
+    :param cells: cells of the row, lxml or BeautifulSoup elements
+    :return: symbol & name, None if the row is not a currency (ex. header)
+    """
+    symbol = name = None
+    for cell in cells:
+        classes = cell.get('class') or []
+        if isinstance(classes, str):  # lxml does not split multi-valued attributes
+            classes = classes.split()
+        if SYMBOL_CLASS in classes:
+            symbol = cell.get('title')
+        elif NAME_CLASS in classes:
+            name = cell.get('title')
+    if symbol is None or name is None:
+        return None
+    return symbol, name
 
 
 @dataclass
@@ -19,43 +54,64 @@ class AssetMappingUpdater:
     html: str = None
     soup: BeautifulSoup = None
     mapping: dict = None
+    session: requests.Session = None
 
     def get_html(self):
         """
-        Retrieve html source code from website url.
+        Retrieve html source code from website url, through the given session or a single connection one.
         """
+        if self.session is None:
+            self.session = build_session(pool_size=1)
         try:
-            html = requests.get(url=self.url).text
+            html = self.session.get(url=self.url).text
         except requests.exceptions.ConnectionError:
             raise UnknownURLError(self.url)
         self.html = html
 
-    def soupify_html(self):
+    def check_html(self):
         """
-        Soupify html source code.
+        Check that html source code has some markup, without parsing it.
         """
-        soup = BeautifulSoup(self.html, "html.parser")
-        if soup.text == self.html:
+        if not HTML_TAG.search(self.html):
             raise WrongFormatForHTML
-        self.soup = soup
+
+    def soupify_html(self, parse_only: Optional[SoupStrainer] = None):
+        """
+        Soupify html source code, with lxml if installed.
+
+        :param parse_only: only keep the matching elements, ex. `CURRENCY_ROWS`
+        """
+        self.check_html()
+        self.soup = BeautifulSoup(self.html, 'lxml' if etree is not None else 'html.parser', parse_only=parse_only)
 
     def build_mapping(self, table: ResultSet):
         """
-        Build mapping from scraping.
+        Build mapping from scraping, rows that are not currencies (ex. header) are skipped.
+        """
+        currencies = (read_currency_row(row.find_all('td')) for row in table)
+        self.mapping = dict(currency for currency in currencies if currency is not None)
+
+    def extract_mapping(self):
+        """
+        Build mapping from html source code, reading the cells of each row in a single pass.
+
+        Rows are parsed incrementally by lxml, each row being dropped once read so that the tree of the page
+        is never built, or the page is soupified with table rows only if lxml is missing.
         """
-        lst = []
-        for row in table[1:]:  # skip the header
-            lst.append(
-                {
-                    "symbol": row.find(class_="left noWrap elp symb js-currency-symbol")["title"],
-                    "name": row.find(class_="left bold elp name cryptoName first js-currency-name")["title"]
-                }
-            )
-
-        self.mapping = {
-            item['symbol']: item['name']
-            for item in lst
-        }
+        if etree is None:
+            self.soupify_html(parse_only=CURRENCY_ROWS)
+            self.build_mapping(table=self.soup.find_all('tr'))
+            return
+        self.check_html()
+        self.mapping = {}
+        rows = etree.iterparse(BytesIO(self.html.encode()), events=('end',), tag='tr', html=True)
+        for _, row in rows:
+            currency = read_currency_row(row.iter('td'))
+            if currency is not None:
+                self.mapping[currency[0]] = currency[1]
+            row.clear()
+            while row.getprevious() is not None:  # read rows stay attached to the table
+                del row.getparent()[0]
 
     @staticmethod
     def find_from_soup(elem: BeautifulSoup, elem_class: str) -> BeautifulSoup:
@@ -73,21 +129,20 @@ class AssetMappingUpdater:
         return res
 
 
-def get_assets_mapping() -> dict:
+def get_assets_mapping(session: Optional[requests.Session] = None) -> dict:
     """
     Scrap investing.com and get labels associated to currency symbols.
 
+    :param session: session to get the page with (ex. the one of a collector), a single connection one if not provided
     :return: a mapping between currency code and label
     """
     mapping_updater = AssetMappingUpdater(
         url="https://www.investing.com/crypto/currencies",
-        updated_file="mapping.json"
+        updated_file="mapping.json",
+        session=session
     )
     mapping_updater.get_html()
-    mapping_updater.soupify_html()
-
-    data = mapping_updater.soup.find_all('tr')
-    mapping_updater.build_mapping(table=data)
+    mapping_updater.extract_mapping()
     return mapping_updater.mapping
 
 
@@ -0,0 +1,129 @@
+"""
+Resumable backfill of OHLC history from Kraken.
+"""
+
+import argparse
+import logging
+import time
+from typing import Dict
+
+from modules.models.collect_data import KrakenDataCollector
+from modules.models.exceptions import NoExistingFile
+from modules.models.storage import Storage, get_storage
+from modules.models.summary import summarize_storage
+from modules.models.utils import read_json, write_json
+
+logger = logging.getLogger('backfill data')
+logging.basicConfig(level=logging.INFO)
+
+
+class BackfillJob:
+    """
+    Class for backfilling the history of all the asset pairs targeted by a collector, page by page.
+
+    Only committed candles are stored, they replace stored candles having the same timestamp. Pages of an asset pair
+    are stored together (every `backfill_pages_per_write` pages, and once caught up), the cursor of the asset pair
+    is persisted after each write, so that an interrupted backfill resumes from the last stored page.
+    """
+
+    def __init__(self, collector: KrakenDataCollector, storage: Storage, cursor_path: str):
+        self.collector = collector
+        self.storage = storage
+        self.cursor_path = cursor_path
+        self.cursors = {}
+
+    def read_cursors(self) -> None:
+        """
+        Load the progress of a previous backfill, if any.
+        """
+        try:
+            self.cursors = read_json(path=self.cursor_path)
+        except NoExistingFile:
+            self.cursors = {}
+
+    def write_cursors(self) -> None:
+        """
+        Persist the progress of the backfill.
+        """
+        write_json(data=self.cursors, path=self.cursor_path)
+
+    def backfill_asset_pair(self, asset_pair: str) -> int:
+        """
+        Backfill the history of an asset pair, from its cursor until caught up.
+
+        :param asset_pair: targeted asset pair
+        :return: number of candles stored
+        """
+        cursor = self.cursors.setdefault(asset_pair, {'since': 0, 'done': False})
+        timestamp_index = self.collector.ohlc_data_settings['data_index']['timestamp']
+        pages_per_write = int(self.collector.collection_settings['backfill_pages_per_write'])
+        since, done = cursor['since'], cursor['done']
+        pages = []
+        nbr_of_candles = 0
+        while not done:
+            page, last = self.collector.get_ohlc_page(
+                asset_pair=asset_pair,
+                interval_in_minutes=self.collector.collection_settings['query_period_in_minutes'],
+                starting_timestamp=since
+            )
+            pages.append([candle for candle in page if since <= candle[timestamp_index] < last])
+            done = len(page) < int(self.collector.collection_settings['ohlc_page_size']) or last <= since
+            since = max(last, since)
+
+            if done or len(pages) >= pages_per_write:
+                df = self.collector.parse_ohlc_asset_data(
+                    asset_pair=asset_pair,
+                    ohlc_asset_data=[candle for committed in pages for candle in committed]
+                )
+                if len(df):
+                    self.storage.upsert(df)
+                    self.collector.update_watermarks(new_data_df=df)
+                    nbr_of_candles += len(df)
+                pages = []
+                cursor.update(since=since, done=done)
+                self.write_cursors()
+        return nbr_of_candles
+
+    def run(self) -> Dict[str, int]:
+        """
+        Backfill all the asset pairs targeted by the collector, skipping the ones already done.
+
+        :return: number of candles stored for each asset pair
+        """
+        self.read_cursors()
+        stored = {}
+        for asset_pair in self.collector.assets:
+            logger.info(
+                f"{time.strftime('%Y-%m-%d %H:%M:%S')} : backfilling asset pair {asset_pair}"
+            )
+            stored[asset_pair] = self.backfill_asset_pair(asset_pair=asset_pair)
+        return stored
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backfill OHLC history from Kraken.')
+    parser.add_argument('--interval', default=None, help='interval in minutes, default one if not provided')
+    args = parser.parse_args()
+
+    with KrakenDataCollector() as kdc:  # the session of the client is released even if the backfill fails
+        kdc.clean_assets(kdc.get_assets())
+        if args.interval is not None:
+            kdc = kdc.for_interval(interval_in_minutes=args.interval)
+        try:
+            kdc.read_watermarks(kdc.collection_settings['watermarks_path'])
+        except NoExistingFile as err:
+            logger.error(f"{err}")
+
+        storage = get_storage(
+            path=kdc.collection_settings['storage_path'],
+            backend=kdc.collection_settings['storage_backend']
+        )
+        job = BackfillJob(
+            collector=kdc,
+            storage=storage,
+            cursor_path=kdc.collection_settings['backfill_cursor_path']
+        )
+        job.run()
+        kdc.write_watermarks(kdc.collection_settings['watermarks_path'])
+        write_json(data=summarize_storage(storage=storage), path=kdc.collection_settings['summary_path'])
+        logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Kraken client stats {kdc.kraken_client.stats.as_dict()}")
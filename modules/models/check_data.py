@@ -2,20 +2,112 @@
 Data checks.
 """
 
-from typing import List
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
 
+import numpy as np
 import pandas as pd
 
+from modules.models.config import OHLC_DATA
 from modules.models.exceptions import UnexpectedSchemaError
 
 
+@dataclass
+class DataQualityReport:
+    """Result of data checks, counts are numbers of rows."""
+
+    rows: int = 0
+    missing_columns: List[str] = field(default_factory=list)
+    dtype_mismatches: Dict[str, str] = field(default_factory=dict)
+    null_counts: Dict[str, int] = field(default_factory=dict)
+    duplicated_keys: int = 0
+    non_monotonic_timestamps: int = 0
+    gaps: int = 0
+    non_positive_prices: int = 0
+
+    @property
+    def null_rates(self) -> Dict[str, float]:
+        """
+        Get the rate of null values of each field having some.
+
+        :return: null rates
+        """
+        return {name: count / self.rows for name, count in self.null_counts.items()}
+
+    @property
+    def is_valid(self) -> bool:
+        """
+        Check whether no issue has been found.
+
+        :return: True if data passed all the checks
+        """
+        return not (
+            self.missing_columns or self.dtype_mismatches or self.null_counts or self.duplicated_keys or
+            self.non_monotonic_timestamps or self.gaps or self.non_positive_prices
+        )
+
+    def merge(self, other: 'DataQualityReport') -> 'DataQualityReport':
+        """
+        Merge with the report of other rows.
+
+        :param other: report of other rows
+        :return: report of all the rows
+        """
+        null_counts = dict(self.null_counts)
+        for name, count in other.null_counts.items():
+            null_counts[name] = null_counts.get(name, 0) + count
+        return DataQualityReport(
+            rows=self.rows + other.rows,
+            missing_columns=self.missing_columns + [
+                name for name in other.missing_columns if name not in self.missing_columns
+            ],
+            dtype_mismatches={**self.dtype_mismatches, **other.dtype_mismatches},
+            null_counts=null_counts,
+            duplicated_keys=self.duplicated_keys + other.duplicated_keys,
+            non_monotonic_timestamps=self.non_monotonic_timestamps + other.non_monotonic_timestamps,
+            gaps=self.gaps + other.gaps,
+            non_positive_prices=self.non_positive_prices + other.non_positive_prices
+        )
+
+    def as_dict(self) -> Dict:
+        """
+        Get the report as a dict.
+
+        :return: report
+        """
+        return {
+            'rows': self.rows,
+            'missing_columns': self.missing_columns,
+            'dtype_mismatches': self.dtype_mismatches,
+            'null_rates': self.null_rates,
+            'duplicated_keys': self.duplicated_keys,
+            'non_monotonic_timestamps': self.non_monotonic_timestamps,
+            'gaps': self.gaps,
+            'non_positive_prices': self.non_positive_prices
+        }
+
+
 class DataChecker:
     """
     Class for data checks.
+
+    All the checks are vectorized, they can be run on a whole df or chunk by chunk.
+    Timestamps of each asset pair are checked in row order, against the last timestamp seen
+    for the asset pair (in previous chunks, or in previously stored data if provided).
     """
 
-    def __init__(self, df: pd.DataFrame):
+    def __init__(
+            self,
+            df: Optional[pd.DataFrame] = None,
+            ohlc_data_settings: Dict = OHLC_DATA,
+            interval_in_minutes: Optional[str] = None,
+            previous_tmsp: Optional[Dict[str, int]] = None
+    ):
         self.df = df
+        self.ohlc_data_settings = ohlc_data_settings
+        self.interval_in_minutes = interval_in_minutes
+        self.previous_tmsp = previous_tmsp or {}
+        self.last_tmsp = dict(self.previous_tmsp)
 
     def check_schema(self, schema: List[str]) -> None:
         """
@@ -26,3 +118,67 @@ class DataChecker:
         """
         if not list(self.df.columns) == list(schema):
             raise UnexpectedSchemaError(expected_schema=schema)
+
+    def check(self) -> DataQualityReport:
+        """
+        Run all the checks on data.
+
+        :return: report of the checks
+        """
+        return self.check_chunks(chunks=[self.df])
+
+    def check_chunks(self, chunks: Iterable[pd.DataFrame]) -> DataQualityReport:
+        """
+        Run all the checks on data read chunk by chunk, ex. `Storage.iter_chunks()`.
+
+        Duplicated keys spread over several chunks are only detected when they are consecutive rows of an asset pair.
+
+        :param chunks: chunks of data
+        :return: report of the checks
+        """
+        self.last_tmsp = dict(self.previous_tmsp)
+        report = DataQualityReport()
+        for chunk in chunks:
+            report = report.merge(self.check_chunk(df=chunk))
+        return report
+
+    def check_chunk(self, df: pd.DataFrame) -> DataQualityReport:
+        """
+        Run all the checks on a chunk of data, following the previously checked chunks.
+
+        :param df: chunk of data
+        :return: report of the checks for the chunk
+        """
+        null_counts = df.isna().sum()
+        report = DataQualityReport(
+            rows=len(df),
+            missing_columns=[name for name in self.ohlc_data_settings['schema'] if name not in df.columns],
+            dtype_mismatches={
+                name: str(df[name].dtype) for name, dtype in self.ohlc_data_settings['dtypes'].items()
+                if name in df.columns and str(df[name].dtype) != dtype
+            },
+            null_counts={name: int(count) for name, count in null_counts.items() if count}
+        )
+
+        price_fields = [name for name in df.columns if name.endswith('_price')]
+        if price_fields:
+            report.non_positive_prices = int((df[price_fields].to_numpy() <= 0).any(axis=1).sum())
+
+        if df.empty or not {'asset_pair', 'tmsp'}.issubset(df.columns):
+            return report
+        report.duplicated_keys = int(df.duplicated(['asset_pair', 'tmsp']).sum())
+
+        grouped_tmsp = df.groupby('asset_pair', sort=False, observed=True)['tmsp']
+        previous = grouped_tmsp.shift(1)
+        is_first = previous.isna().to_numpy()
+        previous[is_first] = df['asset_pair'][is_first].astype(str).map(self.last_tmsp).to_numpy(dtype=np.float64)
+        delta = df['tmsp'].to_numpy(dtype=np.float64) - previous.to_numpy(dtype=np.float64)
+        report.duplicated_keys += int((is_first & (delta == 0)).sum())
+        report.non_monotonic_timestamps = int((delta < 0).sum())
+        if self.interval_in_minutes is not None:
+            report.gaps = int((delta > int(self.interval_in_minutes) * 60).sum())
+
+        self.last_tmsp.update(
+            {str(asset_pair): int(tmsp) for asset_pair, tmsp in grouped_tmsp.last().items()}
+        )
+        return report
@@ -4,22 +4,63 @@ Data collection from Kraken.
 
 from __future__ import annotations
 
+import asyncio
+import copy
 import json
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from math import isnan
-from typing import Dict, Optional, Union
+from typing import (Any, AsyncIterator, Coroutine, Dict, Iterator, List,
+                    Optional, Tuple, Union)
 
 import krakenex
-
-from modules.models.config import COLLECTION_SETTINGS, OHLC_DATA, Currency
-from modules.models.utils import (build_df_from_schema_and_data,
-                                  compute_max_for_given_filter)
+import numpy as np
+import pandas as pd
+
+from modules.models.check_data import DataChecker
+from modules.models.config import (COLLECTION_SETTINGS, KRAKEN_CLIENT_SETTINGS,
+                                   OHLC_DATA, ROLLUP_DATA, Currency)
+from modules.models.exceptions import (FileTypeNotHandled, NoExistingFile,
+                                       UnexpectedSchemaError)
+from modules.models.kraken_client import (AsyncKrakenClient,
+                                          RateLimitedKrakenClient)
+from modules.models.metrics import MetricsRegistry
+from modules.models.ohlc_store import OHLCStore
+from modules.models.rollups import get_rollup_storage, update_rollups
+from modules.models.storage import get_storage, merge_last_write_wins
+from modules.models.summary import summarize_storage, update_summary
+from modules.models.transport import build_session
+from modules.models.utils import (apply_dtypes, compute_max_by_group,
+                                  read_json, suffix_path, write_json)
 
 logger = logging.getLogger('collect data')
 logging.basicConfig(level=logging.INFO)
 
 
+def get_interval_settings(collection_settings: Dict, interval_in_minutes: str) -> Dict:
+    """
+    Get collection settings for a given interval.
+
+    Data of the default interval (`query_period_in_minutes`) is stored at the configured paths,
+    data of other intervals is stored at paths suffixed by the interval, ex. data.csv -> data_60m.csv.
+
+    :param collection_settings: collection settings
+    :param interval_in_minutes: targeted interval
+    :return: collection settings for the interval
+    """
+    interval_settings = {**collection_settings, 'query_period_in_minutes': interval_in_minutes}
+    if interval_in_minutes != collection_settings['query_period_in_minutes']:
+        for path_setting in ('storage_path', 'watermarks_path', 'backfill_cursor_path', 'rollups_path',
+                             'summary_path'):
+            interval_settings[path_setting] = suffix_path(
+                path=collection_settings[path_setting],
+                suffix=f'_{interval_in_minutes}m'
+            )
+    return interval_settings
+
+
 class KrakenDataCollector:
     """
     Class for data ingestion from Kraken API.
@@ -30,13 +71,70 @@ class KrakenDataCollector:
             collection_settings: Dict[str, str] = COLLECTION_SETTINGS,
             ohlc_data_settings: Dict = OHLC_DATA,
             update_asset_pairs_file: bool = False,
-            kraken_client: krakenex.api.API = krakenex.API(key=os.environ.get('KRAKEN_KEY'))
+            kraken_client: Optional[krakenex.api.API] = None,
+            client_settings: Dict = KRAKEN_CLIENT_SETTINGS,
+            metrics: Optional[MetricsRegistry] = None
     ):
-        self.collection_settings = collection_settings
+        self.collection_settings = {**COLLECTION_SETTINGS, **collection_settings}
         self.ohlc_data_settings = ohlc_data_settings
-        self.kraken_client = kraken_client
+        self.metrics = metrics or MetricsRegistry()
+        self.kraken_client = self.build_kraken_client(kraken_client=kraken_client, client_settings=client_settings)
         self.update_asset_pairs_file = update_asset_pairs_file
         self.assets = {}
+        self.watermarks = {}
+
+    def build_kraken_client(
+            self,
+            kraken_client: Optional[krakenex.api.API],
+            client_settings: Dict
+    ) -> RateLimitedKrakenClient:
+        """
+        Wrap the Kraken client into a rate limited one.
+
+        If not provided, the Kraken client is authenticated with `KRAKEN_KEY`, and its calls go through
+        a pooled session sized for the workers of the collector (see `build_session`).
+
+        :param kraken_client: Kraken client
+        :param client_settings: call budget and retries settings
+        :return: the rate limited client
+        """
+        if kraken_client is None:
+            kraken_client = krakenex.API(key=os.environ.get('KRAKEN_KEY'))
+            kraken_client.session = build_session(
+                pool_size=int(self.collection_settings['max_workers']),
+                metrics=self.metrics,
+                user_agent=kraken_client.session.headers['User-Agent']
+            )
+        return RateLimitedKrakenClient(kraken_client=kraken_client, client_settings=client_settings)
+
+    def close(self) -> None:
+        """
+        Release the resources of the collector: the pooled session of the Kraken client.
+        """
+        self.kraken_client.kraken_client.close()
+
+    def __enter__(self) -> KrakenDataCollector:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def for_interval(self, interval_in_minutes: str) -> KrakenDataCollector:
+        """
+        Get a collector for another interval, with its own settings and watermarks.
+
+        The Kraken client (and its call budget), the metrics registry and the asset pairs are shared.
+
+        :param interval_in_minutes: targeted interval
+        :return: the collector
+        """
+        collector = copy.copy(self)
+        collector.collection_settings = get_interval_settings(
+            collection_settings=self.collection_settings,
+            interval_in_minutes=interval_in_minutes
+        )
+        collector.watermarks = {}
+        return collector
 
     def get_assets(self) -> Dict:
         """
@@ -54,10 +152,11 @@ class KrakenDataCollector:
         }
 
         :return: assets pairs
-        :raises: ValueError: if Kraken API not available
+        :raises KrakenAPIError: if Kraken API not available
         """
 
-        asset_pairs = self.kraken_client.query_public('AssetPairs')
+        with self.metrics.timer('get_assets'):
+            asset_pairs = self.kraken_client.query_public('AssetPairs')
         return asset_pairs['result']
 
     def clean_assets(
@@ -74,31 +173,32 @@ class KrakenDataCollector:
 
         :return: cleaned asset pairs
         """
-        cleaned_asset_pairs = {
-            p: {
-                'wsname': raw_api_assets_pairs[p]['wsname'],
-                'asset': raw_api_assets_pairs[p]['wsname'].split('/')[0],
-                'currency': raw_api_assets_pairs[p]['wsname'].split('/')[1]
-            }
-            for p in raw_api_assets_pairs
-        }
-
-        if keep_common_currencies:
+        with self.metrics.timer('clean_assets'):
             cleaned_asset_pairs = {
-                k: v for k, v in cleaned_asset_pairs.items()
-                if k.endswith(tuple([e.value for e in Currency]))
+                p: {
+                    'wsname': raw_api_assets_pairs[p]['wsname'],
+                    'asset': raw_api_assets_pairs[p]['wsname'].split('/')[0],
+                    'currency': raw_api_assets_pairs[p]['wsname'].split('/')[1]
+                }
+                for p in raw_api_assets_pairs
             }
 
+            if keep_common_currencies:
+                cleaned_asset_pairs = {
+                    k: v for k, v in cleaned_asset_pairs.items()
+                    if k.endswith(tuple([e.value for e in Currency]))
+                }
+
         self.assets = cleaned_asset_pairs
 
-    def get_ohlc_data(
+    def get_ohlc_page(
             self,
             asset_pair: str,
             interval_in_minutes: str,
             starting_timestamp: int
-    ) -> Dict:
+    ) -> Tuple[List[List], int]:
         """
-        Collect OHLC (movement of prices) data from Kraken API.
+        Collect a page of OHLC (movement of prices) data from Kraken API.
 
         The API returns an object with this pattern:
         {
@@ -126,123 +226,235 @@ class KrakenDataCollector:
                         91
                     ],
                     ...
-                ]
+                ],
+                'last': 1672617600
             }
         }
+        The last candle is the current one (not committed yet), `last` is the cursor for the next page.
 
         :param asset_pair: name of the asset pair
         :param interval_in_minutes: range of the time interval for the research
         :param starting_timestamp: from when the research should start
-        :return: OHLC data for the given asset pair
-        """
-        ohlc_data = self.kraken_client.query_public(
-            'OHLC',
-            {
-                'pair': asset_pair,
-                'interval': interval_in_minutes,
-                'since': starting_timestamp
-            }
-        )
-        return ohlc_data['result'][asset_pair]
+        :return: OHLC data for the given asset pair, and the cursor for the next page
+        :raises KrakenAPIError: if Kraken API not available
+        """
+        with self.metrics.timer('get_ohlc_page', labels={'interval': interval_in_minutes, 'asset_pair': asset_pair}):
+            ohlc_data = self.kraken_client.query_public(
+                'OHLC',
+                {
+                    'pair': asset_pair,
+                    'interval': interval_in_minutes,
+                    'since': starting_timestamp
+                }
+            )
+        return ohlc_data['result'][asset_pair], int(ohlc_data['result'].get('last', 0))
+
+    def iter_ohlc_pages(
+            self,
+            asset_pair: str,
+            interval_in_minutes: str,
+            starting_timestamp: int
+    ) -> Iterator[List[List]]:
+        """
+        Collect pages of OHLC (movement of prices) data from Kraken API, paging with the `last` cursor until caught up.
+
+        Kraken caps each response (see `ohlc_page_size`), so pages are requested until a page is not full,
+        the cursor stops moving forward, or `max_pages` is reached.
+
+        :param asset_pair: name of the asset pair
+        :param interval_in_minutes: range of the time interval for the research
+        :param starting_timestamp: from when the research should start
+        :return: pages of OHLC data for the given asset pair, consecutive pages may share a candle
+        :raises KrakenAPIError: if Kraken API not available
+        """
+        since = starting_timestamp
+        for _ in range(int(self.collection_settings['max_pages'])):
+            page, last = self.get_ohlc_page(
+                asset_pair=asset_pair,
+                interval_in_minutes=interval_in_minutes,
+                starting_timestamp=since
+            )
+            self.metrics.increment('ohlc_pages', labels={'interval': interval_in_minutes})
+            yield page
+            if len(page) < int(self.collection_settings['ohlc_page_size']) or last <= since:
+                break
+            since = last
 
     def compute_starting_timestamp(self, last_tmsp: Union[int, float]) -> int:
         """
         Compute the next starting timestamp based of provided timestamp and config.
 
+        The last candle ingested may have been still open, it is fetched again (and upserted):
+        the query starts one interval before it (timestamps are in seconds, intervals in minutes).
+
         :param last_tmsp: last timestamp registered
         :return: next starting timestamp
         """
         if not isnan(last_tmsp):
-            since = last_tmsp + int(self.collection_settings['query_period_in_minutes'])
+            since = max(int(last_tmsp) - int(self.collection_settings['query_period_in_minutes']) * 60, 0)
         else:
             since = 0
         return since
 
-    def get_differential_ohlc_asset_data(
-            self,
-            asset_pair: str,
-            existing_data_df: pd.DataFrame
-    ) -> pd.DataFrame:
+    def build_watermarks(self, existing_data_df: pd.DataFrame) -> None:
         """
-        Collect data from Kraken API, starting from last ingested data for each asset pair.
+        Index the last timestamp ingested for each asset pair, in a single pass over existing data.
 
-        :param asset_pair: targeted asset pair
         :param existing_data_df: existing data (already ingested)
-        :return: augmented data (existing data + new data)
         """
+        self.watermarks = {
+            asset_pair: int(max_tmsp)
+            for asset_pair, max_tmsp in compute_max_by_group(
+                df=existing_data_df,
+                maxed_field='tmsp',
+                group_field='asset_pair'
+            ).items()
+            if not isnan(max_tmsp)
+        }
 
-        max_timestamp = compute_max_for_given_filter(
-            df=existing_data_df,
-            maxed_field='tmsp',
-            filter_field='asset_pair',
-            filter_value=asset_pair,
-        )
-        starting_timestamp = self.compute_starting_timestamp(last_tmsp=max_timestamp)
+    def read_watermarks(self, path: str) -> None:
+        """
+        Load the last timestamp ingested for each asset pair from a sidecar file.
 
-        ohlc_asset_data = self.get_ohlc_data(
-            asset_pair=asset_pair,
-            interval_in_minutes=self.collection_settings['query_period_in_minutes'],
-            starting_timestamp=starting_timestamp
+        :param path: full path of the sidecar file
+        :raises NoExistingFile: if the sidecar file does not exist
+        """
+        self.watermarks = read_json(path=path)
+
+    def write_watermarks(self, path: str) -> None:
+        """
+        Persist the last timestamp ingested for each asset pair to a sidecar file.
+
+        :param path: full path of the sidecar file
+        """
+        write_json(data=self.watermarks, path=path)
+
+    def update_watermarks(self, new_data_df: pd.DataFrame) -> None:
+        """
+        Move watermarks forward regarding newly collected data.
+
+        :param new_data_df: new data
+        """
+        new_watermarks = compute_max_by_group(df=new_data_df, maxed_field='tmsp', group_field='asset_pair')
+        for asset_pair, max_tmsp in new_watermarks.items():
+            self.watermarks[asset_pair] = max(int(max_tmsp), self.watermarks.get(asset_pair, 0))
+
+    def drop_already_ingested(self, new_data_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Only keep rows newer than the watermark of their asset pair, or at the watermark.
+
+        The candle at the watermark may have been ingested while still open, it is kept to be upserted.
+
+        :param new_data_df: new data (categorical asset pairs)
+        :return: rows that have not been ingested yet, or that replace the last ingested one
+        """
+        asset_pairs = new_data_df['asset_pair'].cat
+        watermarks = np.array(
+            [self.watermarks.get(asset_pair, -1) for asset_pair in asset_pairs.categories],
+            dtype=np.int64
         )
+        is_new = new_data_df['tmsp'].values >= watermarks[asset_pairs.codes.values]
+        if is_new.all():
+            return new_data_df
+        return new_data_df[is_new].reset_index(drop=True)
 
-        nbr_of_points = len(ohlc_asset_data)
-        asset_time_list = [
-            time.strftime(
-                '%Y-%m-%d %H:%M:%S',
-                time.localtime(ohlc_asset_data[i][self.ohlc_data_settings['data_index']['timestamp']])
-            )
-            for i in range(nbr_of_points)
-        ]  # raw period
-        asset_tmsp_list = [
-            ohlc_asset_data[i][self.ohlc_data_settings['data_index']['timestamp']]
-            for i in range(nbr_of_points)
-        ]
-        asset_open_prices = [
-            ohlc_asset_data[i][self.ohlc_data_settings['data_index']['opening_price']]
-            for i in range(nbr_of_points)
-        ]  # price at the beginning of the period
-        asset_close_prices = [
-            ohlc_asset_data[i][self.ohlc_data_settings['data_index']['ending_price']]
-            for i in range(nbr_of_points)
-        ]  # price at the end of the period
-        asset_volumes = [
-            ohlc_asset_data[i][self.ohlc_data_settings['data_index']['volume']]
-            for i in range(nbr_of_points)
-        ]  # number of shares traded
-
-        asset_pairs = [asset_pair] * nbr_of_points
-        wsnames = [self.assets[asset_pair]['wsname']] * nbr_of_points
-        assets = [self.assets[asset_pair]['asset']] * nbr_of_points
-        currencies = [self.assets[asset_pair]['currency']] * nbr_of_points
-
-        new_data_df = build_df_from_schema_and_data(
-            schema=self.ohlc_data_settings['schema'],
-            data=[
-                asset_pairs, wsnames, assets, currencies, asset_time_list,
-                asset_tmsp_list, asset_open_prices, asset_close_prices, asset_volumes
-            ]
+    def collect_differential_ohlc_asset_data(self, asset_pair: str, store: OHLCStore) -> None:
+        """
+        Collect data from Kraken API, starting from last ingested data (see watermarks) for the asset pair.
+
+        Pages are appended to the store as soon as they are received.
+
+        :param asset_pair: targeted asset pair
+        :param store: store of the collected candles
+        """
+        starting_timestamp = self.compute_starting_timestamp(
+            last_tmsp=self.watermarks.get(asset_pair, float('nan'))
         )
-        data = pd.concat([existing_data_df, new_data_df])
-        return data
+        for page in self.iter_ohlc_pages(
+                asset_pair=asset_pair,
+                interval_in_minutes=self.collection_settings['query_period_in_minutes'],
+                starting_timestamp=starting_timestamp
+        ):
+            store.append(asset_pair=asset_pair, candles=page)
+
+    def parse_ohlc_asset_data(self, asset_pair: str, ohlc_asset_data: List[List]) -> pd.DataFrame:
+        """
+        Parse raw OHLC data from Kraken API into typed columns (see `OHLCStore`).
 
-    def get_differential_ohlc_data(self, existing_data_df: pd.DataFrame) -> pd.DataFrame:
+        - prices and volumes are float64, timestamps are int64
+        - time is derived from timestamps (UTC)
+        - asset pair metadata are categorical
+
+        :param asset_pair: name of the asset pair
+        :param ohlc_asset_data: OHLC data for the given asset pair, as provided by Kraken API
+        :return: data for the asset pair
+        """
+        store = OHLCStore(asset_pairs={asset_pair: self.assets[asset_pair]}, ohlc_data_settings=self.ohlc_data_settings)
+        store.append(asset_pair=asset_pair, candles=ohlc_asset_data)
+        return store.to_frame()
+
+    def get_new_ohlc_data(self, existing_data_df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
         """
-        Merge data collected from Kraken API, for all the assets targeted.
+        Collect new data from Kraken API, for all the assets targeted.
+
+        Asset pairs are fetched concurrently by a bounded pool of workers
+        (see `max_workers` in collection settings), results are ordered as `self.assets`.
+        Only the new data is gathered in a shared store, it is converted into a df once all asset pairs are collected,
+        and rows that are older than the watermark of their asset pair are dropped.
+        Watermarks are rebuilt from existing data when it is provided, otherwise the current ones are used
+        (see `read_watermarks`). They are moved forward with the new data.
 
         :param existing_data_df: existing data (already ingested)
-        :return: the concatened data
+        :return: new data for all the assets
         """
-        data = pd.DataFrame()
-        for asset in self.assets:
+        if existing_data_df is not None:
+            self.build_watermarks(existing_data_df=existing_data_df)
+
+        store = OHLCStore(asset_pairs=self.assets, ohlc_data_settings=self.ohlc_data_settings)
+
+        def collect_asset_data(asset: str) -> None:
             logger.info(
                 f"{time.strftime('%Y-%m-%d %H:%M:%S')} : trying to collect data for asset pair {asset}"
             )
-            asset_data = self.get_differential_ohlc_asset_data(
-                asset_pair=asset, existing_data_df=existing_data_df
-            )
-            data = pd.concat([data, asset_data]).copy()
+            self.collect_differential_ohlc_asset_data(asset_pair=asset, store=store)
+
+        with ThreadPoolExecutor(max_workers=int(self.collection_settings['max_workers'])) as executor:
+            list(executor.map(collect_asset_data, self.assets))
+        return self.assemble_new_data(store=store)
+
+    def assemble_new_data(self, store: OHLCStore) -> pd.DataFrame:
+        """
+        Convert new data of all the asset pairs into a df, drop rows already ingested and move watermarks forward.
+
+        :param store: store of the collected candles
+        :return: new data for all the assets
+        """
+        if not store.asset_pairs:
+            return pd.DataFrame(columns=self.ohlc_data_settings['schema'])
+        interval_labels = {'interval': self.collection_settings['query_period_in_minutes']}
+        self.metrics.increment('ohlc_store_bytes', value=store.nbytes, labels=interval_labels)
+        with self.metrics.timer('assemble_dataframe', labels=interval_labels):
+            new_data_df = self.drop_already_ingested(new_data_df=store.to_frame())
+            self.update_watermarks(new_data_df=new_data_df)
+        self.metrics.increment('rows_ingested', value=len(new_data_df), labels=interval_labels)
+        return new_data_df
+
+    def get_differential_ohlc_data(self, existing_data_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Merge data collected from Kraken API, for all the assets targeted, with existing data.
 
-        return data
+        Rows of existing data having the same (asset pair, timestamp) as new data are replaced by new data.
+
+        :param existing_data_df: existing data (already ingested)
+        :return: the merged data (existing data + new data), sorted by asset pair and timestamp
+        """
+        new_data_df = self.get_new_ohlc_data(existing_data_df=existing_data_df)
+        if existing_data_df.empty:
+            return new_data_df
+        return apply_dtypes(
+            df=merge_last_write_wins(frames=[existing_data_df, new_data_df], keys=['asset_pair', 'tmsp']),
+            dtypes=self.ohlc_data_settings['dtypes']
+        )
 
     def perform_asset_pairs_file_update(self, file_path: str) -> None:
         """
@@ -255,48 +467,324 @@ class KrakenDataCollector:
                 json.dump(self.assets, jsn, sort_keys=True, indent=4)
 
 
-if __name__ == '__main__':
-    import logging
-    import time
+class AsyncKrakenDataCollector(KrakenDataCollector):
+    """
+    Class for data ingestion from Kraken API, with an asyncio client.
+
+    Per asset pair requests are fanned out on an event loop, under a semaphore of `max_workers` asset pairs,
+    and share the pooled keep-alive connections of the client.
+    The blocking methods of `KrakenDataCollector` are kept as a facade running the coroutines on the event loop
+    of the collector, so that the collector can be used by `run_collection` and the backfill.
+    `close` must be called once the collector is not used anymore.
+    """
+
+    def __init__(
+            self,
+            collection_settings: Dict[str, str] = COLLECTION_SETTINGS,
+            ohlc_data_settings: Dict = OHLC_DATA,
+            update_asset_pairs_file: bool = False,
+            kraken_client: Optional[AsyncKrakenClient] = None,
+            client_settings: Dict = KRAKEN_CLIENT_SETTINGS,
+            metrics: Optional[MetricsRegistry] = None
+    ):
+        super().__init__(
+            collection_settings=collection_settings,
+            ohlc_data_settings=ohlc_data_settings,
+            update_asset_pairs_file=update_asset_pairs_file,
+            kraken_client=kraken_client,
+            client_settings=client_settings,
+            metrics=metrics
+        )
+        self.loop = asyncio.new_event_loop()
 
-    import pandas as pd
+    def build_kraken_client(
+            self,
+            kraken_client: Optional[AsyncKrakenClient],
+            client_settings: Dict
+    ) -> AsyncKrakenClient:
+        """
+        Get the asyncio client, it enforces the call budget itself.
 
-    from modules.models.check_data import DataChecker
-    from modules.models.exceptions import (FileTypeNotHandled, NoExistingFile,
-                                           UnexpectedSchemaError)
-    from modules.models.utils import read_csv_as_df
+        :param kraken_client: asyncio client, built from client settings if not provided
+        :param client_settings: call budget, retries and connection pool settings
+        :return: the asyncio client
+        """
+        return kraken_client or AsyncKrakenClient(client_settings=client_settings)
 
-    logger = logging.getLogger(__name__)
-    logging.basicConfig(level=logging.INFO)
+    def run(self, coroutine: Coroutine[Any, Any, Any]) -> Any:
+        """
+        Run a coroutine on the event loop of the collector (shared with collectors of other intervals).
 
-    kdc = KrakenDataCollector()
-    raw_assets = kdc.get_assets()
-    kdc.clean_assets(raw_assets)
+        :param coroutine: the coroutine
+        :return: its result
+        """
+        return self.loop.run_until_complete(coroutine)
 
-    try:
-        existing_df = read_csv_as_df(path=kdc.collection_settings['storage_path'])
-    except (FileTypeNotHandled, NoExistingFile) as err:
-        logger.error(
-            f"{err}"
-        )
-        existing_df = pd.DataFrame(
-            columns=kdc.ohlc_data_settings['schema']
-        )
+    def close(self) -> None:
+        """
+        Close the connections of the client and the event loop.
+        """
+        self.run(self.kraken_client.close())
+        self.loop.close()
+
+    async def fetch_assets(self) -> Dict:
+        """
+        Collect asset pairs from Kraken API (see `get_assets`).
 
-    data_checker = DataChecker(df=existing_df)
+        :return: assets pairs
+        :raises KrakenAPIError: if Kraken API not available
+        """
+        with self.metrics.timer('get_assets'):
+            asset_pairs = await self.kraken_client.query_public('AssetPairs')
+        return asset_pairs['result']
+
+    async def fetch_ohlc_page(
+            self,
+            asset_pair: str,
+            interval_in_minutes: str,
+            starting_timestamp: int
+    ) -> Tuple[List[List], int]:
+        """
+        Collect a page of OHLC data from Kraken API (see `get_ohlc_page`).
+
+        :param asset_pair: name of the asset pair
+        :param interval_in_minutes: range of the time interval for the research
+        :param starting_timestamp: from when the research should start
+        :return: OHLC data for the given asset pair, and the cursor for the next page
+        :raises KrakenAPIError: if Kraken API not available
+        """
+        with self.metrics.timer('get_ohlc_page', labels={'interval': interval_in_minutes, 'asset_pair': asset_pair}):
+            ohlc_data = await self.kraken_client.query_public(
+                'OHLC',
+                {
+                    'pair': asset_pair,
+                    'interval': interval_in_minutes,
+                    'since': starting_timestamp
+                }
+            )
+        return ohlc_data['result'][asset_pair], int(ohlc_data['result'].get('last', 0))
+
+    async def fetch_ohlc_pages(
+            self,
+            asset_pair: str,
+            interval_in_minutes: str,
+            starting_timestamp: int
+    ) -> AsyncIterator[List[List]]:
+        """
+        Collect pages of OHLC data from Kraken API, paging with the `last` cursor until caught up (see `iter_ohlc_pages`).
+
+        :param asset_pair: name of the asset pair
+        :param interval_in_minutes: range of the time interval for the research
+        :param starting_timestamp: from when the research should start
+        :return: pages of OHLC data for the given asset pair, consecutive pages may share a candle
+        :raises KrakenAPIError: if Kraken API not available
+        """
+        since = starting_timestamp
+        for _ in range(int(self.collection_settings['max_pages'])):
+            page, last = await self.fetch_ohlc_page(
+                asset_pair=asset_pair,
+                interval_in_minutes=interval_in_minutes,
+                starting_timestamp=since
+            )
+            self.metrics.increment('ohlc_pages', labels={'interval': interval_in_minutes})
+            yield page
+            if len(page) < int(self.collection_settings['ohlc_page_size']) or last <= since:
+                break
+            since = last
+
+    async def fetch_differential_ohlc_asset_data(
+            self,
+            asset_pair: str,
+            store: OHLCStore,
+            semaphore: asyncio.Semaphore
+    ) -> None:
+        """
+        Collect data from Kraken API, starting from the watermark of the asset pair, into the store.
+
+        :param asset_pair: targeted asset pair
+        :param store: store of the collected candles
+        :param semaphore: bounds the number of asset pairs fetched concurrently
+        """
+        async with semaphore:
+            logger.info(
+                f"{time.strftime('%Y-%m-%d %H:%M:%S')} : trying to collect data for asset pair {asset_pair}"
+            )
+            async for page in self.fetch_ohlc_pages(
+                    asset_pair=asset_pair,
+                    interval_in_minutes=self.collection_settings['query_period_in_minutes'],
+                    starting_timestamp=self.compute_starting_timestamp(
+                        last_tmsp=self.watermarks.get(asset_pair, float('nan'))
+                    )
+            ):
+                store.append(asset_pair=asset_pair, candles=page)
+
+    async def collect_all(self, existing_data_df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Collect new data from Kraken API, for all the assets targeted (see `get_new_ohlc_data`).
+
+        Requests of all the asset pairs are fanned out at once, at most `max_workers` asset pairs are fetched
+        concurrently. Results are ordered as `self.assets`.
+
+        :param existing_data_df: existing data (already ingested)
+        :return: new data for all the assets
+        :raises KrakenAPIError: if Kraken API not available
+        """
+        if existing_data_df is not None:
+            self.build_watermarks(existing_data_df=existing_data_df)
+
+        store = OHLCStore(asset_pairs=self.assets, ohlc_data_settings=self.ohlc_data_settings)
+        semaphore = asyncio.Semaphore(int(self.collection_settings['max_workers']))
+        await asyncio.gather(*(
+            self.fetch_differential_ohlc_asset_data(asset_pair=asset_pair, store=store, semaphore=semaphore)
+            for asset_pair in self.assets
+        ))
+        return self.assemble_new_data(store=store)
+
+    def get_assets(self) -> Dict:
+        """
+        Collect asset pairs from Kraken API, blocking until done.
+
+        :return: assets pairs
+        :raises KrakenAPIError: if Kraken API not available
+        """
+        return self.run(self.fetch_assets())
+
+    def get_ohlc_page(
+            self,
+            asset_pair: str,
+            interval_in_minutes: str,
+            starting_timestamp: int
+    ) -> Tuple[List[List], int]:
+        """
+        Collect a page of OHLC data from Kraken API, blocking until done.
+
+        :param asset_pair: name of the asset pair
+        :param interval_in_minutes: range of the time interval for the research
+        :param starting_timestamp: from when the research should start
+        :return: OHLC data for the given asset pair, and the cursor for the next page
+        :raises KrakenAPIError: if Kraken API not available
+        """
+        return self.run(self.fetch_ohlc_page(
+            asset_pair=asset_pair,
+            interval_in_minutes=interval_in_minutes,
+            starting_timestamp=starting_timestamp
+        ))
+
+    def get_new_ohlc_data(self, existing_data_df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Collect new data from Kraken API, for all the assets targeted, blocking until done.
+
+        :param existing_data_df: existing data (already ingested)
+        :return: new data for all the assets
+        :raises KrakenAPIError: if Kraken API not available
+        """
+        return self.run(self.collect_all(existing_data_df=existing_data_df))
+
+
+def run_collection(kdc: KrakenDataCollector) -> None:
+    """
+    Collect new data for all the assets targeted and upsert it into storage.
+
+    Watermarks are read from their sidecar file, or rebuilt from storage if it does not exist.
+    New data is checked against the watermarks, issues are logged.
+    Storage is overwritten if it does not exist or if its schema is unexpected.
+    Rollups are then updated for the time buckets touched by new data, and the summary of stored data
+    is updated with new data (it is rebuilt from storage if it does not exist).
+    Each stage is timed in the metrics registry of the collector, labelled by interval.
+
+    :param kdc: collector, with asset pairs already cleaned
+    """
+    interval_labels = {'interval': kdc.collection_settings['query_period_in_minutes']}
+    storage = get_storage(
+        path=kdc.collection_settings['storage_path'],
+        backend=kdc.collection_settings['storage_backend']
+    )
+    overwrite = False
     try:
-        data_checker.check_schema(schema=kdc.ohlc_data_settings['schema'])
-    except UnexpectedSchemaError as err:
+        kdc.read_watermarks(kdc.collection_settings['watermarks_path'])
+    except NoExistingFile as err:
         logger.error(
             f"{err}"
         )
-        existing_df = pd.DataFrame(
-            columns=kdc.ohlc_data_settings['schema']
+        try:
+            kdc.build_watermarks(existing_data_df=storage.read(columns=['asset_pair', 'tmsp']))
+        except (FileTypeNotHandled, NoExistingFile, UnexpectedSchemaError) as err:
+            logger.error(
+                f"{err}"
+            )
+            overwrite = True
+
+    # new data restarts at the last ingested candle, which is replaced: it is checked as following the previous one
+    interval_in_seconds = int(kdc.collection_settings['query_period_in_minutes']) * 60
+    previous_tmsp = {asset_pair: tmsp - interval_in_seconds for asset_pair, tmsp in kdc.watermarks.items()}
+    df = kdc.get_new_ohlc_data()
+    with kdc.metrics.timer('check_data', labels=interval_labels):
+        report = DataChecker(
+            df=df,
+            ohlc_data_settings=kdc.ohlc_data_settings,
+            interval_in_minutes=kdc.collection_settings['query_period_in_minutes'],
+            previous_tmsp=previous_tmsp
+        ).check()
+    if report.is_valid:
+        logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Data checks passed on {report.rows} new rows")
+    else:
+        logger.warning(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Data checks failed {report.as_dict()}")
+    logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Pushing data to {storage.path}")
+    with kdc.metrics.timer('storage_write', labels=interval_labels):
+        if overwrite:
+            storage.write(df)
+        else:
+            storage.upsert(df)
+    kdc.metrics.increment('bytes_written', value=storage.bytes_written, labels=interval_labels)
+    logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Data available in {storage.path}")
+
+    with kdc.metrics.timer('update_rollups', labels=interval_labels):
+        update_rollups(
+            raw_storage=storage,
+            rollup_storages={
+                granularity: get_rollup_storage(collection_settings=kdc.collection_settings, granularity=granularity)
+                for granularity in ROLLUP_DATA['granularities']
+            },
+            new_data_df=None if overwrite else df
         )
+    logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Rollups updated")
+
+    with kdc.metrics.timer('update_summary', labels=interval_labels):
+        summary = None
+        if not overwrite:
+            try:
+                summary = update_summary(summary=read_json(path=kdc.collection_settings['summary_path']), new_data_df=df)
+            except NoExistingFile as err:
+                logger.error(f"{err}")
+        if summary is None:
+            summary = summarize_storage(storage=storage)
+        write_json(data=summary, path=kdc.collection_settings['summary_path'])
+
+    kdc.write_watermarks(kdc.collection_settings['watermarks_path'])
 
-    df = kdc.get_differential_ohlc_data(existing_data_df=existing_df)
-    logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Pushing data to s3")
-    df.to_csv(kdc.collection_settings["storage_path"], index=False)
-    logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Data available in s3")
 
-    kdc.perform_asset_pairs_file_update('data/pairs.json')
+if __name__ == '__main__':
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(level=logging.INFO)
+
+    if COLLECTION_SETTINGS['async_client']:
+        kdc = AsyncKrakenDataCollector()
+    else:
+        kdc = KrakenDataCollector()
+    with kdc:  # the session (and event loop) of the client are released even if the collection fails
+        raw_assets = kdc.get_assets()
+        kdc.clean_assets(raw_assets)
+
+        for interval in kdc.collection_settings['intervals_in_minutes']:
+            logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Collecting data for interval {interval} minutes")
+            run_collection(kdc.for_interval(interval_in_minutes=interval))
+
+        logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Kraken client stats {kdc.kraken_client.stats.as_dict()}")
+        for counter, value in kdc.kraken_client.stats.as_dict().items():
+            kdc.metrics.increment(f'kraken_client_{counter}', value=value)
+        kdc.metrics.write(path=kdc.collection_settings['metrics_path'])
+        logger.info(
+            f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Run report available in {kdc.collection_settings['metrics_path']}"
+        )
+
+        kdc.perform_asset_pairs_file_update('data/pairs.json')
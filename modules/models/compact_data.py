@@ -0,0 +1,77 @@
+"""
+Compaction of stored OHLC data.
+
+Appends made by collections (and flushes of the stream) are stored as segments, this merges them,
+for the data and the rollups of each interval.
+It is meant to be run periodically, separately from collections.
+The whole history is then checked, chunk by chunk.
+"""
+
+import argparse
+import logging
+import time
+from typing import Dict, List, Optional
+
+from modules.models.check_data import DataChecker, DataQualityReport
+from modules.models.collect_data import get_interval_settings
+from modules.models.config import (COLLECTION_SETTINGS, ROLLUP_DATA,
+                                   STREAM_SETTINGS)
+from modules.models.exceptions import NoExistingFile
+from modules.models.rollups import get_rollup_storage
+from modules.models.storage import get_storage
+
+logger = logging.getLogger('compact data')
+logging.basicConfig(level=logging.INFO)
+
+
+def get_compacted_intervals(collection_settings: Dict, stream_settings: Dict = STREAM_SETTINGS) -> List[str]:
+    """
+    Get the intervals having stored data: the collected ones and the streamed one.
+
+    :param collection_settings: collection settings
+    :param stream_settings: stream settings
+    :return: intervals in minutes, without duplicates
+    """
+    intervals = [*collection_settings['intervals_in_minutes'], stream_settings['interval_in_minutes']]
+    return list(dict.fromkeys(intervals))
+
+
+def compact_interval(collection_settings: Dict, interval_in_minutes: str) -> Optional[DataQualityReport]:
+    """
+    Compact the data and the rollups of an interval, then check its whole history.
+
+    :param collection_settings: collection settings (of the default interval)
+    :param interval_in_minutes: targeted interval
+    :return: the report of checks, None if nothing is stored for the interval
+    """
+    interval_settings = get_interval_settings(
+        collection_settings=collection_settings, interval_in_minutes=interval_in_minutes
+    )
+    storage = get_storage(path=interval_settings['storage_path'], backend=interval_settings['storage_backend'])
+    logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Compacting data in {storage.path}")
+    storage.compact()
+    for granularity in ROLLUP_DATA['granularities']:
+        get_rollup_storage(collection_settings=interval_settings, granularity=granularity).compact()
+    logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Data compacted in {storage.path}")
+
+    try:
+        return DataChecker(interval_in_minutes=interval_in_minutes).check_chunks(chunks=storage.iter_chunks())
+    except NoExistingFile as err:
+        logger.error(f"{err}")
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compact stored OHLC data.')
+    parser.add_argument('--interval', default=None, help='interval in minutes, all the stored intervals if not provided')
+    args = parser.parse_args()
+
+    intervals = [args.interval] if args.interval is not None else get_compacted_intervals(COLLECTION_SETTINGS)
+    for interval in intervals:
+        report = compact_interval(collection_settings=COLLECTION_SETTINGS, interval_in_minutes=interval)
+        if report is None:
+            continue
+        if report.is_valid:
+            logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Data checks passed on {report.rows} rows ({interval}m)")
+        else:
+            logger.warning(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Data checks failed {report.as_dict()} ({interval}m)")
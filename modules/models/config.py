@@ -15,8 +15,53 @@ class Currency(Enum):
 
 
 COLLECTION_SETTINGS = {
-    'query_period_in_minutes': '1440',
-    'storage_path': 's3://cryptolution/data.csv'  # here you have to specify your own storage path
+    'query_period_in_minutes': '1440',  # default interval, its data is stored at the paths below
+    'intervals_in_minutes': ['1440'],  # intervals collected in a run, other intervals are stored at suffixed paths
+    'ohlc_page_size': '720',  # max number of candles returned by Kraken for a query
+    'max_pages': '100',  # max number of queries made to catch up an asset pair
+    'backfill_pages_per_write': '10',  # pages of an asset pair stored at once by the backfill job
+    'max_workers': '4',  # number of asset pairs fetched concurrently, calls are throttled by the client settings
+    'async_client': False,  # fetch asset pairs with the asyncio client (pooled connections) instead of threads
+    'storage_backend': 'csv',  # 'csv' (legacy, single file) or 'parquet' (dataset partitioned by pair & month)
+    'storage_path': 's3://cryptolution/data.csv',  # here you have to specify your own storage path
+    'watermarks_path': 's3://cryptolution/watermarks.json',  # last timestamp ingested for each asset pair
+    'backfill_cursor_path': 's3://cryptolution/backfill_cursor.json',  # progress of the backfill job
+    'rollups_path': 's3://cryptolution/rollups.csv',  # suffixed by granularity, ex. rollups_weekly.csv
+    'summary_path': 's3://cryptolution/summary.json',  # pairs, row counts and min/max timestamps of stored data
+    'metrics_path': 's3://cryptolution/collection_metrics.json'  # run report, Prometheus textfile if ending by .prom
+}
+
+KRAKEN_CLIENT_SETTINGS = {
+    'calls_per_second': 1.0,  # sustained budget for public endpoints
+    'burst': 3,  # number of calls that can be made at once after an idle period
+    'max_retries': 5,
+    'backoff_base_in_seconds': 1.0,
+    'backoff_max_in_seconds': 30.0,
+    'api_url': 'https://api.kraken.com',  # used by the asyncio client, krakenex has its own
+    'api_version': '0',
+    'max_connections': 10,  # size of the pool of keep-alive connections of the asyncio client
+    'keepalive_timeout_in_seconds': 30.0,
+    'timeout_in_seconds': 30.0,
+    'retryable_errors': [
+        'EAPI:Rate limit exceeded',
+        'EService:Unavailable',
+        'EService:Busy',
+        'EGeneral:Temporary lockout'
+    ]
+}
+
+STREAM_SETTINGS = {
+    'ws_url': 'wss://ws.kraken.com',  # public WebSocket feed
+    'interval_in_minutes': '1',  # interval of the streamed candles, stored at the paths of this interval
+    'flush_interval_in_seconds': 10.0,  # candles are upserted into storage in micro-batches
+    'heartbeat_in_seconds': 30.0  # the connection is considered lost if a ping is not answered in time
+}
+
+TRANSPORT_SETTINGS = {
+    'connect_timeout_in_seconds': 5.0,
+    'read_timeout_in_seconds': 30.0,
+    'pool_connections': 4,  # number of hosts having a pool of keep-alive connections
+    'accept_encoding': 'gzip, deflate'
 }
 
 OHLC_DATA = {
@@ -24,6 +69,17 @@ OHLC_DATA = {
         'asset_pair', 'wsname', 'asset', 'currency',
         'time', 'tmsp', 'open_price', 'close_price', 'volume'
     ],
+    'dtypes': {
+        'asset_pair': 'category',
+        'wsname': 'category',
+        'asset': 'category',
+        'currency': 'category',
+        'time': 'datetime64[ns]',
+        'tmsp': 'int64',
+        'open_price': 'float64',
+        'close_price': 'float64',
+        'volume': 'float64'
+    },
     'data_index': {
         'timestamp': 0,
         'opening_price': 1,
@@ -31,3 +87,24 @@ OHLC_DATA = {
         'volume': 6
     }
 }
+
+ROLLUP_DATA = {
+    'granularities': ['daily', 'weekly', 'monthly'],
+    'schema': [
+        'asset_pair', 'wsname', 'asset', 'currency',
+        'time', 'tmsp', 'open_price', 'close_price', 'min_body_price', 'max_body_price', 'volume'
+    ],
+    'dtypes': {
+        'asset_pair': 'category',
+        'wsname': 'category',
+        'asset': 'category',
+        'currency': 'category',
+        'time': 'datetime64[ns]',
+        'tmsp': 'int64',
+        'open_price': 'float64',
+        'close_price': 'float64',
+        'min_body_price': 'float64',
+        'max_body_price': 'float64',
+        'volume': 'float64'
+    }
+}
@@ -105,3 +105,40 @@ class NotExistingHTMLClass(Exception):
 
     def __str__(self):
         return self.message
+
+
+class KrakenAPIError(Exception):
+    """
+    Exception raised when Kraken API answers with errors.
+    """
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        self.message = f'Kraken API returned the following errors: {", ".join(errors)}'
+
+    def __str__(self):
+        return self.message
+
+
+class StorageBackendNotHandled(Exception):
+    """
+    Exception raised when the storage backend is unknown.
+    """
+
+    def __init__(self, backend: str, handled_backends: List[str]):
+        self.message = f'The storage backend {backend} is not handled! Handled backends are {handled_backends}'
+
+    def __str__(self):
+        return self.message
+
+
+class GranularityNotHandled(Exception):
+    """
+    Exception raised when the rollup granularity is unknown.
+    """
+
+    def __init__(self, granularity: str, handled_granularities: List[str]):
+        self.message = f'The granularity {granularity} is not handled! Handled granularities are {handled_granularities}'
+
+    def __str__(self):
+        return self.message
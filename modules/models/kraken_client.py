@@ -0,0 +1,327 @@
+"""
+Rate limited client for Kraken API.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import aiohttp
+import krakenex
+import requests
+
+from modules.models.config import KRAKEN_CLIENT_SETTINGS
+from modules.models.exceptions import KrakenAPIError
+
+logger = logging.getLogger('kraken client')
+
+
+@dataclass
+class ClientStats:
+    """Counters about the calls made to Kraken API."""
+
+    calls: int = 0
+    throttles: int = 0
+    retries: int = 0
+    wait_time: float = 0.
+
+    def as_dict(self) -> Dict:
+        """
+        Get counters as a dict.
+
+        :return: counters
+        """
+        return {
+            'calls': self.calls,
+            'throttles': self.throttles,
+            'retries': self.retries,
+            'wait_time': self.wait_time
+        }
+
+
+def compute_backoff(attempt: int, client_settings: Dict) -> float:
+    """
+    Compute a jittered exponential backoff delay.
+
+    :param attempt: number of the failed attempt (starting at 0)
+    :param client_settings: client settings
+    :return: delay in seconds
+    """
+    ceiling = min(
+        client_settings['backoff_max_in_seconds'],
+        client_settings['backoff_base_in_seconds'] * 2 ** attempt
+    )
+    return random.uniform(0, ceiling)
+
+
+def is_retryable(errors: List[str], client_settings: Dict) -> bool:
+    """
+    Check whether errors returned by Kraken API are transient.
+
+    :param errors: errors of the payload
+    :param client_settings: client settings
+    :return: True if all the errors are retryable
+    """
+    return all(e.startswith(tuple(client_settings['retryable_errors'])) for e in errors)
+
+
+def is_transient_status(status: int) -> bool:
+    """
+    Check whether an HTTP error status is transient.
+
+    :param status: HTTP status of the response
+    :return: True for server errors (5xx) and rate limiting (429)
+    """
+    return status >= 500 or status == 429
+
+
+def is_transient_failure(err: Exception) -> bool:
+    """
+    Check whether a failed call to Kraken API (blocking or asyncio) is worth retrying.
+
+    Timeouts, connection errors, transient HTTP statuses (see `is_transient_status`) and payloads that cannot be
+    decoded (ex. an html error page, a truncated body) are transient, other HTTP errors (ex. 4xx) are not.
+
+    :param err: exception raised by the call
+    :return: True if the call can be retried
+    """
+    if isinstance(err, requests.exceptions.HTTPError):
+        return err.response is None or is_transient_status(err.response.status_code)
+    if isinstance(err, aiohttp.ClientResponseError) and not isinstance(err, aiohttp.ContentTypeError):
+        return is_transient_status(err.status)
+    return isinstance(err, (
+        requests.exceptions.Timeout,
+        requests.exceptions.ConnectionError,
+        requests.exceptions.ChunkedEncodingError,
+        aiohttp.ClientConnectionError,
+        aiohttp.ClientPayloadError,
+        aiohttp.ContentTypeError,
+        asyncio.TimeoutError,
+        ValueError  # payload is not json, ex. requests.JSONDecodeError
+    ))
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket.
+
+    Each call consumes a token, tokens are refilled at `rate` per second up to `capacity`.
+    A caller finding no token available reserves the next one and sleeps until it is refilled.
+    """
+
+    def __init__(
+            self,
+            rate: float,
+            capacity: int,
+            clock: Callable[[], float] = time.monotonic,
+            sleep: Callable[[float], None] = time.sleep
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(capacity)
+        self.last_refill = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Consume a token, waiting for it if needed.
+
+        :return: time waited in seconds
+        """
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.
+        if wait:
+            self.sleep(wait)
+        return wait
+
+
+class RateLimitedKrakenClient:
+    """
+    Wrapper around `krakenex.API` enforcing a call budget and retrying transient failures (see `is_transient_failure`).
+
+    It exposes the same `query_public` method as the wrapped client, but checks the `error` list of the payload.
+    """
+
+    def __init__(
+            self,
+            kraken_client: krakenex.API,
+            client_settings: Dict = KRAKEN_CLIENT_SETTINGS,
+            sleep: Callable[[float], None] = time.sleep,
+            bucket: Optional[TokenBucket] = None
+    ):
+        self.kraken_client = kraken_client
+        self.client_settings = {**KRAKEN_CLIENT_SETTINGS, **client_settings}
+        self.sleep = sleep
+        self.bucket = bucket or TokenBucket(
+            rate=self.client_settings['calls_per_second'],
+            capacity=self.client_settings['burst'],
+            sleep=sleep
+        )
+        self.stats = ClientStats()
+        self.stats_lock = threading.Lock()
+
+    def _update_stats(self, **increments) -> None:
+        with self.stats_lock:
+            for counter, increment in increments.items():
+                setattr(self.stats, counter, getattr(self.stats, counter) + increment)
+
+    def compute_backoff(self, attempt: int) -> float:
+        """
+        Compute a jittered exponential backoff delay.
+
+        :param attempt: number of the failed attempt (starting at 0)
+        :return: delay in seconds
+        """
+        return compute_backoff(attempt=attempt, client_settings=self.client_settings)
+
+    def query_public(self, method: str, data: Optional[Dict] = None) -> Dict:
+        """
+        Query a public endpoint of Kraken API.
+
+        :param method: API method name
+        :param data: API method parameters
+        :return: API payload
+        :raises KrakenAPIError: if the API answers with non retryable errors, or if retries are exhausted
+        """
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire()
+            self._update_stats(calls=1, throttles=int(waited > 0), wait_time=waited)
+            try:
+                payload = self.kraken_client.query_public(method, data)
+                errors = payload.get('error') or []
+            except (requests.exceptions.RequestException, ValueError) as err:
+                errors = [f'{type(err).__name__}: {err}']
+                retryable = is_transient_failure(err)
+            else:
+                if not errors:
+                    return payload
+                retryable = is_retryable(errors=errors, client_settings=self.client_settings)
+                if any(e.startswith('EAPI:Rate limit') for e in errors):
+                    self._update_stats(throttles=1)
+
+            if not retryable or attempt >= self.client_settings['max_retries']:
+                raise KrakenAPIError(errors=errors)
+
+            delay = self.compute_backoff(attempt)
+            logger.warning(f"{method} failed with {errors}, retrying in {delay:.2f}s")
+            self._update_stats(retries=1, wait_time=delay)
+            self.sleep(delay)
+            attempt += 1
+
+
+class AsyncKrakenClient:
+    """
+    Asyncio client for the public endpoints of Kraken API.
+
+    It enforces the same call budget and retries as `RateLimitedKrakenClient`.
+    Calls share a pooled HTTP session, created on first use in the running event loop:
+    keep-alive connections are reused across calls, at most `max_connections` are open at once.
+    """
+
+    def __init__(
+            self,
+            client_settings: Dict = KRAKEN_CLIENT_SETTINGS,
+            sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+            bucket: Optional[TokenBucket] = None
+    ):
+        self.client_settings = {**KRAKEN_CLIENT_SETTINGS, **client_settings}
+        self.sleep = sleep
+        # tokens are reserved without blocking the event loop, the wait is awaited by the caller
+        self.bucket = bucket or TokenBucket(
+            rate=self.client_settings['calls_per_second'],
+            capacity=self.client_settings['burst'],
+            sleep=lambda seconds: None
+        )
+        self.stats = ClientStats()
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        Get the pooled HTTP session, creating it if needed.
+
+        :return: the session
+        """
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.client_settings['max_connections'],
+                    keepalive_timeout=self.client_settings['keepalive_timeout_in_seconds']
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.client_settings['timeout_in_seconds']),
+                headers={'User-Agent': 'cryptolution'}
+            )
+        return self.session
+
+    async def close(self) -> None:
+        """
+        Close the pooled HTTP session and its connections.
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def request(self, method: str, data: Optional[Dict] = None) -> Dict:
+        """
+        Make a single call to a public endpoint of Kraken API (parameters are sent in the query string).
+
+        :param method: API method name
+        :param data: API method parameters
+        :return: API payload
+        :raises aiohttp.ClientError: if the call fails
+        """
+        session = await self.get_session()
+        url = f"{self.client_settings['api_url']}/{self.client_settings['api_version']}/public/{method}"
+        async with session.get(url, params={key: str(value) for key, value in (data or {}).items()}) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def query_public(self, method: str, data: Optional[Dict] = None) -> Dict:
+        """
+        Query a public endpoint of Kraken API.
+
+        :param method: API method name
+        :param data: API method parameters
+        :return: API payload
+        :raises KrakenAPIError: if the API answers with non retryable errors, or if retries are exhausted
+        """
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire()
+            self.stats.calls += 1
+            self.stats.throttles += int(waited > 0)
+            self.stats.wait_time += waited
+            if waited:
+                await self.sleep(waited)
+            try:
+                payload = await self.request(method, data)
+                errors = payload.get('error') or []
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as err:
+                errors = [f'{type(err).__name__}: {err}']
+                retryable = is_transient_failure(err)
+            else:
+                if not errors:
+                    return payload
+                retryable = is_retryable(errors=errors, client_settings=self.client_settings)
+                if any(e.startswith('EAPI:Rate limit') for e in errors):
+                    self.stats.throttles += 1
+
+            if not retryable or attempt >= self.client_settings['max_retries']:
+                raise KrakenAPIError(errors=errors)
+
+            delay = compute_backoff(attempt=attempt, client_settings=self.client_settings)
+            logger.warning(f"{method} failed with {errors}, retrying in {delay:.2f}s")
+            self.stats.retries += 1
+            self.stats.wait_time += delay
+            await self.sleep(delay)
+            attempt += 1
@@ -0,0 +1,81 @@
+"""
+Local copy of stored data, memory-mapped on read.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from modules.models.storage import Storage
+
+logger = logging.getLogger('local cache')
+
+
+class LocalDatasetCache:
+    """
+    Local copies of stored data, as uncompressed Feather files that are memory-mapped on read.
+
+    Each copy is stamped with the fingerprint of stored data (ETag or modification time, and size of its files,
+    see `Storage.fingerprint`): stored data is only downloaded again when it has changed.
+    Layout: <cache_dir>/<md5 of the storage path>.feather, and its stamp <md5 of the storage path>.json
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def get_paths(self, storage: Storage) -> Tuple[str, str]:
+        """
+        Get the paths of the local copy of stored data and of its stamp.
+
+        :param storage: storage of the data
+        :return: path of the copy, path of the stamp
+        """
+        key = hashlib.md5(storage.path.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f'{key}.feather'), os.path.join(self.cache_dir, f'{key}.json')
+
+    def read_stamp(self, stamp_path: str) -> Optional[Dict[str, str]]:
+        """
+        Read the fingerprint of stored data when it was copied.
+
+        :param stamp_path: path of the stamp
+        :return: the fingerprint, None if there is no valid stamp
+        """
+        try:
+            with open(stamp_path) as stamp:
+                return json.load(stamp)
+        except (OSError, ValueError):
+            return None
+
+    def read(self, storage: Storage) -> pd.DataFrame:
+        """
+        Read stored data, from its local copy if stored data has not changed since it was copied.
+
+        :param storage: storage of the data
+        :return: stored data
+        :raises NoExistingFile: if nothing is stored yet
+        """
+        fingerprint = storage.fingerprint()
+        data_path, stamp_path = self.get_paths(storage=storage)
+        if self.read_stamp(stamp_path=stamp_path) == fingerprint and os.path.exists(data_path):
+            logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Reading {storage.path} from {data_path}")
+            return feather.read_table(data_path, memory_map=True).to_pandas(split_blocks=True)
+
+        logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Downloading {storage.path} to {data_path}")
+        df = storage.read()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # the copy is replaced before its stamp, so that an interrupted copy is never taken for a valid one
+        temporary_path = f'{data_path}.{uuid.uuid4().hex}.tmp'
+        feather.write_feather(df, temporary_path, compression='uncompressed')
+        os.replace(temporary_path, data_path)
+        temporary_path = f'{stamp_path}.{uuid.uuid4().hex}.tmp'
+        with open(temporary_path, 'w') as stamp:
+            json.dump(fingerprint, stamp)
+        os.replace(temporary_path, stamp_path)
+        return df
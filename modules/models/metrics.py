@@ -0,0 +1,181 @@
+"""
+Timers and counters of collection runs, reported as json or as a Prometheus textfile.
+"""
+
+import functools
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import fsspec
+import numpy as np
+
+from modules.models.utils import write_json
+
+QUANTILES = (0.5, 0.9, 0.99)
+PROMETHEUS_PREFIX = 'cryptolution'
+
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def build_key(name: str, labels: Optional[Dict[str, str]] = None) -> MetricKey:
+    """
+    Build the key of a metric from its name and labels.
+
+    :param name: metric name, ex. 'get_ohlc_page'
+    :param labels: metric labels, ex. {'interval': '1440'}
+    :return: the key
+    """
+    return name, tuple(sorted((label, str(value)) for label, value in (labels or {}).items()))
+
+
+class MetricsRegistry:
+    """
+    Thread safe registry of the timings (per stage) and counters of a run.
+
+    Stages are timed with `timer` (context manager) or `timed` (decorator), each timing is kept
+    so that latency percentiles can be reported.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.started_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        self.timings: Dict[MetricKey, List[float]] = defaultdict(list)
+        self.counters: Dict[MetricKey, float] = defaultdict(float)
+        self.lock = threading.Lock()
+
+    def observe(self, name: str, duration: float, labels: Optional[Dict[str, str]] = None) -> None:
+        """
+        Record the duration of a stage.
+
+        :param name: stage name
+        :param duration: duration in seconds
+        :param labels: metric labels
+        """
+        with self.lock:
+            self.timings[build_key(name=name, labels=labels)].append(duration)
+
+    def increment(self, name: str, value: float = 1, labels: Optional[Dict[str, str]] = None) -> None:
+        """
+        Increment a counter.
+
+        :param name: counter name
+        :param value: increment
+        :param labels: metric labels
+        """
+        with self.lock:
+            self.counters[build_key(name=name, labels=labels)] += value
+
+    @contextmanager
+    def timer(self, name: str, labels: Optional[Dict[str, str]] = None) -> Iterator[None]:
+        """
+        Time the enclosed block as a stage, even if it raises.
+
+        :param name: stage name
+        :param labels: metric labels
+        """
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.observe(name=name, duration=self.clock() - start, labels=labels)
+
+    def timed(self, name: str, labels: Optional[Dict[str, str]] = None) -> Callable:
+        """
+        Time each call of the decorated function as a stage.
+
+        :param name: stage name
+        :param labels: metric labels
+        :return: the decorator
+        """
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name=name, labels=labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def report(self) -> Dict:
+        """
+        Build the report of the run.
+
+        :return: timings (count, total, quantiles, max) and counters, with their labels
+        """
+        with self.lock:
+            timings = {key: np.array(durations) for key, durations in self.timings.items()}
+            counters = dict(self.counters)
+        return {
+            'started_at': self.started_at,
+            'reported_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'timings': [
+                {
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': len(durations),
+                    'total_s': float(durations.sum()),
+                    **{f'p{int(quantile * 100)}_s': float(np.quantile(durations, quantile)) for quantile in QUANTILES},
+                    'max_s': float(durations.max())
+                }
+                for (name, labels), durations in sorted(timings.items())
+            ],
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(counters.items())
+            ]
+        }
+
+    def to_prometheus(self) -> str:
+        """
+        Render the report in the Prometheus text format (timings as summaries, counters as gauges).
+
+        :return: the text
+        """
+        report = self.report()
+        lines = [
+            f'# HELP {PROMETHEUS_PREFIX}_stage_duration_seconds Duration of collection stages.',
+            f'# TYPE {PROMETHEUS_PREFIX}_stage_duration_seconds summary'
+        ]
+        for timing in report['timings']:
+            labels = {'stage': timing['name'], **timing['labels']}
+            for quantile in QUANTILES:
+                lines.append(
+                    f"{PROMETHEUS_PREFIX}_stage_duration_seconds"
+                    f"{format_labels({**labels, 'quantile': str(quantile)})} {timing[f'p{int(quantile * 100)}_s']}"
+                )
+            lines.append(f"{PROMETHEUS_PREFIX}_stage_duration_seconds_sum{format_labels(labels)} {timing['total_s']}")
+            lines.append(f"{PROMETHEUS_PREFIX}_stage_duration_seconds_count{format_labels(labels)} {timing['count']}")
+        for name in sorted({counter['name'] for counter in report['counters']}):
+            lines.append(f'# TYPE {PROMETHEUS_PREFIX}_{name} gauge')
+            lines += [
+                f"{PROMETHEUS_PREFIX}_{name}{format_labels(counter['labels'])} {counter['value']}"
+                for counter in report['counters'] if counter['name'] == name
+            ]
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str) -> None:
+        """
+        Write the report, as a Prometheus textfile if the path ends with '.prom', as json otherwise.
+
+        :param path: path of the report. Path can be anything : local, s3 url etc.
+        """
+        if path.endswith('.prom'):
+            with fsspec.open(path, 'w') as prom:
+                prom.write(self.to_prometheus())
+        else:
+            write_json(data=self.report(), path=path)
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    """
+    Format labels for the Prometheus text format.
+
+    :param labels: labels
+    :return: formatted labels, ex. '{interval="1440",stage="get_assets"}'
+    """
+    if not labels:
+        return ''
+    escaped = {label: str(value).replace('\\', '\\\\').replace('"', '\\"') for label, value in labels.items()}
+    return '{' + ','.join(f'{label}="{value}"' for label, value in sorted(escaped.items())) + '}'
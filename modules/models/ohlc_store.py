@@ -0,0 +1,122 @@
+"""
+In-memory store of collected OHLC candles.
+"""
+
+import threading
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from modules.models.config import OHLC_DATA
+
+PAIR_FIELDS = ('wsname', 'asset', 'currency')  # metadata of asset pairs, held once per pair
+CANDLE_DTYPE = np.dtype([
+    ('tmsp', np.int64),
+    ('open_price', np.float64),
+    ('close_price', np.float64),
+    ('volume', np.float64)
+])
+
+
+def build_categorical(codes: np.ndarray, values: List[str], present: np.ndarray) -> pd.Categorical:
+    """
+    Build a categorical field from the codes of asset pairs, its categories are the values of the present pairs.
+
+    Categories are sorted, as they would be by casting the field to 'category'.
+
+    :param codes: code of the asset pair of each row
+    :param values: value of the field for each asset pair, ex. its asset
+    :param present: whether each asset pair has rows
+    :return: the categorical field
+    """
+    categories, category_codes = np.unique(np.asarray(values, dtype=object)[present], return_inverse=True)
+    lookup = np.full(len(values), -1, dtype=np.int32)
+    lookup[present] = category_codes
+    return pd.Categorical.from_codes(lookup[codes], categories=categories)
+
+
+class OHLCStore:
+    """
+    Store of collected candles, shared by the workers of a collection.
+
+    Candles are held as structured arrays of 32 bytes per candle (timestamp, open & close prices, volume),
+    one array per page received, grouped by asset pair. Metadata of asset pairs (wsname, asset, currency)
+    are held once per pair. Pages are appended as soon as they are received, so that raw payloads are not kept,
+    and data is converted to a df once the collection is done.
+    """
+
+    def __init__(self, asset_pairs: Dict[str, Dict[str, str]], ohlc_data_settings: Dict = OHLC_DATA):
+        self.asset_pairs = list(asset_pairs)
+        self.pair_metadata = {
+            field: [asset_pairs[asset_pair][field] for asset_pair in self.asset_pairs] for field in PAIR_FIELDS
+        }
+        self.ohlc_data_settings = ohlc_data_settings
+        self.pages: Dict[str, List[np.ndarray]] = {asset_pair: [] for asset_pair in self.asset_pairs}
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Get the memory held by the candles.
+
+        :return: number of bytes
+        """
+        return self.size * CANDLE_DTYPE.itemsize
+
+    def append(self, asset_pair: str, candles: List[List]) -> None:
+        """
+        Append a page of candles of an asset pair, as provided by Kraken API (sorted by timestamp).
+
+        The page is converted into a float array in one shot, then fields are copied from its columns.
+        Pages of an asset pair are expected in the order they are received: a page replaces the candles
+        of the asset pair from its first timestamp (consecutive pages may share a candle, the latest is kept).
+
+        :param asset_pair: name of the asset pair
+        :param candles: candles [time, open, high, low, close, vwap, volume, count]
+        """
+        if not candles:
+            return
+        data_index = self.ohlc_data_settings['data_index']
+        raw_data = np.asarray(candles, dtype=np.float64)
+        page = np.empty(len(raw_data), dtype=CANDLE_DTYPE)
+        page['tmsp'] = raw_data[:, data_index['timestamp']]
+        page['open_price'] = raw_data[:, data_index['opening_price']]
+        page['close_price'] = raw_data[:, data_index['ending_price']]
+        page['volume'] = raw_data[:, data_index['volume']]
+        with self.lock:
+            pages = self.pages[asset_pair]
+            while pages and pages[-1]['tmsp'][-1] >= page['tmsp'][0]:
+                kept = int(pages[-1]['tmsp'].searchsorted(page['tmsp'][0], side='left'))
+                self.size -= len(pages[-1]) - kept
+                if kept:
+                    pages[-1] = pages[-1][:kept]
+                    break
+                pages.pop()
+            pages.append(page)
+            self.size += len(page)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Convert the candles into a df, with the schema & dtypes of OHLC data.
+
+        Rows are sorted by asset pair (in the order they were provided) and timestamp.
+
+        :return: data for all the asset pairs
+        """
+        with self.lock:
+            pages = [page for asset_pair in self.asset_pairs for page in self.pages[asset_pair]]
+            sizes = [sum(len(page) for page in self.pages[asset_pair]) for asset_pair in self.asset_pairs]
+        candles = np.concatenate(pages) if pages else np.empty(0, dtype=CANDLE_DTYPE)
+        codes = np.repeat(np.arange(len(self.asset_pairs), dtype=np.int32), sizes)
+        present = np.array(sizes, dtype=np.int64) > 0
+        data = {'asset_pair': build_categorical(codes=codes, values=self.asset_pairs, present=present)}
+        for field in PAIR_FIELDS:
+            data[field] = build_categorical(codes=codes, values=self.pair_metadata[field], present=present)
+        data['time'] = candles['tmsp'].astype('datetime64[s]').astype('datetime64[ns]')  # raw period
+        data.update((name, candles[name]) for name in CANDLE_DTYPE.names)
+        return pd.DataFrame({name: data[name] for name in self.ohlc_data_settings['schema']})
@@ -0,0 +1,206 @@
+"""
+Rollups of OHLC data (daily, weekly, monthly OHLCV).
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.models.config import ROLLUP_DATA
+from modules.models.exceptions import GranularityNotHandled, NoExistingFile
+from modules.models.storage import Storage, get_storage
+from modules.models.utils import apply_dtypes, suffix_path
+
+SECONDS_PER_DAY = 86400
+FIRST_MONDAY_TMSP = 4 * SECONDS_PER_DAY  # 1970-01-05, epoch is a thursday
+
+GRANULARITY_IN_SECONDS = {
+    'daily': SECONDS_PER_DAY,
+    'weekly': 7 * SECONDS_PER_DAY,
+    'monthly': 30 * SECONDS_PER_DAY  # approximation, only used to compare granularities
+}
+
+
+def compute_bucket_start(tmsp: np.ndarray, granularity: str) -> np.ndarray:
+    """
+    Compute the start of the time bucket of each timestamp (UTC), weeks start on monday.
+
+    :param tmsp: timestamps (in seconds)
+    :param granularity: one of `GRANULARITY_IN_SECONDS`
+    :return: timestamps (in seconds) of bucket starts
+    :raises GranularityNotHandled: if the granularity is unknown
+    """
+    tmsp = np.asarray(tmsp, dtype=np.int64)
+    if granularity == 'daily':
+        return tmsp - tmsp % SECONDS_PER_DAY
+    if granularity == 'weekly':
+        week = 7 * SECONDS_PER_DAY
+        return (tmsp - FIRST_MONDAY_TMSP) // week * week + FIRST_MONDAY_TMSP
+    if granularity == 'monthly':
+        return tmsp.astype('datetime64[s]').astype('datetime64[M]').astype('datetime64[s]').astype(np.int64)
+    raise GranularityNotHandled(granularity=granularity, handled_granularities=list(GRANULARITY_IN_SECONDS))
+
+
+def choose_granularity(
+        span_in_seconds: float,
+        min_points: int,
+        granularities: List[str] = ROLLUP_DATA['granularities']
+) -> Optional[str]:
+    """
+    Choose the coarsest granularity that still provides enough points over a period.
+
+    :param span_in_seconds: length of the period
+    :param min_points: minimum number of buckets expected over the period
+    :param granularities: available granularities
+    :return: the granularity, None if raw data is needed
+    """
+    for granularity in sorted(granularities, key=GRANULARITY_IN_SECONDS.get, reverse=True):
+        if span_in_seconds / GRANULARITY_IN_SECONDS[granularity] >= min_points:
+            return granularity
+    return None
+
+
+def compute_rollup(df: pd.DataFrame, granularity: str, rollup_data_settings: Dict = ROLLUP_DATA) -> pd.DataFrame:
+    """
+    Aggregate OHLC data by asset pair and time bucket.
+
+    For each bucket: first open price, last close price, min and max of open & close prices (bodies of candles,
+    low and high prices are not collected), sum of volumes.
+
+    :param df: OHLC data
+    :param granularity: one of `GRANULARITY_IN_SECONDS`
+    :param rollup_data_settings: rollup settings (schema and dtypes)
+    :return: rollup data, time and tmsp being the start of buckets
+    """
+    if df.empty:
+        return apply_dtypes(
+            df=pd.DataFrame(columns=rollup_data_settings['schema']),
+            dtypes=rollup_data_settings['dtypes']
+        )
+    df = df.assign(
+        bucket=compute_bucket_start(df['tmsp'].values, granularity),
+        row_body_min=np.minimum(df['open_price'].values, df['close_price'].values),
+        row_body_max=np.maximum(df['open_price'].values, df['close_price'].values)
+    ).sort_values(['asset_pair', 'tmsp'], kind='mergesort')
+
+    rollup = df.groupby(['asset_pair', 'bucket'], sort=False, observed=True).agg(
+        wsname=('wsname', 'first'),
+        asset=('asset', 'first'),
+        currency=('currency', 'first'),
+        open_price=('open_price', 'first'),
+        close_price=('close_price', 'last'),
+        min_body_price=('row_body_min', 'min'),
+        max_body_price=('row_body_max', 'max'),
+        volume=('volume', 'sum')
+    ).reset_index().rename(columns={'bucket': 'tmsp'})
+    rollup['time'] = rollup['tmsp'].values.astype('datetime64[s]').astype('datetime64[ns]')
+    return apply_dtypes(df=rollup[rollup_data_settings['schema']], dtypes=rollup_data_settings['dtypes'])
+
+
+def rollup_exists(rollup_storage: Storage) -> bool:
+    """
+    Check whether a rollup is stored, from the metadata of its files only.
+
+    :param rollup_storage: storage of the rollup
+    :return: whether the rollup is stored
+    """
+    try:
+        rollup_storage.fingerprint()
+    except NoExistingFile:
+        return False
+    return True
+
+
+def update_rollups(
+        raw_storage: Storage,
+        rollup_storages: Dict[str, Storage],
+        new_data_df: Optional[pd.DataFrame] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Update rollups regarding new data, only the buckets touched by new data are recomputed and upserted.
+
+    Raw data is read once for all the granularities: the touched asset pairs from the first touched bucket
+    (new data being already stored). Rollups are rebuilt from all the raw data if they do not exist yet
+    or if no new data is provided.
+
+    :param raw_storage: storage of OHLC data
+    :param rollup_storages: storage of the rollup of each granularity (see `GRANULARITY_IN_SECONDS`)
+    :param new_data_df: new data, already stored
+    :return: recomputed rollup rows of each granularity
+    """
+    rebuilt_granularities = [
+        granularity for granularity, rollup_storage in rollup_storages.items()
+        if new_data_df is None or not rollup_exists(rollup_storage=rollup_storage)
+    ]
+    rollups = {}
+    if rebuilt_granularities:
+        raw_df = raw_storage.read()
+        for granularity in rebuilt_granularities:
+            rollups[granularity] = compute_rollup(df=raw_df, granularity=granularity)
+            rollup_storages[granularity].write(rollups[granularity])
+
+    updated_granularities = [granularity for granularity in rollup_storages if granularity not in rollups]
+    if not updated_granularities:
+        return rollups
+    if new_data_df.empty:
+        return {**rollups, **{granularity: compute_rollup(df=new_data_df, granularity=granularity)
+                              for granularity in updated_granularities}}
+
+    new_asset_pairs = new_data_df['asset_pair'].astype(str).values
+    touched_buckets = {
+        granularity: compute_bucket_start(new_data_df['tmsp'].values, granularity)
+        for granularity in updated_granularities
+    }
+    raw_df = raw_storage.read(
+        asset_pairs=list(np.unique(new_asset_pairs)),
+        start_tmsp=int(min(buckets.min() for buckets in touched_buckets.values()))
+    )
+    for granularity in updated_granularities:
+        touched = pd.MultiIndex.from_arrays([new_asset_pairs, touched_buckets[granularity]]).unique()
+        rollup_df = compute_rollup(
+            df=raw_df[raw_df['tmsp'].values >= touched_buckets[granularity].min()],
+            granularity=granularity
+        )
+        rollup_df = rollup_df[
+            pd.MultiIndex.from_arrays([rollup_df['asset_pair'].astype(str).values, rollup_df['tmsp'].values])
+            .isin(touched)
+        ].reset_index(drop=True)
+        rollup_storages[granularity].upsert(rollup_df)
+        rollups[granularity] = rollup_df
+    return rollups
+
+
+def update_rollup(
+        raw_storage: Storage,
+        rollup_storage: Storage,
+        granularity: str,
+        new_data_df: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    """
+    Update the rollup of a granularity regarding new data (see `update_rollups`).
+
+    :param raw_storage: storage of OHLC data
+    :param rollup_storage: storage of the rollup
+    :param granularity: one of `GRANULARITY_IN_SECONDS`
+    :param new_data_df: new data, already stored
+    :return: recomputed rollup rows
+    """
+    return update_rollups(
+        raw_storage=raw_storage, rollup_storages={granularity: rollup_storage}, new_data_df=new_data_df
+    )[granularity]
+
+
+def get_rollup_storage(collection_settings: Dict, granularity: str) -> Storage:
+    """
+    Get the storage of a rollup, rollups are stored next to OHLC data with the same backend.
+
+    :param collection_settings: collection settings
+    :param granularity: one of `GRANULARITY_IN_SECONDS`
+    :return: the storage
+    """
+    return get_storage(
+        path=suffix_path(path=collection_settings['rollups_path'], suffix=f'_{granularity}'),
+        backend=collection_settings['storage_backend'],
+        ohlc_data_settings=ROLLUP_DATA
+    )
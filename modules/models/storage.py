@@ -0,0 +1,739 @@
+"""
+Storage backends for OHLC data.
+"""
+
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import fsspec
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from modules.models.check_data import DataChecker
+from modules.models.config import OHLC_DATA
+from modules.models.exceptions import NoExistingFile, StorageBackendNotHandled
+from modules.models.utils import (apply_dtypes, read_csv_as_df, read_json,
+                                  write_json)
+
+
+class SegmentClock:
+    """
+    Class for a clock (in nanoseconds) strictly increasing across the segments created by a process.
+
+    Two segments created in the same nanosecond, or after the system clock was set back, still get ordered ticks.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_tick = 0
+
+    def tick(self) -> int:
+        """
+        Get the time of a new segment.
+
+        :return: time in nanoseconds, greater than the previous ticks
+        """
+        with self.lock:
+            self.last_tick = max(time.time_ns(), self.last_tick + 1)
+            return self.last_tick
+
+
+SEGMENT_CLOCK = SegmentClock()
+
+
+def tmsp_to_month(tmsp: np.ndarray) -> np.ndarray:
+    """
+    Convert timestamps (in seconds) to months, ex. 1672531200 -> '2023-01'.
+
+    :param tmsp: timestamps
+    :return: months
+    """
+    return np.asarray(tmsp, dtype='int64').astype('datetime64[s]').astype('datetime64[M]').astype(str)
+
+
+def new_segment_id() -> str:
+    """
+    Generate a segment id, segment ids of a process sort in creation order.
+
+    Ids are made of the creation time in nanoseconds (see `SegmentClock`) and of a random suffix,
+    so that processes do not collide.
+
+    :return: segment id, ex. '20230101T000000-000000001-1a2b3c4d'
+    """
+    seconds, nanoseconds = divmod(SEGMENT_CLOCK.tick(), 10 ** 9)
+    return f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(seconds))}-{nanoseconds:09d}-{uuid.uuid4().hex[:8]}"
+
+
+def remove_path(path: str, recursive: bool = False) -> None:
+    """
+    Remove a file or a directory if it exists. Path can be anything : local, s3 url etc.
+
+    :param path: path to remove
+    :param recursive: whether directory content should be removed too
+    """
+    openfile = fsspec.open(path)
+    if openfile.fs.exists(openfile.path):
+        openfile.fs.rm(openfile.path, recursive=recursive)
+
+
+def describe_file(info: Dict) -> str:
+    """
+    Describe the version of a file from its metadata (see `fsspec.AbstractFileSystem.info`), without reading it.
+
+    :param info: metadata of the file
+    :return: its ETag if any (ex. s3), its modification time otherwise, and its size
+    """
+    version = info.get('ETag') or info.get('mtime') or info.get('LastModified') or ''
+    return f"{version}:{info.get('size')}"
+
+
+def merge_last_write_wins(frames: List[pd.DataFrame], keys: List[str]) -> pd.DataFrame:
+    """
+    Merge data written successively, keeping the last written row of each key (upsert).
+
+    Frames are expected to be sorted by keys, as written by storages: the stable sort of their concatenation
+    merges these sorted runs (instead of sorting from scratch), then only the last row of each run of equal
+    keys is kept. Keys are encoded as a single int64 (strings are replaced by their rank).
+
+    :param frames: data, in write order
+    :param keys: fields identifying a row, ex. ['asset_pair', 'tmsp']
+    :return: merged data, sorted by keys
+    """
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].reset_index(drop=True)
+
+    composite_key = np.zeros(len(df), dtype=np.int64)
+    for key in keys:
+        values = df[key].to_numpy()
+        if not np.issubdtype(values.dtype, np.integer):
+            values = pd.factorize(values, sort=True)[0]
+        values = values.astype(np.int64)
+        composite_key = composite_key * (int(values.max()) + 1) + values
+    order = np.argsort(composite_key, kind='stable')
+    sorted_key = composite_key[order]
+    is_last = np.append(sorted_key[1:] != sorted_key[:-1], True)
+    return df.iloc[order[is_last]].reset_index(drop=True)
+
+
+def encode_keys(df: pd.DataFrame, asset_pairs: pd.Index) -> np.ndarray:
+    """
+    Encode the keys of rows (asset pair, timestamp) as int64, so that they can be looked up in a vectorized way.
+
+    :param df: data
+    :param asset_pairs: asset pairs that can be encoded
+    :return: keys, -1 for rows of other asset pairs
+    """
+    codes = asset_pairs.get_indexer(df['asset_pair'].astype(str))
+    return np.where(codes >= 0, codes.astype(np.int64) * 2 ** 34 + df['tmsp'].values.astype(np.int64), -1)
+
+
+@dataclass
+class DataFilter:
+    """Row filters applied when reading OHLC data."""
+
+    asset_pairs: Optional[List[str]] = None
+    currencies: Optional[List[str]] = None
+    start_tmsp: Optional[int] = None  # included
+    end_tmsp: Optional[int] = None  # included
+
+    @property
+    def fields(self) -> List[str]:
+        """
+        Fields needed to apply the filters.
+
+        :return: field names
+        """
+        fields = []
+        if self.asset_pairs is not None:
+            fields.append('asset_pair')
+        if self.currencies is not None:
+            fields.append('currency')
+        if self.start_tmsp is not None or self.end_tmsp is not None:
+            fields.append('tmsp')
+        return fields
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Apply filters to data, with a single vectorized mask.
+
+        :param df: data
+        :return: filtered data
+        """
+        mask = np.ones(len(df), dtype=bool)
+        if self.asset_pairs is not None:
+            mask &= df['asset_pair'].isin(self.asset_pairs).values
+        if self.currencies is not None:
+            mask &= df['currency'].isin(self.currencies).values
+        if self.start_tmsp is not None:
+            mask &= (df['tmsp'] >= self.start_tmsp).values
+        if self.end_tmsp is not None:
+            mask &= (df['tmsp'] <= self.end_tmsp).values
+        return df if mask.all() else df[mask]
+
+    def to_parquet_filters(self) -> Optional[List[Tuple]]:
+        """
+        Express filters as parquet filters, so that partitions (asset pair, month) can be pruned.
+
+        :return: filters in disjunctive normal form, None if there is no filter
+        """
+        filters = []
+        if self.asset_pairs is not None:
+            filters.append(('asset_pair', 'in', list(self.asset_pairs)))
+        if self.currencies is not None:
+            filters.append(('currency', 'in', list(self.currencies)))
+        if self.start_tmsp is not None:
+            filters += [('month', '>=', tmsp_to_month([self.start_tmsp])[0]), ('tmsp', '>=', self.start_tmsp)]
+        if self.end_tmsp is not None:
+            filters += [('month', '<=', tmsp_to_month([self.end_tmsp])[0]), ('tmsp', '<=', self.end_tmsp)]
+        return filters or None
+
+
+class Storage(ABC):
+    """
+    Base class for OHLC data storage.
+    """
+
+    keys = ['asset_pair', 'tmsp']
+
+    def __init__(self, path: str, ohlc_data_settings: Dict = OHLC_DATA):
+        self.path = path
+        self.ohlc_data_settings = ohlc_data_settings
+        self.bytes_written = 0
+
+    def count_bytes_written(self, *paths: str) -> None:
+        """
+        Add the size of written files to `bytes_written`.
+
+        :param paths: paths of the written files
+        """
+        for path in paths:
+            openfile = fsspec.open(path)
+            self.bytes_written += openfile.fs.size(openfile.path)
+
+    def read(
+            self,
+            columns: Optional[List[str]] = None,
+            asset_pairs: Optional[List[str]] = None,
+            currencies: Optional[List[str]] = None,
+            start_tmsp: Optional[int] = None,
+            end_tmsp: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        Read stored data.
+
+        :param columns: fields to read, all the schema by default
+        :param asset_pairs: only read these asset pairs
+        :param currencies: only read these currencies
+        :param start_tmsp: only read data from this timestamp (included)
+        :param end_tmsp: only read data until this timestamp (included)
+        :return: stored data, typed regarding the schema dtypes
+        :raises NoExistingFile: if nothing is stored yet
+        """
+        columns = columns or self.ohlc_data_settings['schema']
+        frames = list(
+            self.iter_chunks(
+                chunksize=None, columns=columns, asset_pairs=asset_pairs, currencies=currencies,
+                start_tmsp=start_tmsp, end_tmsp=end_tmsp
+            )
+        )
+        if not frames:
+            return apply_dtypes(df=pd.DataFrame(columns=columns), dtypes=self.ohlc_data_settings['dtypes'])
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        return apply_dtypes(df=df.reset_index(drop=True), dtypes=self.ohlc_data_settings['dtypes'])
+
+    def iter_chunks(
+            self,
+            chunksize: Optional[int] = 100_000,
+            columns: Optional[List[str]] = None,
+            asset_pairs: Optional[List[str]] = None,
+            currencies: Optional[List[str]] = None,
+            start_tmsp: Optional[int] = None,
+            end_tmsp: Optional[int] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Read stored data chunk by chunk, so that memory stays bounded whatever the size of the history.
+
+        :param chunksize: maximum number of rows read at once (before filtering), None to read files at once
+        :param columns: fields to read, all the schema by default
+        :param asset_pairs: only read these asset pairs
+        :param currencies: only read these currencies
+        :param start_tmsp: only read data from this timestamp (included)
+        :param end_tmsp: only read data until this timestamp (included)
+        :return: iterator over non empty chunks of stored data
+        :raises NoExistingFile: if nothing is stored yet
+        """
+        columns = columns or self.ohlc_data_settings['schema']
+        data_filter = DataFilter(
+            asset_pairs=asset_pairs, currencies=currencies, start_tmsp=start_tmsp, end_tmsp=end_tmsp
+        )
+        read_columns = columns + [field for field in data_filter.fields if field not in columns]
+        for chunk in self.read_chunks(chunksize=chunksize, columns=read_columns, data_filter=data_filter):
+            chunk = data_filter.apply(chunk)
+            if not chunk.empty:
+                yield apply_dtypes(df=chunk[columns], dtypes=self.ohlc_data_settings['dtypes'])
+
+    @abstractmethod
+    def read_chunks(
+            self,
+            chunksize: Optional[int],
+            columns: List[str],
+            data_filter: DataFilter
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Read raw chunks of stored data, filters may be partially applied only.
+
+        :param chunksize: maximum number of rows read at once, None to read files at once
+        :param columns: fields to read (including the fields needed for filters)
+        :param data_filter: filters, that can be used to skip data
+        :return: iterator over chunks of stored data
+        :raises NoExistingFile: if nothing is stored yet
+        """
+
+    @abstractmethod
+    def fingerprint(self) -> Dict[str, str]:
+        """
+        Describe the version of the files of stored data, from their metadata only.
+
+        :return: version of each file (see `describe_file`), it changes whenever stored data is written
+        :raises NoExistingFile: if nothing is stored yet
+        """
+
+    @abstractmethod
+    def write(self, df: pd.DataFrame) -> None:
+        """
+        Overwrite stored data.
+
+        :param df: data to store
+        """
+
+    @abstractmethod
+    def append(self, df: pd.DataFrame) -> None:
+        """
+        Add new data to stored data, without rewriting existing data.
+
+        :param df: new data
+        """
+
+    @abstractmethod
+    def upsert(self, df: pd.DataFrame) -> None:
+        """
+        Add new data to stored data, replacing stored rows having the same keys (last write wins).
+
+        :param df: new data
+        """
+
+    @abstractmethod
+    def compact(self) -> None:
+        """
+        Merge the segments written by appends, so that reads stay cheap.
+        """
+
+
+class CsvStorage(Storage):
+    """
+    Legacy storage: the history lives in a csv file.
+
+    Appends and upserts are written as csv segments next to it and listed in a manifest:
+    - <name>.csv: history, as of last compaction
+    - <name>.<segment_id>.csv: segments written since last compaction
+    - <name>.manifest.json: segments (with their timestamp range), in write order,
+    and last timestamp of the history
+
+    Stored rows are never rewritten by upserts, so that their cost is proportional to new data: rows of a segment
+    replace rows having the same keys in the history and in previous segments when data is read (last write wins).
+    Recent segments are merged as they are written (size-tiered: a segment is merged with the previous ones
+    until a bigger one), so that the number of segments stays logarithmic; the compaction merges them all
+    into the history.
+    """
+
+    @property
+    def manifest_path(self) -> str:
+        """
+        Path of the manifest listing segments.
+
+        :return: the path
+        """
+        return f"{self.path.rsplit('.csv', 1)[0]}.manifest.json"
+
+    def read_manifest(self) -> Dict:
+        """
+        Read the manifest listing segments.
+
+        :return: the manifest, with no segment if it does not exist
+        """
+        try:
+            return read_json(path=self.manifest_path)
+        except NoExistingFile:
+            return {'segments': []}
+
+    def read_later_keys(self, segments: List[Dict]) -> Tuple[pd.Index, List[Optional[np.ndarray]]]:
+        """
+        Get, for the history and each segment, the keys of the rows written after it (see `encode_keys`).
+
+        :param segments: segments, in write order
+        :return: asset pairs encoded, keys written after the history then after each segment (None if there are none)
+        """
+        frames = [
+            read_csv_as_df(path=segment['path'], columns=self.keys, dtypes=self.ohlc_data_settings['dtypes'])
+            for segment in segments
+        ]
+        asset_pairs = pd.Index(sorted({str(asset_pair) for frame in frames for asset_pair in frame['asset_pair'].unique()}))
+        later_keys: List[Optional[np.ndarray]] = [None]
+        for frame in reversed(frames):
+            keys = encode_keys(df=frame, asset_pairs=asset_pairs)
+            later_keys.insert(0, keys if later_keys[0] is None else np.union1d(later_keys[0], keys))
+        return asset_pairs, later_keys
+
+    def read_chunks(
+            self,
+            chunksize: Optional[int],
+            columns: List[str],
+            data_filter: DataFilter
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Read raw chunks of stored data (history then segments), only the needed fields are parsed.
+
+        Files are skipped when their timestamp range does not match the filters, rows are not filtered otherwise.
+        Rows replaced by a later segment are dropped.
+
+        :param chunksize: maximum number of rows read at once, None to read files at once
+        :param columns: fields to read (including the fields needed for filters)
+        :param data_filter: filters, used to skip files
+        :return: iterator over chunks of stored data
+        :raises NoExistingFile: if neither the file nor segments exist
+        :raises UnexpectedSchemaError: if a file schema is not the expected one
+        """
+        manifest = self.read_manifest()
+        segments = [
+            segment for segment in manifest['segments']
+            if (data_filter.start_tmsp is None or segment['max_tmsp'] >= data_filter.start_tmsp)
+            and (data_filter.end_tmsp is None or segment['min_tmsp'] <= data_filter.end_tmsp)
+        ]
+        paths = [segment['path'] for segment in segments]
+        asset_pairs, later_keys = self.read_later_keys(segments=segments)
+        try:
+            DataChecker(df=read_csv_as_df(path=self.path, nrows=0)).check_schema(
+                schema=self.ohlc_data_settings['schema']
+            )
+            history_max_tmsp = manifest.get('history_max_tmsp', np.inf)  # unknown if written by a previous version
+            if data_filter.start_tmsp is None or (history_max_tmsp is not None and history_max_tmsp >= data_filter.start_tmsp):
+                paths.insert(0, self.path)
+            else:
+                later_keys.pop(0)
+        except NoExistingFile:
+            if not manifest['segments']:
+                raise
+            later_keys.pop(0)
+
+        read_columns = columns + [key for key in self.keys if key not in columns]
+        for path, keys in zip(paths, later_keys):
+            chunks = read_csv_as_df(
+                path=path,
+                columns=read_columns,
+                dtypes=self.ohlc_data_settings['dtypes'],
+                chunksize=chunksize
+            )
+            for chunk in [chunks] if chunksize is None else chunks:
+                if keys is not None:
+                    chunk = chunk[~np.isin(encode_keys(df=chunk, asset_pairs=asset_pairs), keys)]
+                yield chunk
+
+    def fingerprint(self) -> Dict[str, str]:
+        """
+        Describe the version of the history and of the manifest, segments are only written with the manifest.
+
+        :return: version of each file (see `describe_file`)
+        :raises NoExistingFile: if neither the file nor the manifest exist
+        """
+        fingerprint = {}
+        for path in (self.path, self.manifest_path):
+            openfile = fsspec.open(path)
+            try:
+                fingerprint[path] = describe_file(openfile.fs.info(openfile.path))
+            except FileNotFoundError:
+                continue
+        if not fingerprint:
+            raise NoExistingFile(path=self.path)
+        return fingerprint
+
+    def write(self, df: pd.DataFrame) -> None:
+        """
+        Overwrite stored data, segments are removed.
+
+        :param df: data to store
+        """
+        segments = self.read_manifest()['segments']
+        df.to_csv(self.path, index=False, date_format='%Y-%m-%d %H:%M:%S')
+        self.count_bytes_written(self.path)
+        write_json(
+            data={'segments': [], 'history_max_tmsp': int(df['tmsp'].max()) if len(df) else None},
+            path=self.manifest_path
+        )
+        for segment in segments:
+            remove_path(segment['path'])
+
+    def write_segment(self, df: pd.DataFrame) -> Dict:
+        """
+        Write data as a new segment, the manifest is not updated.
+
+        :param df: data
+        :return: manifest entry of the segment
+        """
+        segment_path = f"{self.path.rsplit('.csv', 1)[0]}.{new_segment_id()}.csv"
+        df.to_csv(segment_path, index=False, date_format='%Y-%m-%d %H:%M:%S')
+        self.count_bytes_written(segment_path)
+        return {
+            'path': segment_path,
+            'rows': len(df),
+            'min_tmsp': int(df['tmsp'].min()),
+            'max_tmsp': int(df['tmsp'].max())
+        }
+
+    def append(self, df: pd.DataFrame) -> None:
+        """
+        Add new data to stored data, as a new segment.
+
+        :param df: new data
+        """
+        if df.empty:
+            return
+        manifest = self.read_manifest()
+        manifest['segments'].append(self.write_segment(df=df))
+        write_json(data=manifest, path=self.manifest_path)
+
+    def merge_recent_segments(self, manifest: Dict) -> List[str]:
+        """
+        Merge the last segment with the previous ones, as long as they are not bigger than the merged ones.
+
+        As in a binary counter, each row is merged a logarithmic number of times until the next compaction.
+
+        :param manifest: the manifest, updated with the merged segment
+        :return: paths of the merged segments, to be removed once the manifest is written
+        """
+        segments = manifest['segments']
+        first = len(segments) - 1
+        rows = segments[first]['rows']
+        while first > 0 and segments[first - 1]['rows'] <= rows:
+            first -= 1
+            rows += segments[first]['rows']
+        if first == len(segments) - 1:
+            return []
+        merged_df = merge_last_write_wins(
+            frames=[
+                read_csv_as_df(path=segment['path'], dtypes=self.ohlc_data_settings['dtypes'])
+                for segment in segments[first:]
+            ],
+            keys=self.keys
+        )
+        manifest['segments'] = segments[:first] + [self.write_segment(df=merged_df)]
+        return [segment['path'] for segment in segments[first:]]
+
+    def upsert(self, df: pd.DataFrame) -> None:
+        """
+        Add new data to stored data, replacing stored rows having the same keys (last write wins).
+
+        New data is written as a new segment, that replaces stored rows when data is read:
+        only new data (and recent segments, see `merge_recent_segments`) is written.
+
+        :param df: new data
+        """
+        if df.empty:
+            return
+        manifest = self.read_manifest()
+        manifest['segments'].append(self.write_segment(df=df))
+        merged_paths = self.merge_recent_segments(manifest=manifest)
+        write_json(data=manifest, path=self.manifest_path)
+        for path in merged_paths:
+            remove_path(path)
+
+    def compact(self) -> None:
+        """
+        Merge segments into the history file, rows having the same keys are deduplicated (last write wins).
+        """
+        if not self.read_manifest()['segments']:
+            return
+        self.write(merge_last_write_wins(frames=list(self.iter_chunks(chunksize=None)), keys=self.keys))
+
+
+class ParquetStorage(Storage):
+    """
+    Columnar storage: a parquet dataset partitioned by asset pair and month.
+
+    Layout: <path>/asset_pair=<asset_pair>/month=<YYYY-MM>/<segment_id>-<i>.parquet
+    Each append only writes new files (segments) into the partitions it touches,
+    each upsert only rewrites the partitions it touches.
+    """
+
+    partition_cols = ['asset_pair', 'month']
+
+    def read_chunks(
+            self,
+            chunksize: Optional[int],
+            columns: List[str],
+            data_filter: DataFilter
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Read raw chunks of stored data.
+
+        Filters are pushed down to the dataset, partitions are pruned by asset pair and month.
+
+        :param chunksize: maximum number of rows read at once, None to read the dataset at once
+        :param columns: fields to read (including the fields needed for filters)
+        :param data_filter: filters
+        :return: iterator over chunks of stored data
+        :raises NoExistingFile: if the dataset does not exist
+        """
+        filters = data_filter.to_parquet_filters()
+        try:
+            if chunksize is None:
+                yield pd.read_parquet(self.path, columns=columns, filters=filters)
+                return
+            openfile = fsspec.open(self.path)
+            dataset = ds.dataset(openfile.path, filesystem=openfile.fs, format='parquet', partitioning='hive')
+        except FileNotFoundError:
+            raise NoExistingFile(path=self.path)
+
+        for batch in dataset.to_batches(
+                columns=columns,
+                filter=pq.filters_to_expression(filters) if filters else None,
+                batch_size=chunksize
+        ):
+            yield batch.to_pandas()
+
+    def fingerprint(self) -> Dict[str, str]:
+        """
+        Describe the version of the files of the dataset, listed at once.
+
+        :return: version of each file (see `describe_file`)
+        :raises NoExistingFile: if the dataset does not exist
+        """
+        openfile = fsspec.open(self.path)
+        try:
+            files = openfile.fs.find(openfile.path, detail=True)
+        except FileNotFoundError:
+            files = {}
+        if not files:
+            raise NoExistingFile(path=self.path)
+        return {path: describe_file(info) for path, info in sorted(files.items())}
+
+    def write(self, df: pd.DataFrame) -> None:
+        """
+        Overwrite stored data.
+
+        :param df: data to store
+        """
+        remove_path(self.path, recursive=True)
+        self.append(df)
+
+    def append(self, df: pd.DataFrame) -> None:
+        """
+        Add new data to stored data, as new files in the partitions touched.
+
+        :param df: new data
+        """
+        if df.empty:
+            return
+        df = df.assign(
+            asset_pair=df['asset_pair'].astype(str),
+            month=tmsp_to_month(df['tmsp'].values)
+        )
+        segment_id = new_segment_id()
+        df.to_parquet(
+            self.path,
+            partition_cols=self.partition_cols,
+            index=False,
+            basename_template=f'{segment_id}-{{i}}.parquet'
+        )
+        openfile = fsspec.open(self.path)
+        self.bytes_written += sum(
+            openfile.fs.size(segment_path)
+            for segment_path in openfile.fs.glob(f"{openfile.path.rstrip('/')}/*/*/{segment_id}-*.parquet")
+        )
+
+    def merge_partition(self, fs: fsspec.AbstractFileSystem, partition: str, df: Optional[pd.DataFrame] = None) -> None:
+        """
+        Merge the segments of a partition (and new data) into a single file, last write wins.
+
+        :param fs: filesystem of the dataset
+        :param partition: path of the partition directory
+        :param df: new data of the partition, without partition fields
+        """
+        segment_paths = sorted(fs.glob(f'{partition}/*.parquet'))
+        frames = []
+        for segment_path in segment_paths:
+            with fs.open(segment_path, 'rb') as segment:
+                frames.append(pd.read_parquet(segment))
+        if df is not None:
+            frames.append(df)
+        fs.makedirs(partition, exist_ok=True)
+        merged_path = f'{partition}/{new_segment_id()}-0.parquet'
+        with fs.open(merged_path, 'wb') as merged:
+            merge_last_write_wins(frames=frames, keys=['tmsp']).to_parquet(merged, index=False)
+        self.bytes_written += fs.size(merged_path)
+        if segment_paths:
+            fs.rm(segment_paths)
+
+    def upsert(self, df: pd.DataFrame) -> None:
+        """
+        Add new data to stored data, replacing stored rows having the same keys (last write wins).
+
+        Each partition touched is merged with new data into a single file.
+
+        :param df: new data
+        """
+        if df.empty:
+            return
+        openfile = fsspec.open(self.path)
+        months = tmsp_to_month(df['tmsp'].values)
+        for (asset_pair, month), partition_df in df.groupby(
+                [df['asset_pair'].astype(str).values, months], sort=False
+        ):
+            self.merge_partition(
+                fs=openfile.fs,
+                partition=f"{openfile.path.rstrip('/')}/asset_pair={asset_pair}/month={month}",
+                df=partition_df.drop(columns=['asset_pair']).reset_index(drop=True)
+            )
+
+    def compact(self) -> None:
+        """
+        Merge the segments of each partition into a single file, rows having the same keys are deduplicated.
+        """
+        openfile = fsspec.open(self.path)
+        fs = openfile.fs
+        partitions = defaultdict(list)
+        for segment_path in sorted(fs.glob(f"{openfile.path.rstrip('/')}/*/*/*.parquet")):
+            partitions[segment_path.rsplit('/', 1)[0]].append(segment_path)
+
+        for partition, segment_paths in partitions.items():
+            if len(segment_paths) > 1:
+                self.merge_partition(fs=fs, partition=partition)
+
+
+STORAGE_BACKENDS = {
+    'csv': CsvStorage,
+    'parquet': ParquetStorage
+}
+
+
+def get_storage(path: str, backend: str = 'csv', ohlc_data_settings: Dict = OHLC_DATA) -> Storage:
+    """
+    Get the storage backend for OHLC data.
+
+    :param path: storage path (csv file or parquet dataset directory)
+    :param backend: name of the backend, see `STORAGE_BACKENDS`
+    :param ohlc_data_settings: OHLC data settings
+    :return: the storage
+    :raises StorageBackendNotHandled: if the backend is unknown
+    """
+    if backend not in STORAGE_BACKENDS:
+        raise StorageBackendNotHandled(backend=backend, handled_backends=list(STORAGE_BACKENDS))
+    return STORAGE_BACKENDS[backend](path=path, ohlc_data_settings=ohlc_data_settings)
@@ -0,0 +1,237 @@
+"""
+Streaming ingestion of OHLC data from the WebSocket feed of Kraken.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, List, Optional, Union
+
+import aiohttp
+import pandas as pd
+
+from modules.models.collect_data import KrakenDataCollector
+from modules.models.config import KRAKEN_CLIENT_SETTINGS, STREAM_SETTINGS
+from modules.models.exceptions import NoExistingFile
+from modules.models.kraken_client import compute_backoff
+from modules.models.ohlc_store import OHLCStore
+from modules.models.storage import Storage, get_storage
+from modules.models.summary import summarize_storage, update_summary
+from modules.models.utils import read_json, suffix_path, write_json
+
+logger = logging.getLogger('stream data')
+logging.basicConfig(level=logging.INFO)
+
+
+class OHLCStreamer:
+    """
+    Class for streaming the OHLC candles of all the asset pairs targeted by a collector.
+
+    The `ohlc` channel of the WebSocket feed sends the in-progress candle of an asset pair whenever it changes.
+    In-progress candles are updated in memory, a candle is closed when the next one starts.
+    Every `flush_interval_in_seconds`, closed candles and a snapshot of in-progress candles are upserted
+    into storage (in-progress candles are replaced by the next flushes), then the summary and the watermarks
+    of the collector are updated, so that batch collections resume from streamed data.
+    Upserts only write the micro-batch (a segment with csv, see `CsvStorage.upsert`), the storage of the interval
+    is to be compacted periodically (see `compact_data`).
+    The connection is reopened with a backoff if it is lost.
+    """
+
+    def __init__(
+            self,
+            collector: KrakenDataCollector,
+            storage: Storage,
+            stream_settings: Dict = STREAM_SETTINGS,
+            client_settings: Dict = KRAKEN_CLIENT_SETTINGS
+    ):
+        self.collector = collector
+        self.storage = storage
+        self.stream_settings = {**STREAM_SETTINGS, **stream_settings}
+        self.client_settings = {**KRAKEN_CLIENT_SETTINGS, **client_settings}
+        self.interval_in_seconds = int(collector.collection_settings['query_period_in_minutes']) * 60
+        self.asset_pairs_by_wsname = {
+            asset_pair_info['wsname']: asset_pair for asset_pair, asset_pair_info in collector.assets.items()
+        }
+        self.open_candles: Dict[str, List] = {}
+        self.closed_candles = OHLCStore(asset_pairs=collector.assets, ohlc_data_settings=collector.ohlc_data_settings)
+        self.updated = False
+
+    def build_subscription(self) -> Dict:
+        """
+        Build the message subscribing to the `ohlc` channel for all the asset pairs.
+
+        :return: the message
+        """
+        return {
+            'event': 'subscribe',
+            'pair': list(self.asset_pairs_by_wsname),
+            'subscription': {
+                'name': 'ohlc',
+                'interval': int(self.collector.collection_settings['query_period_in_minutes'])
+            }
+        }
+
+    def handle_message(self, message: Union[Dict, List]) -> None:
+        """
+        Handle a message of the WebSocket feed.
+
+        Events (system status, subscription status, heartbeats) are objects, candles are arrays:
+        [
+            42,
+            ['1672531230.123456', '1672531260.000000', '15500.1', '15620.0', '15490.0', '15600.2', '15550.0',
+             '80.50000000', 8],
+            'ohlc-1',
+            'XBT/EUR'
+        ]
+        The candle gives its last update time and its end time, followed by prices, volume and count
+        as in REST payloads.
+
+        :param message: decoded message
+        """
+        if isinstance(message, dict):
+            if message.get('status') == 'error':
+                logger.error(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : {message.get('errorMessage')} {message}")
+            return
+        _, candle, _, wsname = message
+        asset_pair = self.asset_pairs_by_wsname.get(wsname)
+        if asset_pair is None:
+            return
+        # same layout as REST candles: [time, open, high, low, close, vwap, volume, count]
+        rest_candle = [int(float(candle[1])) - self.interval_in_seconds] + candle[2:]
+        open_candle = self.open_candles.get(asset_pair)
+        if open_candle is not None and rest_candle[0] < open_candle[0]:
+            return
+        if open_candle is not None and rest_candle[0] > open_candle[0]:
+            self.closed_candles.append(asset_pair=asset_pair, candles=[open_candle])
+        self.open_candles[asset_pair] = rest_candle
+        self.updated = True
+
+    def take_batch(self) -> pd.DataFrame:
+        """
+        Take closed candles and a snapshot of in-progress candles, closed candles are released.
+
+        :return: the micro-batch
+        """
+        batch = self.closed_candles
+        for asset_pair, candle in self.open_candles.items():
+            batch.append(asset_pair=asset_pair, candles=[candle])
+        self.closed_candles = OHLCStore(
+            asset_pairs=self.collector.assets, ohlc_data_settings=self.collector.ohlc_data_settings
+        )
+        self.updated = False
+        return batch.to_frame()
+
+    def flush(self, df: pd.DataFrame) -> None:
+        """
+        Upsert a micro-batch into storage, then update the summary and the watermarks.
+
+        :param df: the micro-batch
+        """
+        collection_settings = self.collector.collection_settings
+        interval_labels = {'interval': collection_settings['query_period_in_minutes']}
+        bytes_written = self.storage.bytes_written
+        with self.collector.metrics.timer('stream_flush', labels=interval_labels):
+            self.storage.upsert(df)
+            try:
+                summary = update_summary(summary=read_json(path=collection_settings['summary_path']), new_data_df=df)
+            except NoExistingFile:
+                summary = summarize_storage(storage=self.storage)
+            write_json(data=summary, path=collection_settings['summary_path'])
+            self.collector.update_watermarks(new_data_df=df)
+            self.collector.write_watermarks(collection_settings['watermarks_path'])
+        self.collector.metrics.increment('stream_rows_flushed', value=len(df), labels=interval_labels)
+        self.collector.metrics.increment(
+            'stream_bytes_written', value=self.storage.bytes_written - bytes_written, labels=interval_labels
+        )
+        logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : {len(df)} candles pushed to {self.storage.path}")
+
+    async def flush_updates(self) -> None:
+        """
+        Flush the candles updated since the previous flush, storage is written in a thread.
+        """
+        if self.updated:
+            await asyncio.get_running_loop().run_in_executor(None, self.flush, self.take_batch())
+
+    async def stream(self, duration_in_seconds: Optional[float] = None) -> None:
+        """
+        Stream candles, flushing them every `flush_interval_in_seconds`.
+
+        :param duration_in_seconds: how long to stream, forever if not provided
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if duration_in_seconds is None else loop.time() + duration_in_seconds
+        next_flush = loop.time() + self.stream_settings['flush_interval_in_seconds']
+        attempt = 0
+        async with aiohttp.ClientSession() as session:
+            while deadline is None or loop.time() < deadline:
+                try:
+                    async with session.ws_connect(
+                            self.stream_settings['ws_url'],
+                            heartbeat=self.stream_settings['heartbeat_in_seconds']
+                    ) as ws:
+                        await ws.send_json(self.build_subscription())
+                        logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Subscribed to {self.stream_settings['ws_url']}")
+                        while deadline is None or loop.time() < deadline:
+                            timeout = next_flush - loop.time()
+                            if deadline is not None:
+                                timeout = min(timeout, deadline - loop.time())
+                            try:
+                                msg = await ws.receive(timeout=max(timeout, 0))
+                            except asyncio.TimeoutError:
+                                msg = None
+                            if msg is not None and msg.type == aiohttp.WSMsgType.TEXT:
+                                self.collector.metrics.increment('stream_messages')
+                                self.handle_message(json.loads(msg.data))
+                                attempt = 0
+                            elif msg is not None:  # closed, closing or error
+                                break
+                            if loop.time() >= next_flush:
+                                await self.flush_updates()
+                                next_flush = loop.time() + self.stream_settings['flush_interval_in_seconds']
+                except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                    logger.warning(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Stream failed with {err}")
+                if deadline is not None and loop.time() >= deadline:
+                    break
+                delay = compute_backoff(attempt=attempt, client_settings=self.client_settings)
+                logger.warning(f"{time.strftime('%Y-%m-%d %H:%M:%S')} : Stream closed, reconnecting in {delay:.2f}s")
+                self.collector.metrics.increment('stream_reconnections')
+                await asyncio.sleep(delay)
+                attempt += 1
+        await self.flush_updates()
+
+    def run(self, duration_in_seconds: Optional[float] = None) -> None:
+        """
+        Stream candles, blocking until done (see `stream`).
+
+        :param duration_in_seconds: how long to stream, forever if not provided
+        """
+        asyncio.run(self.stream(duration_in_seconds=duration_in_seconds))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stream OHLC data from Kraken.')
+    parser.add_argument('--interval', default=STREAM_SETTINGS['interval_in_minutes'], help='interval in minutes')
+    parser.add_argument('--duration', type=float, default=None, help='how long to stream in seconds, forever by default')
+    args = parser.parse_args()
+
+    with KrakenDataCollector() as kdc:  # the session of the client is released even if the stream fails
+        kdc.clean_assets(kdc.get_assets())
+        kdc = kdc.for_interval(interval_in_minutes=args.interval)
+        try:
+            kdc.read_watermarks(kdc.collection_settings['watermarks_path'])
+        except NoExistingFile as err:
+            logger.error(f"{err}")
+
+        streamer = OHLCStreamer(
+            collector=kdc,
+            storage=get_storage(
+                path=kdc.collection_settings['storage_path'],
+                backend=kdc.collection_settings['storage_backend']
+            )
+        )
+        try:
+            streamer.run(duration_in_seconds=args.duration)
+        finally:
+            kdc.metrics.write(path=suffix_path(path=kdc.collection_settings['metrics_path'], suffix='_stream'))
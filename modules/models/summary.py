@@ -0,0 +1,112 @@
+"""
+Summary of stored OHLC data, persisted so that readers do not have to scan the history.
+"""
+
+import time
+from typing import Dict, Optional
+
+import pandas as pd
+
+from modules.models.storage import Storage
+
+SUMMARY_COLUMNS = ['asset_pair', 'asset', 'currency', 'tmsp']
+
+
+def summarize(df: pd.DataFrame) -> Dict[str, Dict]:
+    """
+    Summarize OHLC data for each asset pair, in a single grouped pass.
+
+    :param df: OHLC data (at least `SUMMARY_COLUMNS`)
+    :return: asset, currency, number of rows and min/max timestamps of each asset pair
+    """
+    if df.empty:
+        return {}
+    stats = df.groupby('asset_pair', sort=False, observed=True).agg(
+        asset=('asset', 'first'),
+        currency=('currency', 'first'),
+        rows=('tmsp', 'size'),
+        min_tmsp=('tmsp', 'min'),
+        max_tmsp=('tmsp', 'max')
+    )
+    return {
+        str(asset_pair): {
+            'asset': str(asset),
+            'currency': str(currency),
+            'rows': int(rows),
+            'min_tmsp': int(min_tmsp),
+            'max_tmsp': int(max_tmsp)
+        }
+        for asset_pair, asset, currency, rows, min_tmsp, max_tmsp in stats.itertuples(name=None)
+    }
+
+
+def merge_asset_pair_summaries(summary: Dict[str, Dict], other: Dict[str, Dict]) -> Dict[str, Dict]:
+    """
+    Merge the summaries of two disjoint sets of rows.
+
+    :param summary: summary of each asset pair
+    :param other: summary of each asset pair for other rows
+    :return: merged summary of each asset pair
+    """
+    merged = {asset_pair: dict(stats) for asset_pair, stats in summary.items()}
+    for asset_pair, stats in other.items():
+        if asset_pair not in merged:
+            merged[asset_pair] = dict(stats)
+            continue
+        merged[asset_pair]['rows'] += stats['rows']
+        merged[asset_pair]['min_tmsp'] = min(merged[asset_pair]['min_tmsp'], stats['min_tmsp'])
+        merged[asset_pair]['max_tmsp'] = max(merged[asset_pair]['max_tmsp'], stats['max_tmsp'])
+    return merged
+
+
+def build_summary(asset_pairs: Dict[str, Dict]) -> Dict:
+    """
+    Build the persisted summary from the summary of each asset pair.
+
+    :param asset_pairs: summary of each asset pair
+    :return: summary, with totals over all the asset pairs and the time of the run
+    """
+    return {
+        'asset_pairs': asset_pairs,
+        'assets': sorted({stats['asset'] for stats in asset_pairs.values()}),
+        'rows': sum(stats['rows'] for stats in asset_pairs.values()),
+        'min_tmsp': min((stats['min_tmsp'] for stats in asset_pairs.values()), default=None),
+        'max_tmsp': max((stats['max_tmsp'] for stats in asset_pairs.values()), default=None),
+        'last_run': time.strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+
+def summarize_storage(storage: Storage, chunksize: Optional[int] = 100_000) -> Dict:
+    """
+    Summarize all the stored data, chunk by chunk.
+
+    :param storage: storage of OHLC data
+    :param chunksize: maximum number of rows read at once
+    :return: summary
+    :raises NoExistingFile: if nothing is stored yet
+    """
+    asset_pairs = {}
+    for chunk in storage.iter_chunks(chunksize=chunksize, columns=SUMMARY_COLUMNS):
+        asset_pairs = merge_asset_pair_summaries(asset_pairs, summarize(chunk))
+    return build_summary(asset_pairs=asset_pairs)
+
+
+def update_summary(summary: Dict, new_data_df: pd.DataFrame) -> Dict:
+    """
+    Update a summary with new data, without reading stored data.
+
+    Rows that are not newer than the last timestamp of their asset pair replace stored rows (upsert),
+    they are not counted again.
+
+    :param summary: previous summary
+    :param new_data_df: new data, not summarized yet
+    :return: updated summary
+    """
+    max_tmsp = {asset_pair: stats['max_tmsp'] for asset_pair, stats in summary['asset_pairs'].items()}
+    previous_max_tmsp = new_data_df['asset_pair'].astype(str).map(max_tmsp).fillna(-1).to_numpy()
+    return build_summary(
+        asset_pairs=merge_asset_pair_summaries(
+            summary['asset_pairs'],
+            summarize(new_data_df[new_data_df['tmsp'].to_numpy() > previous_max_tmsp])
+        )
+    )
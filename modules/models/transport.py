@@ -0,0 +1,113 @@
+"""
+Pooled HTTP sessions shared by Kraken API calls and scraping.
+"""
+
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from modules.models.config import TRANSPORT_SETTINGS
+from modules.models.metrics import MetricsRegistry
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTP adapter keeping a pool of keep-alive connections per host, with default timeouts.
+
+    Each request is counted, as well as each connection opened by the pools (through `metrics` if provided):
+    requests not opening a connection reused a pooled one.
+    """
+
+    def __init__(
+            self,
+            pool_size: int,
+            transport_settings: Dict = TRANSPORT_SETTINGS,
+            metrics: Optional[MetricsRegistry] = None
+    ):
+        self.transport_settings = {**TRANSPORT_SETTINGS, **transport_settings}
+        self.timeout = (
+            self.transport_settings['connect_timeout_in_seconds'],
+            self.transport_settings['read_timeout_in_seconds']
+        )
+        self.metrics = metrics
+        self.requests = 0
+        self.opened_connections: Dict[object, int] = {}  # by pool key, pools may be evicted by the manager
+        self.lock = threading.Lock()
+        super().__init__(
+            pool_connections=self.transport_settings['pool_connections'],
+            pool_maxsize=pool_size
+        )
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        """
+        Send a request, with the default timeouts if none is given.
+
+        :param request: the request
+        :return: the response
+        """
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            self.count_request(url=request.url)
+
+    def count_request(self, url: str) -> None:
+        """
+        Count a request, and the connections opened by the pools of its host since the previous request.
+
+        :param url: url of the request
+        """
+        host = urlsplit(url).hostname
+        opened = 0
+        with self.lock:
+            self.requests += 1
+            for pool_key in self.poolmanager.pools.keys():
+                pool = self.poolmanager.pools.get(pool_key)
+                if pool is None or pool.host != host:
+                    continue
+                opened += pool.num_connections - self.opened_connections.get(pool_key, 0)
+                self.opened_connections[pool_key] = pool.num_connections
+        if self.metrics is not None:
+            labels = {'host': host}
+            self.metrics.increment('http_requests', labels=labels)
+            self.metrics.increment('http_connections_opened', value=opened, labels=labels)
+
+    def connection_stats(self) -> Dict[str, int]:
+        """
+        Get the counts of requests and opened connections.
+
+        :return: requests, connections opened and requests that reused a pooled connection
+        """
+        with self.lock:
+            opened = sum(self.opened_connections.values())
+            return {'requests': self.requests, 'connections_opened': opened, 'reused': self.requests - opened}
+
+
+def build_session(
+        pool_size: int,
+        transport_settings: Dict = TRANSPORT_SETTINGS,
+        metrics: Optional[MetricsRegistry] = None,
+        user_agent: Optional[str] = None
+) -> requests.Session:
+    """
+    Build a session with pooled keep-alive connections, default timeouts and compressed responses.
+
+    :param pool_size: max number of connections kept per host, ex. the number of workers sharing the session
+    :param transport_settings: timeouts and pools settings
+    :param metrics: registry counting requests and opened connections
+    :param user_agent: user agent of the requests, the one of requests if not provided
+    :return: the session
+    """
+    transport_settings = {**TRANSPORT_SETTINGS, **transport_settings}
+    session = requests.Session()
+    adapter = PooledHTTPAdapter(pool_size=pool_size, transport_settings=transport_settings, metrics=metrics)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Accept-Encoding'] = transport_settings['accept_encoding']
+    if user_agent is not None:
+        session.headers['User-Agent'] = user_agent
+    return session
@@ -3,8 +3,10 @@ Module for python utils.
 """
 
 
-from typing import Any, List, Union
+import json
+from typing import Any, Dict, Iterator, List, Optional, Union
 
+import fsspec
 import pandas as pd
 
 from modules.models.exceptions import (AccessDataframeFieldFailure,
@@ -12,24 +14,62 @@ from modules.models.exceptions import (AccessDataframeFieldFailure,
                                        NotConsistentDataForDataframe)
 
 
-def read_csv_as_df(path: str) -> pd.DataFrame:
+def read_csv_as_df(
+        path: str,
+        columns: Optional[List[str]] = None,
+        dtypes: Optional[Dict[str, str]] = None,
+        chunksize: Optional[int] = None,
+        nrows: Optional[int] = None
+) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
     """
     Read csv as dataframe. Path can be anything : local, s3 url etc.
 
     :param path: path of the file
-    :return: dataframe
+    :param columns: only read these fields, all fields by default
+    :param dtypes: dtypes of the fields, datetime fields are parsed as dates
+    :param chunksize: if provided, an iterator over dataframes of (at most) chunksize rows is returned
+    :param nrows: only read this number of rows
+    :return: dataframe, or iterator over dataframes if chunksize is provided
     :raises NoExistingFile: if file does not exist
     """
 
     if '.csv' not in path:
         raise FileTypeNotHandled(path)
 
+    dtypes = {
+        field: dtype for field, dtype in (dtypes or {}).items()
+        if columns is None or field in columns
+    }
     try:
-        return pd.read_csv(filepath_or_buffer=path)
+        return pd.read_csv(
+            filepath_or_buffer=path,
+            usecols=columns,
+            dtype={field: dtype for field, dtype in dtypes.items() if not dtype.startswith('datetime')} or None,
+            parse_dates=[field for field, dtype in dtypes.items() if dtype.startswith('datetime')] or False,
+            chunksize=chunksize,
+            nrows=nrows
+        )
     except FileNotFoundError:
         raise NoExistingFile(path=path)
 
 
+def suffix_path(path: str, suffix: str) -> str:
+    """
+    Add a suffix to the name of a file or directory, before its extension if any.
+
+    Example: suffix_path('s3://foo/data.csv', '_60m') -> 's3://foo/data_60m.csv'
+
+    :param path: path of the file or directory
+    :param suffix: suffix to add
+    :return: suffixed path
+    """
+
+    directory, _, name = path.rstrip('/').rpartition('/')
+    stem, dot, extension = name.rpartition('.')
+    suffixed_name = f'{stem}{suffix}{dot}{extension}' if dot else f'{name}{suffix}'
+    return f'{directory}/{suffixed_name}' if directory else suffixed_name
+
+
 def build_df_from_schema_and_data(schema: List[str], data: List[List]) -> pd.DataFrame:
     """
     Build dataframe using a list of data.
@@ -50,6 +90,18 @@ def build_df_from_schema_and_data(schema: List[str], data: List[List]) -> pd.Dat
     return df
 
 
+def apply_dtypes(df: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+    """
+    Cast the fields of a df regarding the provided dtypes. Fields that are not in the df are ignored.
+
+    :param df: the provided df
+    :param dtypes: mapping between field names and dtypes
+    :return: the df with casted fields
+    """
+
+    return df.astype({field: dtype for field, dtype in dtypes.items() if field in df.columns})
+
+
 def compute_max_for_given_filter(
         df: pd.DataFrame,
         maxed_field: str,
@@ -71,3 +123,51 @@ def compute_max_for_given_filter(
         raise AccessDataframeFieldFailure(field_candidates=[maxed_field, filter_field])
     max_value = df[df[filter_field] == filter_value][maxed_field].max()
     return max_value
+
+
+def compute_max_by_group(
+        df: pd.DataFrame,
+        maxed_field: str,
+        group_field: str
+) -> Dict[Any, Union[int, float]]:
+    """
+    Compute the max value of a given field for each group of a df, in a single pass.
+
+    :param df: the provided df
+    :param maxed_field: name of the df field we base the max on
+    :param group_field: name of the df field we group by
+
+    :return: the max value for each group
+    """
+
+    if list({maxed_field, group_field} - set(df.columns)):
+        raise AccessDataframeFieldFailure(field_candidates=[maxed_field, group_field])
+    return df.groupby(group_field, sort=False, observed=True)[maxed_field].max().to_dict()
+
+
+def read_json(path: str) -> Dict:
+    """
+    Read json file as dict. Path can be anything : local, s3 url etc.
+
+    :param path: path of the file
+    :return: content of the file
+    :raises NoExistingFile: if file does not exist
+    """
+
+    try:
+        with fsspec.open(path, 'r') as jsn:
+            return json.load(jsn)
+    except FileNotFoundError:
+        raise NoExistingFile(path=path)
+
+
+def write_json(data: Dict, path: str) -> None:
+    """
+    Write dict as json file. Path can be anything : local, s3 url etc.
+
+    :param data: content of the file
+    :param path: path of the file
+    """
+
+    with fsspec.open(path, 'w') as jsn:
+        json.dump(data, jsn, sort_keys=True, indent=4)
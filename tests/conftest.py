@@ -0,0 +1,30 @@
+"""Fixtures shared by tests"""
+
+import pandas as pd
+import pytest
+
+from modules.models.config import OHLC_DATA
+from modules.models.storage import get_storage
+from modules.models.utils import apply_dtypes
+
+
+@pytest.fixture
+def ohlc_rows():
+    """Rows of OHLC data following the schema, overridden by test modules needing other candles."""
+    return [
+        ['XXBTZEUR', 'XBT/EUR', 'XBT', 'EUR', '2022-12-31 00:00:00', 1672444800, 15400.0, 15500.1, 70.5],
+        ['XXBTZEUR', 'XBT/EUR', 'XBT', 'EUR', '2023-01-01 00:00:00', 1672531200, 15500.1, 15600.2, 80.5],
+        ['XXBTZUSD', 'XBT/USD', 'XBT', 'USD', '2023-01-01 00:00:00', 1672531200, 16500.1, 16600.2, 120.5],
+        ['XXBTZUSD', 'XBT/USD', 'XBT', 'USD', '2023-01-02 00:00:00', 1672617600, 16600.2, 16650.3, 130.5]
+    ]
+
+
+@pytest.fixture
+def ohlc_df(ohlc_rows):
+    return apply_dtypes(df=pd.DataFrame(ohlc_rows, columns=OHLC_DATA['schema']), dtypes=OHLC_DATA['dtypes'])
+
+
+@pytest.fixture(params=['csv', 'parquet'])
+def storage(request, tmp_path):
+    path = str(tmp_path / 'data.csv') if request.param == 'csv' else str(tmp_path / 'data')
+    return get_storage(path=path, backend=request.param)
@@ -1,7 +1,12 @@
+from unittest.mock import MagicMock
+
 import pytest
 from bs4 import BeautifulSoup
 
-from modules.assets_mapping.update_assets_mapping import AssetMappingUpdater
+from benchmarks.fakes import generate_currencies_page
+from modules.assets_mapping import update_assets_mapping
+from modules.assets_mapping.update_assets_mapping import (AssetMappingUpdater,
+                                                          get_assets_mapping)
 from modules.models.exceptions import (NotExistingHTMLClass, UnknownURLError,
                                        WrongFormatForHTML)
 
@@ -69,3 +74,28 @@ class TestAssetMappingUpdater:
                 elem=BeautifulSoup('<a class="a"> html </a>', 'html.parser'),
                 elem_class='b'
             )
+
+    @pytest.mark.parametrize('lxml_installed', [True, False])
+    def test_extract_mapping(self, asset_mapping_updater, monkeypatch, lxml_installed):
+        if not lxml_installed:
+            monkeypatch.setattr(update_assets_mapping, 'etree', None)
+        asset_mapping_updater.html = generate_currencies_page(nbr_of_currencies=50, nbr_of_other_elements=10)
+        asset_mapping_updater.extract_mapping()
+
+        legacy_soup = BeautifulSoup(asset_mapping_updater.html, 'html.parser')
+        assert asset_mapping_updater.mapping == {
+            row.find(class_='js-currency-symbol')['title']: row.find(class_='js-currency-name')['title']
+            for row in legacy_soup.find_all('tr')[1:]
+        }
+        assert len(asset_mapping_updater.mapping) == 50
+
+    def test_extract_mapping_wrong_html(self, asset_mapping_updater):
+        asset_mapping_updater.html = 'Wrong html!'
+        with pytest.raises(WrongFormatForHTML):
+            asset_mapping_updater.extract_mapping()
+
+    def test_get_assets_mapping_with_session(self):
+        session = MagicMock()
+        session.get.return_value.text = generate_currencies_page(nbr_of_currencies=5)
+        assert len(get_assets_mapping(session=session)) == 5
+        assert session.get.call_args.kwargs['url'] == 'https://www.investing.com/crypto/currencies'
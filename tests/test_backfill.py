@@ -0,0 +1,84 @@
+"""Tests for backfill"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from modules.models.backfill import BackfillJob
+from modules.models.collect_data import KrakenDataCollector
+from modules.models.storage import CsvStorage
+from modules.models.utils import read_json
+
+
+def paged_query_public(candles, page_size, fail_after=None):
+    calls = []
+
+    def query_public(method, data):
+        calls.append(data)
+        if fail_after is not None and len(calls) > fail_after:
+            raise KeyboardInterrupt
+        page = [candle for candle in candles if candle[0] >= data['since']][:page_size]
+        return {'error': [], 'result': {data['pair']: page, 'last': page[-1][0] if page else data['since']}}
+    return query_public
+
+
+@pytest.fixture
+def hourly_candles():
+    return [[3600 * i, '1.0', '1.2', '0.9', '1.1', '1.05', '10.0', 3] for i in range(1, 8)]
+
+
+def build_job(tmp_path, query_public, pages_per_write='10'):
+    kraken_client = MagicMock()
+    kraken_client.query_public.side_effect = query_public
+    kdc = KrakenDataCollector(
+        collection_settings=dict(
+            query_period_in_minutes='60', ohlc_page_size='3', backfill_pages_per_write=pages_per_write
+        ),
+        kraken_client=kraken_client,
+        client_settings=dict(calls_per_second=1000., burst=1000)
+    )
+    kdc.assets = {'XXBTZEUR': {'wsname': 'XBT/EUR', 'asset': 'XBT', 'currency': 'EUR'}}
+    return BackfillJob(
+        collector=kdc,
+        storage=CsvStorage(path=str(tmp_path / 'data.csv')),
+        cursor_path=str(tmp_path / 'cursor.json')
+    )
+
+
+class TestBackfillJob:
+
+    def test_run_stores_committed_candles_only(self, tmp_path, hourly_candles):
+        job = build_job(tmp_path, paged_query_public(hourly_candles, page_size=3))
+
+        assert job.run() == {'XXBTZEUR': 6}
+        assert list(job.storage.read().tmsp) == [3600 * i for i in range(1, 7)]
+        assert read_json(str(tmp_path / 'cursor.json')) == {'XXBTZEUR': {'since': 25200, 'done': True}}
+        assert job.collector.watermarks == {'XXBTZEUR': 21600}
+
+    def test_run_resumes_from_cursor(self, tmp_path, hourly_candles):
+        job = build_job(tmp_path, paged_query_public(hourly_candles, page_size=3, fail_after=3), pages_per_write='2')
+        with pytest.raises(KeyboardInterrupt):
+            job.run()
+        assert read_json(str(tmp_path / 'cursor.json')) == {'XXBTZEUR': {'since': 18000, 'done': False}}
+        assert list(job.storage.read().tmsp) == [3600 * i for i in range(1, 5)]
+
+        resumed_job = build_job(tmp_path, paged_query_public(hourly_candles, page_size=3))
+        assert resumed_job.run() == {'XXBTZEUR': 2}
+        assert resumed_job.collector.kraken_client.kraken_client.query_public.call_args_list[0].args[1]['since'] == 18000
+        assert list(resumed_job.storage.read().tmsp) == [3600 * i for i in range(1, 7)]
+
+    def test_run_stores_pages_together(self, tmp_path, hourly_candles, monkeypatch):
+        job = build_job(tmp_path, paged_query_public(hourly_candles, page_size=3), pages_per_write='3')
+        upserted = []
+        upsert = job.storage.upsert
+        monkeypatch.setattr(job.storage, 'upsert', lambda df: upserted.append(len(df)) or upsert(df))
+
+        assert job.run() == {'XXBTZEUR': 6}
+        assert upserted == [6]  # 4 pages, the last one only has the open candle
+        assert read_json(str(tmp_path / 'cursor.json')) == {'XXBTZEUR': {'since': 25200, 'done': True}}
+
+    def test_run_skips_done_asset_pairs(self, tmp_path, hourly_candles):
+        build_job(tmp_path, paged_query_public(hourly_candles, page_size=3)).run()
+        job = build_job(tmp_path, paged_query_public(hourly_candles, page_size=3))
+        assert job.run() == {'XXBTZEUR': 0}
+        assert job.collector.kraken_client.kraken_client.query_public.call_count == 0
@@ -3,7 +3,7 @@
 import pandas as pd
 import pytest
 
-from modules.models.check_data import DataChecker
+from modules.models.check_data import DataChecker, DataQualityReport
 from modules.models.exceptions import UnexpectedSchemaError
 
 
@@ -20,6 +20,16 @@ def data_checker():
     )
 
 
+@pytest.fixture
+def ohlc_rows():
+    return [
+        ['XXBTZEUR', 'XBT/EUR', 'XBT', 'EUR', '2022-12-31 00:00:00', 1672444800, 15400.0, 15500.1, 70.5],
+        ['XXBTZUSD', 'XBT/USD', 'XBT', 'USD', '2023-01-01 00:00:00', 1672531200, 16500.1, 16600.2, 120.5],
+        ['XXBTZEUR', 'XBT/EUR', 'XBT', 'EUR', '2023-01-01 00:00:00', 1672531200, 15500.1, 15600.2, 80.5],
+        ['XXBTZUSD', 'XBT/USD', 'XBT', 'USD', '2023-01-02 00:00:00', 1672617600, 16600.2, 16650.3, 130.5]
+    ]
+
+
 class TestCheckData:
 
     def test_consistent_schema(self, data_checker):
@@ -34,3 +44,51 @@ class TestCheckData:
         ]
         with pytest.raises(UnexpectedSchemaError):
             data_checker.check_schema(schema=schema)
+
+    def test_check_valid_data(self, ohlc_df):
+        report = DataChecker(df=ohlc_df, interval_in_minutes='1440').check()
+        assert report.is_valid
+        assert report.rows == 4
+
+    def test_check_dtypes_and_nulls(self, ohlc_df):
+        ohlc_df = ohlc_df.astype({'tmsp': 'float64'})
+        ohlc_df.loc[0, 'volume'] = None
+        report = DataChecker(df=ohlc_df.drop(columns=['wsname'])).check()
+        assert report.missing_columns == ['wsname']
+        assert report.dtype_mismatches == {'tmsp': 'float64'}
+        assert report.null_rates == {'volume': 0.25}
+        assert not report.is_valid
+
+    def test_check_timestamps(self, ohlc_df):
+        ohlc_df = pd.concat([ohlc_df, ohlc_df.iloc[[0, 3]]], ignore_index=True)
+        ohlc_df.loc[5, 'tmsp'] = 1672617600 + 3 * 86400
+        report = DataChecker(df=ohlc_df, interval_in_minutes='1440').check()
+        assert report.duplicated_keys == 1
+        assert report.non_monotonic_timestamps == 1
+        assert report.gaps == 1
+
+    def test_check_non_positive_prices(self, ohlc_df):
+        ohlc_df.loc[1, 'open_price'] = 0.
+        ohlc_df.loc[2, 'close_price'] = -1.
+        assert DataChecker(df=ohlc_df).check().non_positive_prices == 2
+
+    def test_check_chunks(self, ohlc_df):
+        data_checker = DataChecker(interval_in_minutes='1440')
+        chunks = [ohlc_df.iloc[:2], ohlc_df.iloc[2:], ohlc_df.iloc[2:3]]
+        report = data_checker.check_chunks(chunks=chunks)
+        assert report.rows == 5
+        assert report.duplicated_keys == 1
+        assert report.non_monotonic_timestamps == 0
+
+    def test_check_previous_tmsp(self, ohlc_df):
+        report = DataChecker(
+            df=ohlc_df, interval_in_minutes='1440', previous_tmsp={'XXBTZEUR': 1672444800 - 2 * 86400}
+        ).check()
+        assert report.gaps == 1
+
+    def test_merge_reports(self):
+        report = DataQualityReport(rows=2, null_counts={'volume': 1}, gaps=1).merge(
+            DataQualityReport(rows=2, null_counts={'volume': 1, 'tmsp': 1}, gaps=1)
+        )
+        assert report.null_rates == {'volume': 0.5, 'tmsp': 0.25}
+        assert report.gaps == 2
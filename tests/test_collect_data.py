@@ -1,11 +1,20 @@
 """Tests for data collection from Kraken"""
 
+import asyncio
+import inspect
+import time
 from unittest.mock import MagicMock
 
 import numpy as np
+import pandas as pd
 import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer, unused_port
 
-from modules.models.collect_data import KrakenDataCollector
+from benchmarks.fakes import FakeKrakenClient
+from modules.models.collect_data import (AsyncKrakenDataCollector,
+                                         KrakenDataCollector,
+                                         get_interval_settings)
 
 
 @pytest.fixture
@@ -85,10 +94,335 @@ class TestCleanAssets:
         }
 
 
+class TestLifecycle:
+
+    def test_session_closed_when_collection_fails(self, kraken_data_collector):
+        with pytest.raises(RuntimeError):
+            with kraken_data_collector as kdc:
+                raise RuntimeError('collection failed')
+        kdc.kraken_client.kraken_client.close.assert_called_once()
+
+
 class TestGetData:
 
     def test_compute_starting_timestamp_nan(self, kraken_data_collector):
         assert kraken_data_collector.compute_starting_timestamp(np.nan) == 0
 
     def test_compute_starting_timestamp_not_nan(self, kraken_data_collector):
-        assert kraken_data_collector.compute_starting_timestamp(40) == 100
+        assert kraken_data_collector.compute_starting_timestamp(1672531200) == 1672527600
+
+    def test_compute_starting_timestamp_not_negative(self, kraken_data_collector):
+        assert kraken_data_collector.compute_starting_timestamp(40) == 0
+
+
+@pytest.fixture
+def ohlc_payloads():
+    return {
+        'XXBTZUSD': [[1672531200, '16500.1', '16620.0', '16490.0', '16600.2', '16550.0', '120.5', 10]],
+        'XXBTZEUR': [
+            [1672531200, '15500.1', '15620.0', '15490.0', '15600.2', '15550.0', '80.5', 8],
+            [1672617600, '15600.2', '15700.0', '15500.0', '15650.3', '15600.0', '90.5', 9]
+        ]
+    }
+
+
+@pytest.fixture
+def ohlc_kraken_data_collector(ohlc_payloads):
+    def query_public(method, data):
+        # the first pair answers last, so completion order differs from assets order
+        time.sleep(0.05 if data['pair'] == 'XXBTZUSD' else 0)
+        return {'error': [], 'result': {data['pair']: ohlc_payloads[data['pair']], 'last': 0}}
+
+    kraken_client = MagicMock()
+    kraken_client.query_public.side_effect = query_public
+    kdc = KrakenDataCollector(
+        collection_settings=dict(query_period_in_minutes='1440', max_workers='2'),
+        kraken_client=kraken_client,
+        client_settings=dict(calls_per_second=1000., burst=1000)
+    )
+    kdc.assets = {
+        'XXBTZUSD': {'wsname': 'XBT/USD', 'asset': 'XBT', 'currency': 'USD'},
+        'XXBTZEUR': {'wsname': 'XBT/EUR', 'asset': 'XBT', 'currency': 'EUR'}
+    }
+    return kdc
+
+
+def paged_query_public(candles, page_size):
+    """Fake OHLC endpoint, returning at most page_size candles from since, the last one being the open one."""
+    def query_public(method, data):
+        page = [candle for candle in candles if candle[0] >= data['since']][:page_size]
+        return {'error': [], 'result': {data['pair']: page, 'last': page[-1][0] if page else data['since']}}
+    return query_public
+
+
+@pytest.fixture
+def hourly_candles():
+    return [[3600 * i, '1.0', '1.2', '0.9', '1.1', '1.05', '10.0', 3] for i in range(1, 8)]
+
+
+class TestPagination:
+
+    def test_iter_ohlc_pages_until_caught_up(self, hourly_candles):
+        kraken_client = MagicMock()
+        kraken_client.query_public.side_effect = paged_query_public(hourly_candles, page_size=3)
+        kdc = KrakenDataCollector(
+            collection_settings=dict(query_period_in_minutes='60', ohlc_page_size='3'),
+            kraken_client=kraken_client,
+            client_settings=dict(calls_per_second=1000., burst=1000)
+        )
+
+        pages = list(kdc.iter_ohlc_pages(asset_pair='XXBTZEUR', interval_in_minutes='60', starting_timestamp=0))
+
+        assert [[candle[0] // 3600 for candle in page] for page in pages] == [[1, 2, 3], [3, 4, 5], [5, 6, 7], [7]]
+        assert [call.args[1]['since'] for call in kraken_client.query_public.call_args_list] == [0, 10800, 18000, 25200]
+
+    def test_iter_ohlc_pages_times_queries_only(self, hourly_candles):
+        kraken_client = MagicMock()
+        kraken_client.query_public.side_effect = paged_query_public(hourly_candles, page_size=3)
+        kdc = KrakenDataCollector(
+            collection_settings=dict(query_period_in_minutes='60', ohlc_page_size='3'),
+            kraken_client=kraken_client,
+            client_settings=dict(calls_per_second=1000., burst=1000)
+        )
+
+        for _ in kdc.iter_ohlc_pages(asset_pair='XXBTZEUR', interval_in_minutes='60', starting_timestamp=0):
+            time.sleep(0.05)  # pages being consumed
+
+        timing = kdc.metrics.report()['timings'][0]
+        assert (timing['name'], timing['count']) == ('get_ohlc_page', 4)
+        assert timing['total_s'] < 0.05
+
+    def test_iter_ohlc_pages_max_pages(self, hourly_candles):
+        kraken_client = MagicMock()
+        kraken_client.query_public.side_effect = paged_query_public(hourly_candles, page_size=3)
+        kdc = KrakenDataCollector(
+            collection_settings=dict(query_period_in_minutes='60', ohlc_page_size='3', max_pages='1'),
+            kraken_client=kraken_client,
+            client_settings=dict(calls_per_second=1000., burst=1000)
+        )
+
+        pages = list(kdc.iter_ohlc_pages(asset_pair='XXBTZEUR', interval_in_minutes='60', starting_timestamp=0))
+
+        assert [len(page) for page in pages] == [3]
+        assert kraken_client.query_public.call_count == 1
+
+
+class TestIntervals:
+
+    def test_get_interval_settings_default_interval(self):
+        settings = dict(query_period_in_minutes='1440', storage_path='s3://foo/data.csv',
+                        watermarks_path='s3://foo/watermarks.json', backfill_cursor_path='s3://foo/cursor.json',
+                        rollups_path='s3://foo/rollups.csv', summary_path='s3://foo/summary.json')
+        assert get_interval_settings(settings, '1440') == settings
+
+    def test_get_interval_settings_other_interval(self):
+        settings = dict(query_period_in_minutes='1440', storage_path='s3://foo/data.csv',
+                        watermarks_path='s3://foo/watermarks.json', backfill_cursor_path='s3://foo/cursor.json',
+                        rollups_path='s3://foo/rollups.csv', summary_path='s3://foo/summary.json')
+        assert get_interval_settings(settings, '60') == dict(
+            query_period_in_minutes='60', storage_path='s3://foo/data_60m.csv',
+            watermarks_path='s3://foo/watermarks_60m.json', backfill_cursor_path='s3://foo/cursor_60m.json',
+            rollups_path='s3://foo/rollups_60m.csv', summary_path='s3://foo/summary_60m.json'
+        )
+
+    def test_for_interval(self, ohlc_kraken_data_collector):
+        kdc = ohlc_kraken_data_collector
+        kdc.watermarks = {'XXBTZEUR': 1672531200}
+        hourly_kdc = kdc.for_interval('60')
+
+        assert hourly_kdc.collection_settings['query_period_in_minutes'] == '60'
+        assert hourly_kdc.watermarks == {}
+        assert hourly_kdc.assets is kdc.assets
+        assert hourly_kdc.kraken_client is kdc.kraken_client
+        assert kdc.collection_settings['query_period_in_minutes'] == '1440'
+        assert kdc.watermarks == {'XXBTZEUR': 1672531200}
+
+
+class TestParseData:
+
+    def test_parse_ohlc_asset_data_typed_columns(self, ohlc_kraken_data_collector, ohlc_payloads):
+        df = ohlc_kraken_data_collector.parse_ohlc_asset_data(
+            asset_pair='XXBTZEUR',
+            ohlc_asset_data=ohlc_payloads['XXBTZEUR']
+        )
+        assert list(df.columns) == ohlc_kraken_data_collector.ohlc_data_settings['schema']
+        assert {c: str(t) for c, t in df.dtypes.items()} == ohlc_kraken_data_collector.ohlc_data_settings['dtypes']
+        assert list(df.time.dt.strftime('%Y-%m-%d %H:%M:%S')) == ['2023-01-01 00:00:00', '2023-01-02 00:00:00']
+        assert list(df.tmsp) == [1672531200, 1672617600]
+        assert list(df.open_price) == [15500.1, 15600.2]
+        assert list(df.close_price) == [15600.2, 15650.3]
+        assert list(df.volume) == [80.5, 90.5]
+        assert list(df.wsname) == ['XBT/EUR', 'XBT/EUR']
+
+    def test_parse_ohlc_asset_data_empty(self, ohlc_kraken_data_collector):
+        df = ohlc_kraken_data_collector.parse_ohlc_asset_data(asset_pair='XXBTZEUR', ohlc_asset_data=[])
+        assert df.empty
+        assert list(df.columns) == ohlc_kraken_data_collector.ohlc_data_settings['schema']
+
+
+class TestGetDifferentialData:
+
+    def test_get_differential_ohlc_data_deterministic_order(self, ohlc_kraken_data_collector):
+        kdc = ohlc_kraken_data_collector
+        existing_df = pd.DataFrame(columns=kdc.ohlc_data_settings['schema'])
+
+        df = kdc.get_differential_ohlc_data(existing_data_df=existing_df)
+
+        assert kdc.kraken_client.kraken_client.query_public.call_count == 2
+        assert list(df.asset_pair) == ['XXBTZUSD', 'XXBTZEUR', 'XXBTZEUR']
+        assert list(df.tmsp) == [1672531200, 1672531200, 1672617600]
+
+    def test_get_differential_ohlc_data_history_not_duplicated(self, ohlc_kraken_data_collector):
+        kdc = ohlc_kraken_data_collector
+        existing_df = pd.DataFrame(
+            [['XXBTZEUR', 'XBT/EUR', 'XBT', 'EUR', '2022-12-31 00:00:00', 1672444800, 15400.0, 15500.1, 70.5]],
+            columns=kdc.ohlc_data_settings['schema']
+        )
+
+        new_df = kdc.get_new_ohlc_data(existing_data_df=existing_df)
+        df = kdc.get_differential_ohlc_data(existing_data_df=existing_df)
+
+        assert len(new_df) == 3
+        assert len(df) == 4
+        assert list(df.index) == [0, 1, 2, 3]
+        assert (df.tmsp == 1672444800).sum() == 1
+        assert str(df.asset_pair.dtype) == 'category'
+        assert str(df.time.dtype) == 'datetime64[ns]'
+
+    def test_watermarks_built_once_and_moved_forward(self, ohlc_kraken_data_collector, tmp_path):
+        kdc = ohlc_kraken_data_collector
+        existing_df = pd.DataFrame(
+            [['XXBTZEUR', 'XBT/EUR', 'XBT', 'EUR', '2022-12-31 00:00:00', 1672444800, 15400.0, 15500.1, 70.5]],
+            columns=kdc.ohlc_data_settings['schema']
+        )
+
+        kdc.build_watermarks(existing_data_df=existing_df)
+        assert kdc.watermarks == {'XXBTZEUR': 1672444800}
+
+        kdc.get_new_ohlc_data()
+        assert kdc.watermarks == {'XXBTZEUR': 1672617600, 'XXBTZUSD': 1672531200}
+
+        path = str(tmp_path / 'watermarks.json')
+        kdc.write_watermarks(path)
+        kdc.watermarks = {}
+        kdc.read_watermarks(path)
+        assert kdc.watermarks == {'XXBTZEUR': 1672617600, 'XXBTZUSD': 1672531200}
+
+    def test_get_new_ohlc_data_drops_already_ingested(self, ohlc_kraken_data_collector):
+        kdc = ohlc_kraken_data_collector
+        kdc.watermarks = {'XXBTZEUR': 1672617600}
+
+        df = kdc.get_new_ohlc_data()
+
+        assert list(df.asset_pair) == ['XXBTZUSD', 'XXBTZEUR']
+        assert list(df.tmsp) == [1672531200, 1672617600]
+
+    def test_get_new_ohlc_data_metrics(self, ohlc_kraken_data_collector):
+        kdc = ohlc_kraken_data_collector
+        kdc.get_new_ohlc_data()
+
+        report = kdc.metrics.report()
+        timings = {timing['name']: timing for timing in report['timings']}
+        page_timings = [
+            (timing['labels'], timing['count']) for timing in report['timings'] if timing['name'] == 'get_ohlc_page'
+        ]
+        assert sorted(page_timings, key=lambda timing: timing[0]['asset_pair']) == [
+            ({'interval': '1440', 'asset_pair': 'XXBTZEUR'}, 1),
+            ({'interval': '1440', 'asset_pair': 'XXBTZUSD'}, 1)
+        ]
+        assert timings['assemble_dataframe']['count'] == 1
+        counters = {counter['name']: counter['value'] for counter in report['counters']}
+        assert counters['ohlc_pages'] == 2
+        assert counters['rows_ingested'] == 3
+        assert counters['ohlc_store_bytes'] == 3 * 32
+
+    def test_get_differential_ohlc_data_replaces_last_candle(self, ohlc_kraken_data_collector):
+        kdc = ohlc_kraken_data_collector
+        existing_df = pd.DataFrame(
+            [['XXBTZEUR', 'XBT/EUR', 'XBT', 'EUR', '2023-01-02 00:00:00', 1672617600, 15600.2, 15610.0, 1.5]],
+            columns=kdc.ohlc_data_settings['schema']
+        )
+
+        df = kdc.get_differential_ohlc_data(existing_data_df=existing_df)
+
+        eur_df = df[df.asset_pair == 'XXBTZEUR']
+        assert list(eur_df.tmsp) == [1672617600]
+        assert list(eur_df.close_price) == [15650.3]
+        assert list(eur_df.volume) == [90.5]
+
+
+@pytest.fixture
+def fake_kraken_client():
+    return FakeKrakenClient(nbr_of_pairs=6, nbr_of_candles=1000)
+
+
+@pytest.fixture
+def kraken_server_state():
+    return {'in_flight': 0, 'max_in_flight': 0, 'peers': set()}
+
+
+@pytest.fixture
+def async_kraken_data_collector(fake_kraken_client, kraken_server_state):
+    """Asyncio collector querying a local server that serves the payloads of the fake client."""
+    async def handle(request):
+        kraken_server_state['in_flight'] += 1
+        kraken_server_state['max_in_flight'] = max(kraken_server_state['max_in_flight'], kraken_server_state['in_flight'])
+        kraken_server_state['peers'].add(request.transport.get_extra_info('peername'))
+        await asyncio.sleep(0.005)
+        payload = fake_kraken_client.query_public(request.match_info['method'], dict(request.query))
+        kraken_server_state['in_flight'] -= 1
+        return web.json_response(payload)
+
+    app = web.Application()
+    app.router.add_get('/0/public/{method}', handle)
+    port = unused_port()
+    kdc = AsyncKrakenDataCollector(
+        collection_settings=dict(query_period_in_minutes='1440', max_workers='2'),
+        client_settings={
+            'calls_per_second': 1e9, 'burst': 1e9, 'max_connections': 3, 'api_url': f'http://127.0.0.1:{port}'
+        }
+    )
+    server = TestServer(app, port=port)
+    kdc.run(server.start_server())
+    yield kdc
+    kdc.run(server.close())
+    kdc.close()
+
+
+class TestAsyncKrakenDataCollector:
+
+    def test_default_kraken_client_built_on_init(self):
+        assert inspect.signature(KrakenDataCollector).parameters['kraken_client'].default is None
+
+    def test_collect_all_same_as_threads(self, async_kraken_data_collector, fake_kraken_client):
+        kdc = async_kraken_data_collector
+        kdc.clean_assets(kdc.get_assets())
+        new_data_df = kdc.get_new_ohlc_data()
+
+        threaded_kdc = KrakenDataCollector(
+            collection_settings=dict(query_period_in_minutes='1440', max_workers='2'),
+            kraken_client=fake_kraken_client,
+            client_settings={'calls_per_second': 1e9, 'burst': 1e9}
+        )
+        threaded_kdc.clean_assets(threaded_kdc.get_assets())
+        pd.testing.assert_frame_equal(new_data_df, threaded_kdc.get_new_ohlc_data())
+        assert len(new_data_df) == 6 * 1000
+        assert kdc.watermarks == threaded_kdc.watermarks
+        assert kdc.kraken_client.stats.calls == 1 + 6 * 2
+
+    def test_collect_all_bounded_and_pooled(self, async_kraken_data_collector, kraken_server_state):
+        kdc = async_kraken_data_collector
+        kdc.clean_assets(kdc.get_assets())
+        kdc.run(kdc.collect_all())
+        assert kraken_server_state['max_in_flight'] == 2
+        # keep-alive connections are reused, instead of a connection per request
+        assert len(kraken_server_state['peers']) <= 3
+
+    def test_collect_all_from_watermarks(self, async_kraken_data_collector):
+        kdc = async_kraken_data_collector
+        kdc.clean_assets(kdc.get_assets())
+        first_df = kdc.get_new_ohlc_data()
+        second_df = kdc.get_new_ohlc_data()
+        # only the last ingested candle of each asset pair is collected again
+        assert len(second_df) == 6
+        assert (second_df['tmsp'].values == first_df.groupby('asset_pair', observed=True)['tmsp'].max().values).all()
@@ -0,0 +1,66 @@
+"""Tests for compaction"""
+
+import pandas as pd
+import pytest
+
+from modules.models.collect_data import get_interval_settings
+from modules.models.compact_data import (compact_interval,
+                                         get_compacted_intervals)
+from modules.models.rollups import get_rollup_storage, update_rollup
+from modules.models.storage import CsvStorage
+
+
+@pytest.fixture
+def collection_settings(tmp_path):
+    return dict(
+        query_period_in_minutes='1440',
+        intervals_in_minutes=['1440', '60'],
+        storage_backend='csv',
+        storage_path=str(tmp_path / 'data.csv'),
+        watermarks_path=str(tmp_path / 'watermarks.json'),
+        backfill_cursor_path=str(tmp_path / 'backfill_cursor.json'),
+        rollups_path=str(tmp_path / 'rollups.csv'),
+        summary_path=str(tmp_path / 'summary.json')
+    )
+
+
+@pytest.fixture
+def ohlc_rows():
+    return [
+        ['XXBTZEUR', 'XBT/EUR', 'XBT', 'EUR', pd.Timestamp(tmsp, unit='s'), tmsp, 15400.0, 15500.1, 1.5]
+        for tmsp in range(1672531200, 1672531200 + 60 * 4, 60)
+    ]
+
+
+class TestCompactData:
+
+    def test_get_compacted_intervals(self, collection_settings):
+        assert get_compacted_intervals(collection_settings, stream_settings={'interval_in_minutes': '1'}) == \
+            ['1440', '60', '1']
+        assert get_compacted_intervals(collection_settings, stream_settings={'interval_in_minutes': '60'}) == \
+            ['1440', '60']
+
+    def test_compact_interval(self, collection_settings, ohlc_df):
+        interval_settings = get_interval_settings(collection_settings=collection_settings, interval_in_minutes='1')
+        storage = CsvStorage(path=interval_settings['storage_path'])
+        rollup_storage = get_rollup_storage(collection_settings=interval_settings, granularity='daily')
+        storage.write(ohlc_df.iloc[:1])
+        update_rollup(raw_storage=storage, rollup_storage=rollup_storage, granularity='daily')
+        for i in range(1, 4):
+            storage.upsert(ohlc_df.iloc[i:i + 1])
+            update_rollup(
+                raw_storage=storage, rollup_storage=rollup_storage, granularity='daily',
+                new_data_df=ohlc_df.iloc[i:i + 1]
+            )
+        assert storage.read_manifest()['segments']
+        assert rollup_storage.read_manifest()['segments']
+
+        report = compact_interval(collection_settings=collection_settings, interval_in_minutes='1')
+        assert report.rows == 4
+        assert report.is_valid
+        assert not storage.read_manifest()['segments']
+        assert not rollup_storage.read_manifest()['segments']
+        assert list(rollup_storage.read()['volume']) == [6.]
+
+    def test_compact_interval_without_data(self, collection_settings):
+        assert compact_interval(collection_settings=collection_settings, interval_in_minutes='60') is None
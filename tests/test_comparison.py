@@ -0,0 +1,85 @@
+"""Tests for the comparison of asset pairs"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.app.comparison import (build_price_matrix, correlation_matrix,
+                                    most_correlated, normalized_performance,
+                                    rolling_correlation)
+
+
+@pytest.fixture
+def market_data():
+    return pd.DataFrame(
+        {
+            'asset_pair': ['XXBTZEUR', 'XETHZEUR', 'XXBTZEUR', 'XXBTZUSD', 'XETHZEUR', 'XXBTZEUR'],
+            'asset': ['XBT', 'ETH', 'XBT', 'XBT', 'ETH', 'XBT'],
+            'currency': ['EUR', 'EUR', 'EUR', 'USD', 'EUR', 'EUR'],
+            'tmsp': [1672531200, 1672617600, 1672617600, 1672617600, 1672704000, 1672704000],
+            'close_price': [10., 100., 11., 12., 110., 12.1]
+        }
+    ).astype({'asset_pair': 'category', 'asset': 'category', 'currency': 'category'})
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(0)
+    common = rng.normal(0, 0.02, 300)
+    returns = np.column_stack([
+        common,
+        common + rng.normal(0, 0.005, 300),
+        -common + rng.normal(0, 0.01, 300),
+        rng.normal(0, 0.02, 300)
+    ])
+    returns[:50, 3] = np.nan  # listed later
+    returns[100, 1] = np.nan  # missing candle
+    return returns
+
+
+class TestPriceMatrix:
+
+    def test_build_price_matrix(self, market_data):
+        matrix = build_price_matrix(data=market_data)
+        assert list(matrix.tmsp) == [1672531200, 1672617600, 1672704000]
+        assert list(matrix.pairs['asset_pair']) == ['XETHZEUR', 'XXBTZEUR', 'XXBTZUSD']
+        assert list(matrix.pairs['currency']) == ['EUR', 'EUR', 'USD']
+        np.testing.assert_array_equal(
+            matrix.values, [[np.nan, 10., np.nan], [100., 11., 12.], [110., 12.1, np.nan]]
+        )
+        np.testing.assert_allclose(matrix.returns[2], np.log([1.1, 1.1, np.nan]))
+        assert list(matrix.dates) == [pd.Timestamp('2023-01-01'), pd.Timestamp('2023-01-02'), pd.Timestamp('2023-01-03')]
+
+    def test_select(self, market_data):
+        matrix = build_price_matrix(data=market_data)
+        selected = matrix.select(currency='EUR', start=pd.Timestamp('2023-01-02'))
+        assert list(selected.tmsp) == [1672617600, 1672704000]
+        assert list(selected.pairs['asset']) == ['ETH', 'XBT']
+        np.testing.assert_array_equal(selected.values, [[100., 11.], [110., 12.1]])
+        assert np.isnan(selected.returns[0]).all()
+        assert not np.isnan(matrix.returns[1, 1])  # the matrix is not modified
+
+    def test_normalized_performance(self, market_data):
+        performance = normalized_performance(build_price_matrix(data=market_data).values)
+        np.testing.assert_allclose(performance, [[np.nan, 0., np.nan], [0., .1, 0.], [.1, .21, np.nan]])
+
+
+class TestCorrelation:
+
+    def test_correlation_matrix(self, returns):
+        correlation = correlation_matrix(returns=returns)
+        expected = pd.DataFrame(returns).corr().values
+        np.testing.assert_allclose(correlation, expected, atol=1e-10)
+        assert most_correlated(correlation, reference=0, top=2) == [1, 3]
+
+    def test_rolling_correlation(self, returns):
+        rolling = rolling_correlation(returns=returns, reference=0, window=30)
+        df = pd.DataFrame(returns)
+        for column in range(4):
+            both = df[[0, column]].dropna().index
+            x = df[0].where(df.index.isin(both))
+            y = df[column].where(df.index.isin(both))
+            expected = x.rolling(30, min_periods=30).corr(y)
+            np.testing.assert_allclose(rolling[:, column], expected.values, atol=1e-8, err_msg=str(column))
+        assert np.isnan(rolling[:29]).all()
+        assert np.isnan(rolling[:79, 3]).all()
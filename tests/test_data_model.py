@@ -0,0 +1,53 @@
+"""Tests for app data model"""
+
+import pandas as pd
+import pytest
+
+from modules.app.data_model import MarketDataModel
+
+
+@pytest.fixture
+def market_data():
+    return pd.DataFrame(
+        {
+            'asset_pair': ['XXBTZUSD', 'XXBTZEUR', 'XETHZEUR', 'XXBTZEUR', 'XXBTZUSD'],
+            'asset': ['XBT', 'XBT', 'ETH', 'XBT', 'XBT'],
+            'currency': ['USD', 'EUR', 'EUR', 'EUR', 'USD'],
+            'time': ['2023-01-02 00:00:00', '2023-01-02 00:00:00', '2023-01-01 00:00:00',
+                     '2023-01-01 00:00:00', '2023-01-01 00:00:00'],
+            'tmsp': [1672617600, 1672617600, 1672531200, 1672531200, 1672531200],
+            'close_price': [2., 20., 300., 10., 1.]
+        }
+    )
+
+
+class TestMarketDataModel:
+
+    def test_get_slice(self, market_data):
+        model = MarketDataModel(data=market_data, version='v1')
+        df = model.get_slice(asset='XBT', currency='EUR')
+        assert list(df.close_price) == [10., 20.]
+        assert list(df.date) == [pd.Timestamp('2023-01-01'), pd.Timestamp('2023-01-02')]
+
+    def test_get_slice_unknown_selection(self, market_data):
+        model = MarketDataModel(data=market_data)
+        df = model.get_slice(asset='XBT', currency='JPY')
+        assert df.empty
+        assert 'date' in df.columns
+
+    def test_summary_attributes(self, market_data):
+        model = MarketDataModel(data=market_data, version='v1')
+        assert model.version == 'v1'
+        assert model.assets == ['ETH', 'XBT']
+        assert model.date_min == pd.Timestamp('2023-01-01')
+        assert model.date_max == pd.Timestamp('2023-01-02')
+
+    def test_categorical_data(self, market_data):
+        model = MarketDataModel(data=market_data.astype({'asset': 'category', 'currency': 'category'}))
+        assert list(model.get_slice(asset='XBT', currency='USD').close_price) == [1., 2.]
+
+    def test_get_slice_period(self, market_data):
+        model = MarketDataModel(data=market_data)
+        assert list(model.get_slice(asset='XBT', currency='EUR', start=pd.Timestamp('2023-01-02')).close_price) == [20.]
+        assert list(model.get_slice(asset='XBT', currency='EUR', end=pd.Timestamp('2023-01-01')).close_price) == [10.]
+        assert model.get_slice(asset='XBT', currency='EUR', start=pd.Timestamp('2023-02-01')).empty
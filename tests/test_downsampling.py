@@ -0,0 +1,42 @@
+"""Tests for downsampling"""
+
+import numpy as np
+import pandas as pd
+
+from modules.app.downsampling import downsample, lttb_indices
+
+
+class TestLttb:
+
+    def test_lttb_indices_short_series(self):
+        assert list(lttb_indices(x=np.arange(5), y=np.arange(5), n_out=10)) == [0, 1, 2, 3, 4]
+
+    def test_lttb_indices_keeps_bounds_and_size(self):
+        x = np.arange(10_000)
+        y = np.sin(x / 100)
+        indices = lttb_indices(x=x, y=y, n_out=100)
+        assert len(indices) == 100
+        assert indices[0] == 0 and indices[-1] == 9_999
+        assert (np.diff(indices) > 0).all()
+
+    def test_lttb_indices_keeps_peaks(self):
+        x = np.arange(1_000)
+        y = np.zeros(1_000)
+        y[500] = 100.
+        y[250] = -100.
+        indices = lttb_indices(x=x, y=y, n_out=20)
+        assert 500 in indices
+        assert 250 in indices
+
+
+class TestDownsample:
+
+    def test_downsample(self):
+        df = pd.DataFrame({'tmsp': np.arange(5_000), 'close_price': np.random.rand(5_000)})
+        downsampled = downsample(df=df, x_field='tmsp', y_field='close_price', max_points=500)
+        assert len(downsampled) == 500
+        assert list(downsampled.columns) == ['tmsp', 'close_price']
+
+    def test_downsample_small_data_untouched(self):
+        df = pd.DataFrame({'tmsp': np.arange(5), 'close_price': np.arange(5)})
+        assert downsample(df=df, x_field='tmsp', y_field='close_price', max_points=500) is df
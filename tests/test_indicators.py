@@ -0,0 +1,88 @@
+"""Tests for technical indicators"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.app.indicators import (INDICATORS, IndicatorCache,
+                                    compute_indicator)
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(0)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 500)))
+
+
+class TestIndicators:
+
+    def test_kernels(self, prices):
+        series = pd.Series(prices)
+        np.testing.assert_allclose(compute_indicator('sma', prices)['sma'], series.rolling(20).mean())
+        np.testing.assert_allclose(compute_indicator('ema', prices)['ema'], series.ewm(span=20, adjust=False).mean())
+        bands = compute_indicator('bollinger', prices, params={'window': 10, 'num_std': 1.5})
+        np.testing.assert_allclose(
+            bands['bollinger_upper'], series.rolling(10).mean() + 1.5 * series.rolling(10).std(ddof=0)
+        )
+        np.testing.assert_allclose(
+            compute_indicator('volatility', prices)['volatility'], np.log(series).diff().rolling(20).std()
+        )
+        fields = compute_indicator('returns', prices)
+        np.testing.assert_allclose(fields['returns'], series.pct_change())
+        np.testing.assert_allclose(fields['drawdown'], series / series.cummax() - 1)
+
+        rsi = compute_indicator('rsi', prices)['rsi']
+        assert np.isnan(rsi[:14]).all()
+        assert ((rsi[14:] >= 0) & (rsi[14:] <= 100)).all()
+        deltas = series.diff().fillna(0)
+        gain = deltas.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+        loss = (-deltas).clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+        np.testing.assert_allclose(rsi[14:], (100 * gain / (gain + loss))[14:])
+
+    @pytest.mark.parametrize('indicator', list(INDICATORS))
+    @pytest.mark.parametrize('done', [1, 5, 30, 499])
+    def test_extension_matches_full_computation(self, prices, indicator, done):
+        computed = compute_indicator(indicator, prices[:done])
+        extended = compute_indicator(indicator, prices, computed=computed)
+        full = compute_indicator(indicator, prices)
+        assert set(extended) == set(full)
+        for field in full:
+            np.testing.assert_allclose(extended[field], full[field], rtol=1e-9, err_msg=field)
+
+
+class TestIndicatorCache:
+
+    def test_memoized_per_version_and_extended(self, prices, monkeypatch):
+        cache = IndicatorCache()
+        tmsp = 1672531200 + 86400 * np.arange(len(prices))
+        df = cache.get(series_key='XBT', version='v1', indicator='sma', tmsp=tmsp[:400], values=prices[:400])
+        assert len(df) == 400
+        assert cache.get(series_key='XBT', version='v1', indicator='sma', tmsp=tmsp[:400], values=prices[:400]) \
+            .equals(df)
+        assert cache.stats == {'hits': 1, 'extensions': 0, 'misses': 1}
+
+        processed = []
+        kernel = INDICATORS['sma'].kernel
+        monkeypatch.setattr(INDICATORS['sma'], 'kernel', lambda values, *args, **kwargs: (
+            processed.append(len(values)) or kernel(values, *args, **kwargs)
+        ))
+        updated_prices = prices.copy()
+        updated_prices[399] += 1  # last candle was still open
+        df = cache.get(series_key='XBT', version='v2', indicator='sma', tmsp=tmsp, values=updated_prices)
+        assert processed == [19 + 101]  # context of the window and new candles
+        assert cache.stats == {'hits': 1, 'extensions': 1, 'misses': 1}
+        np.testing.assert_allclose(df['sma'], pd.Series(updated_prices).rolling(20).mean())
+
+    def test_keyed_by_params_and_series(self, prices):
+        cache = IndicatorCache(max_entries=2)
+        tmsp = np.arange(len(prices))
+        for window in (10, 20):
+            df = cache.get(
+                series_key='XBT', version='v1', indicator='sma', tmsp=tmsp, values=prices, params={'window': window}
+            )
+            np.testing.assert_allclose(df['sma'], pd.Series(prices).rolling(window).mean())
+        cache.get(series_key='ETH', version='v1', indicator='sma', tmsp=tmsp, values=prices * 2)
+        assert cache.stats == {'hits': 0, 'extensions': 0, 'misses': 3}
+        assert len(cache.entries) == 2
+        assert list(cache.get(series_key='XBT', version='v1', indicator='bollinger', tmsp=tmsp, values=prices).columns) \
+            == ['bollinger_lower', 'bollinger_middle', 'bollinger_upper']
@@ -0,0 +1,210 @@
+"""Tests for rate limited Kraken client"""
+
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from modules.models.exceptions import KrakenAPIError
+from modules.models.kraken_client import (AsyncKrakenClient,
+                                          RateLimitedKrakenClient, TokenBucket)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def client_settings():
+    return {
+        'calls_per_second': 2.,
+        'burst': 2,
+        'max_retries': 2,
+        'backoff_base_in_seconds': 1.,
+        'backoff_max_in_seconds': 4.
+    }
+
+
+def build_client(clock, client_settings, side_effect):
+    kraken_client = MagicMock()
+    kraken_client.query_public.side_effect = side_effect
+    return RateLimitedKrakenClient(
+        kraken_client=kraken_client,
+        client_settings=client_settings,
+        sleep=clock.sleep,
+        bucket=TokenBucket(rate=2., capacity=2, clock=clock, sleep=clock.sleep)
+    )
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f'{status} Error', response=response)
+
+
+class TestTokenBucket:
+
+    def test_burst_then_throttle(self, clock):
+        bucket = TokenBucket(rate=2., capacity=2, clock=clock, sleep=clock.sleep)
+        waits = [bucket.acquire() for _ in range(4)]
+        assert waits == [0., 0., 0.5, 0.5]
+        assert clock.now == 1.
+
+    def test_refill_is_capped(self, clock):
+        bucket = TokenBucket(rate=2., capacity=2, clock=clock, sleep=clock.sleep)
+        clock.now = 100.
+        waits = [bucket.acquire() for _ in range(3)]
+        assert waits == [0., 0., 0.5]
+
+
+class TestRateLimitedKrakenClient:
+
+    def test_query_public_success(self, clock, client_settings):
+        client = build_client(clock, client_settings, [{'error': [], 'result': {'foo': 'bar'}}])
+        assert client.query_public('AssetPairs') == {'error': [], 'result': {'foo': 'bar'}}
+        assert client.stats.as_dict() == {'calls': 1, 'throttles': 0, 'retries': 0, 'wait_time': 0.}
+
+    def test_query_public_retries_rate_limit(self, clock, client_settings):
+        client = build_client(
+            clock,
+            client_settings,
+            [
+                {'error': ['EAPI:Rate limit exceeded']},
+                requests.exceptions.ConnectionError('boom'),
+                {'error': [], 'result': {'foo': 'bar'}}
+            ]
+        )
+        assert client.query_public('OHLC', {'pair': 'XXBTZEUR'})['result'] == {'foo': 'bar'}
+        assert client.stats.calls == 3
+        assert client.stats.retries == 2
+        assert client.stats.throttles >= 1
+        assert client.stats.wait_time == pytest.approx(sum(clock.sleeps))
+
+    def test_query_public_not_retryable_error(self, clock, client_settings):
+        client = build_client(clock, client_settings, [{'error': ['EQuery:Unknown asset pair']}])
+        with pytest.raises(KrakenAPIError):
+            client.query_public('OHLC', {'pair': 'FOO'})
+        assert client.stats.retries == 0
+
+    def test_query_public_retries_exhausted(self, clock, client_settings):
+        client = build_client(clock, client_settings, [{'error': ['EService:Unavailable']}] * 3)
+        with pytest.raises(KrakenAPIError):
+            client.query_public('AssetPairs')
+        assert client.stats.calls == 3
+        assert client.stats.retries == 2
+
+    def test_query_public_retries_transient_failures(self, clock, client_settings):
+        client_settings = {**client_settings, 'max_retries': 4}
+        client = build_client(
+            clock,
+            client_settings,
+            [
+                requests.exceptions.JSONDecodeError('Expecting value', '<html>Bad gateway</html>', 0),
+                http_error(503),
+                requests.exceptions.ReadTimeout('timed out'),
+                ValueError('Unterminated string'),
+                {'error': [], 'result': {'foo': 'bar'}}
+            ]
+        )
+        assert client.query_public('AssetPairs')['result'] == {'foo': 'bar'}
+        assert client.stats.retries == 4
+
+    @pytest.mark.parametrize('status', [400, 403, 404])
+    def test_query_public_client_error_not_retried(self, clock, client_settings, status):
+        client = build_client(clock, client_settings, [http_error(status)])
+        with pytest.raises(KrakenAPIError):
+            client.query_public('AssetPairs')
+        assert client.stats.retries == 0
+
+    def test_compute_backoff_is_bounded(self, clock, client_settings):
+        client = build_client(clock, client_settings, [])
+        assert all(0 <= client.compute_backoff(attempt) <= 4. for attempt in range(10))
+
+
+def query_async_client(client_settings, responses, method, data=None):
+    """Serve the responses in order from a local server, and query it with an asyncio client."""
+    requests_received = []
+
+    async def handle(request):
+        requests_received.append((request.match_info['method'], dict(request.query)))
+        response = responses[len(requests_received) - 1]
+        if isinstance(response, int):
+            return web.Response(status=response)
+        if isinstance(response, str):
+            return web.Response(text=response, content_type='text/html')
+        return web.json_response(response)
+
+    async def query():
+        app = web.Application()
+        app.router.add_get('/0/public/{method}', handle)
+        async with TestServer(app) as server:
+            sleeps = []
+
+            async def sleep(seconds):
+                sleeps.append(seconds)
+
+            client = AsyncKrakenClient(
+                client_settings={**client_settings, 'api_url': str(server.make_url('')).rstrip('/')},
+                sleep=sleep
+            )
+            try:
+                return await client.query_public(method, data), client.stats, requests_received
+            finally:
+                await client.close()
+
+    return asyncio.run(query())
+
+
+class TestAsyncKrakenClient:
+
+    def test_query_public_success(self, client_settings):
+        payload, stats, requests_received = query_async_client(
+            client_settings, [{'error': [], 'result': {'foo': 'bar'}}], 'OHLC', {'pair': 'XXBTZEUR', 'since': 0}
+        )
+        assert payload == {'error': [], 'result': {'foo': 'bar'}}
+        assert requests_received == [('OHLC', {'pair': 'XXBTZEUR', 'since': '0'})]
+        assert stats.as_dict() == {'calls': 1, 'throttles': 0, 'retries': 0, 'wait_time': 0.}
+
+    def test_query_public_retries(self, client_settings):
+        payload, stats, _ = query_async_client(
+            client_settings,
+            [{'error': ['EAPI:Rate limit exceeded']}, 503, {'error': [], 'result': {'foo': 'bar'}}],
+            'AssetPairs'
+        )
+        assert payload['result'] == {'foo': 'bar'}
+        assert stats.calls == 3
+        assert stats.retries == 2
+        assert stats.throttles >= 1
+
+    def test_query_public_not_retryable_error(self, client_settings):
+        with pytest.raises(KrakenAPIError):
+            query_async_client(client_settings, [{'error': ['EQuery:Unknown asset pair']}], 'OHLC', {'pair': 'FOO'})
+
+    def test_query_public_retries_html_page(self, client_settings):
+        payload, stats, _ = query_async_client(
+            client_settings, ['<html>Bad gateway</html>', {'error': [], 'result': {'foo': 'bar'}}], 'AssetPairs'
+        )
+        assert payload['result'] == {'foo': 'bar'}
+        assert stats.retries == 1
+
+    def test_query_public_client_error_not_retried(self, client_settings):
+        with pytest.raises(KrakenAPIError):
+            query_async_client(client_settings, [404, {'error': [], 'result': {}}], 'AssetPairs')
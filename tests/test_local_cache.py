@@ -0,0 +1,84 @@
+"""Tests for the local copy of stored data"""
+
+import pandas as pd
+import pytest
+
+from modules.models.exceptions import NoExistingFile
+from modules.models.local_cache import LocalDatasetCache
+
+
+@pytest.fixture
+def ohlc_rows():
+    return [
+        ['XXBTZEUR', 'XBT/EUR', 'XBT', 'EUR', '2022-12-31 00:00:00', 1672444800, 15400.0, 15500.1, 70.5],
+        ['XXBTZEUR', 'XBT/EUR', 'XBT', 'EUR', '2023-01-01 00:00:00', 1672531200, 15500.1, 15600.2, 80.5],
+        ['XETHZUSD', 'ETH/USD', 'ETH', 'USD', '2023-01-02 00:00:00', 1672617600, 1200.2, 1210.3, 130.5]
+    ]
+
+
+class CountingStorage:
+    """Count the reads of a storage."""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.path = storage.path
+        self.reads = 0
+
+    def fingerprint(self):
+        return self.storage.fingerprint()
+
+    def read(self):
+        self.reads += 1
+        return self.storage.read()
+
+
+def assert_same_data(df, expected_df):
+    pd.testing.assert_frame_equal(
+        df.astype({'asset_pair': str, 'wsname': str, 'asset': str, 'currency': str}),
+        expected_df.astype({'asset_pair': str, 'wsname': str, 'asset': str, 'currency': str})
+    )
+
+
+class TestLocalDatasetCache:
+
+    def test_read_downloads_once(self, tmp_path, storage, ohlc_df):
+        storage.write(ohlc_df)
+        counting_storage = CountingStorage(storage)
+        local_cache = LocalDatasetCache(cache_dir=str(tmp_path / 'cache'))
+
+        first_df = local_cache.read(storage=counting_storage)
+        second_df = LocalDatasetCache(cache_dir=str(tmp_path / 'cache')).read(storage=counting_storage)
+
+        assert counting_storage.reads == 1
+        assert_same_data(first_df, storage.read())
+        assert_same_data(second_df, storage.read())
+        assert str(second_df['asset_pair'].dtype) == 'category'
+
+    def test_read_downloads_changed_data(self, tmp_path, storage, ohlc_df):
+        storage.write(ohlc_df.iloc[:2])
+        counting_storage = CountingStorage(storage)
+        local_cache = LocalDatasetCache(cache_dir=str(tmp_path / 'cache'))
+        local_cache.read(storage=counting_storage)
+
+        storage.upsert(ohlc_df.iloc[2:])
+        df = local_cache.read(storage=counting_storage)
+
+        assert counting_storage.reads == 2
+        assert len(df) == 3
+        assert local_cache.read(storage=counting_storage).equals(df)
+        assert counting_storage.reads == 2
+
+    def test_read_invalid_stamp(self, tmp_path, storage, ohlc_df):
+        storage.write(ohlc_df)
+        counting_storage = CountingStorage(storage)
+        local_cache = LocalDatasetCache(cache_dir=str(tmp_path / 'cache'))
+        local_cache.read(storage=counting_storage)
+        with open(local_cache.get_paths(storage=storage)[1], 'w') as stamp:
+            stamp.write('{')
+
+        assert len(local_cache.read(storage=counting_storage)) == 3
+        assert counting_storage.reads == 2
+
+    def test_read_nothing_stored(self, tmp_path, storage):
+        with pytest.raises(NoExistingFile):
+            LocalDatasetCache(cache_dir=str(tmp_path / 'cache')).read(storage=storage)
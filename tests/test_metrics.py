@@ -0,0 +1,81 @@
+"""Tests for run metrics"""
+
+import json
+
+import pytest
+
+from modules.models.metrics import MetricsRegistry, format_labels
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def metrics(clock):
+    metrics = MetricsRegistry(clock=clock)
+    for duration in (1., 2., 3., 4.):
+        with metrics.timer('get_ohlc_data', labels={'interval': '1440'}):
+            clock.now += duration
+    metrics.increment('rows_ingested', value=10, labels={'interval': '1440'})
+    metrics.increment('rows_ingested', value=5, labels={'interval': '1440'})
+    return metrics
+
+
+class TestMetrics:
+
+    def test_report_timings(self, metrics):
+        timing = metrics.report()['timings'][0]
+        assert timing['name'] == 'get_ohlc_data'
+        assert timing['labels'] == {'interval': '1440'}
+        assert (timing['count'], timing['total_s'], timing['max_s']) == (4, 10., 4.)
+        assert timing['p50_s'] == 2.5
+
+    def test_report_counters(self, metrics):
+        assert metrics.report()['counters'] == [{'name': 'rows_ingested', 'labels': {'interval': '1440'}, 'value': 15}]
+
+    def test_timer_records_failures(self, clock):
+        metrics = MetricsRegistry(clock=clock)
+        with pytest.raises(ValueError):
+            with metrics.timer('storage_write'):
+                clock.now += 1.
+                raise ValueError
+        assert metrics.report()['timings'][0]['total_s'] == 1.
+
+    def test_timed(self, clock):
+        metrics = MetricsRegistry(clock=clock)
+
+        @metrics.timed('get_assets')
+        def get_assets():
+            clock.now += 2.
+            return 'assets'
+
+        assert get_assets() == 'assets'
+        assert metrics.report()['timings'][0]['total_s'] == 2.
+
+    def test_to_prometheus(self, metrics):
+        lines = metrics.to_prometheus().splitlines()
+        assert 'cryptolution_stage_duration_seconds{interval="1440",quantile="0.5",stage="get_ohlc_data"} 2.5' in lines
+        assert 'cryptolution_stage_duration_seconds_count{interval="1440",stage="get_ohlc_data"} 4' in lines
+        assert 'cryptolution_rows_ingested{interval="1440"} 15.0' in lines
+
+    def test_format_labels(self):
+        assert format_labels({}) == ''
+        assert format_labels({'b': 'x"y', 'a': 1}) == '{a="1",b="x\\"y"}'
+
+    def test_write(self, metrics, tmp_path):
+        metrics.write(path=str(tmp_path / 'report.json'))
+        with open(tmp_path / 'report.json') as report:
+            assert json.load(report)['counters'][0]['value'] == 15
+        metrics.write(path=str(tmp_path / 'report.prom'))
+        assert (tmp_path / 'report.prom').read_text().startswith('# HELP cryptolution_stage_duration_seconds')
@@ -0,0 +1,71 @@
+"""Tests for the in-memory store of collected candles"""
+
+import pandas as pd
+import pytest
+
+from modules.models.config import OHLC_DATA
+from modules.models.ohlc_store import OHLCStore
+from modules.models.utils import apply_dtypes
+
+
+@pytest.fixture
+def asset_pairs():
+    return {
+        'XXBTZUSD': {'wsname': 'XBT/USD', 'asset': 'XBT', 'currency': 'USD'},
+        'XXBTZEUR': {'wsname': 'XBT/EUR', 'asset': 'XBT', 'currency': 'EUR'},
+        'XETHZEUR': {'wsname': 'ETH/EUR', 'asset': 'ETH', 'currency': 'EUR'}
+    }
+
+
+def candle(tmsp, price):
+    return [tmsp, str(price), str(price + 1), str(price - 1), str(price + 0.5), str(price), '10.5', 3]
+
+
+class TestOHLCStore:
+
+    def test_to_frame(self, asset_pairs):
+        store = OHLCStore(asset_pairs=asset_pairs)
+        store.append('XXBTZUSD', [candle(1672531200, 100.), candle(1672617600, 101.)])
+        store.append('XXBTZEUR', [candle(1672531200, 90.)])
+
+        df = store.to_frame()
+        assert len(store) == 3
+        assert list(df.columns) == OHLC_DATA['schema']
+        assert {c: str(t) for c, t in df.dtypes.items()} == OHLC_DATA['dtypes']
+        assert list(df.asset_pair) == ['XXBTZUSD', 'XXBTZUSD', 'XXBTZEUR']
+        assert list(df.asset) == ['XBT'] * 3
+        assert list(df.currency) == ['USD', 'USD', 'EUR']
+        assert list(df.tmsp) == [1672531200, 1672617600, 1672531200]
+        assert list(df.time.dt.strftime('%Y-%m-%d')) == ['2023-01-01', '2023-01-02', '2023-01-01']
+        assert list(df.close_price) == [100.5, 101.5, 90.5]
+        # same categories as casting strings to 'category', pairs without candles are not categories
+        expected_df = apply_dtypes(df=df.astype(str), dtypes={'asset_pair': 'category', 'wsname': 'category'})
+        pd.testing.assert_index_equal(df.asset_pair.cat.categories, expected_df.asset_pair.cat.categories)
+        pd.testing.assert_index_equal(df.wsname.cat.categories, expected_df.wsname.cat.categories)
+
+    def test_pages_replace_candles_from_their_first_timestamp(self, asset_pairs):
+        store = OHLCStore(asset_pairs=asset_pairs)
+        store.append('XXBTZEUR', [candle(1672531200, 90.), candle(1672617600, 91.)])
+        store.append('XXBTZUSD', [candle(1672531200, 100.)])
+        store.append('XXBTZEUR', [candle(1672617600, 92.), candle(1672704000, 93.)])
+
+        df = store.to_frame()
+        assert len(store) == 4
+        assert list(df.asset_pair) == ['XXBTZUSD', 'XXBTZEUR', 'XXBTZEUR', 'XXBTZEUR']
+        assert list(df.tmsp) == [1672531200, 1672531200, 1672617600, 1672704000]
+        assert list(df.open_price) == [100., 90., 92., 93.]
+
+    def test_page_replacing_several_pages(self, asset_pairs):
+        store = OHLCStore(asset_pairs=asset_pairs)
+        store.append('XETHZEUR', [candle(1672531200 + 60 * i, 10. + i) for i in range(3)])
+        store.append('XETHZEUR', [candle(1672531200 + 60 * i, 20. + i) for i in range(3, 5)])
+        store.append('XETHZEUR', [candle(1672531200 + 60 * i, 30. + i) for i in range(1, 6)])
+
+        assert len(store) == 6
+        assert store.nbytes == 6 * 32
+        assert list(store.to_frame().open_price) == [10., 31., 32., 33., 34., 35.]
+
+    def test_empty(self, asset_pairs):
+        df = OHLCStore(asset_pairs=asset_pairs).to_frame()
+        assert df.empty
+        assert {c: str(t) for c, t in df.dtypes.items()} == OHLC_DATA['dtypes']
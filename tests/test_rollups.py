@@ -0,0 +1,138 @@
+"""Tests for rollups"""
+
+import pandas as pd
+import pytest
+
+from modules.models.config import ROLLUP_DATA
+from modules.models.exceptions import GranularityNotHandled
+from modules.models.rollups import (choose_granularity, compute_bucket_start,
+                                    compute_rollup, get_rollup_storage,
+                                    update_rollup, update_rollups)
+from modules.models.storage import get_storage
+
+
+@pytest.fixture
+def ohlc_rows():
+    return [
+        ['XXBTZEUR', 'XBT/EUR', 'XBT', 'EUR', '2022-12-31 00:00:00', 1672444800, 15400.0, 15500.1, 70.5],
+        ['XXBTZEUR', 'XBT/EUR', 'XBT', 'EUR', '2023-01-01 00:00:00', 1672531200, 15500.1, 15300.2, 80.5],
+        ['XXBTZEUR', 'XBT/EUR', 'XBT', 'EUR', '2023-01-02 00:00:00', 1672617600, 15300.2, 15800.0, 10.0],
+        ['XXBTZUSD', 'XBT/USD', 'XBT', 'USD', '2023-01-01 00:00:00', 1672531200, 16500.1, 16600.2, 120.5],
+        ['XXBTZUSD', 'XBT/USD', 'XBT', 'USD', '2023-01-02 00:00:00', 1672617600, 16600.2, 16650.3, 130.5]
+    ]
+
+
+@pytest.fixture(params=['csv', 'parquet'])
+def collection_settings(request, tmp_path):
+    extension = '.csv' if request.param == 'csv' else ''
+    return dict(
+        storage_backend=request.param,
+        storage_path=str(tmp_path / f'data{extension}'),
+        rollups_path=str(tmp_path / f'rollups{extension}')
+    )
+
+
+def sort_rollup(df):
+    return df.astype({'asset_pair': str}).sort_values(['asset_pair', 'tmsp']).reset_index(drop=True)
+
+
+class TestRollups:
+
+    def test_compute_bucket_start(self):
+        tmsp = [1672444800 + 3600, 1672531200, 1672617600 + 60]
+        assert list(compute_bucket_start(tmsp, 'daily')) == [1672444800, 1672531200, 1672617600]
+        assert list(compute_bucket_start(tmsp, 'weekly')) == [1672012800, 1672012800, 1672617600]
+        assert list(compute_bucket_start(tmsp, 'monthly')) == [1669852800, 1672531200, 1672531200]
+
+    def test_compute_bucket_start_unknown_granularity(self):
+        with pytest.raises(GranularityNotHandled):
+            compute_bucket_start([1672531200], 'hourly')
+
+    def test_choose_granularity(self):
+        assert choose_granularity(span_in_seconds=86400 * 10, min_points=100) is None
+        assert choose_granularity(span_in_seconds=86400 * 100, min_points=100) == 'daily'
+        assert choose_granularity(span_in_seconds=86400 * 7 * 100, min_points=100) == 'weekly'
+        assert choose_granularity(span_in_seconds=86400 * 30 * 100, min_points=100) == 'monthly'
+
+    def test_compute_rollup(self, ohlc_df):
+        rollup = sort_rollup(compute_rollup(df=ohlc_df, granularity='weekly'))
+        assert list(rollup.columns) == ROLLUP_DATA['schema']
+        assert list(rollup['asset_pair']) == ['XXBTZEUR', 'XXBTZEUR', 'XXBTZUSD', 'XXBTZUSD']
+        assert list(rollup['tmsp']) == [1672012800, 1672617600, 1672012800, 1672617600]
+        first = rollup.iloc[0]
+        assert (first['open_price'], first['close_price']) == (15400.0, 15300.2)
+        assert (first['min_body_price'], first['max_body_price']) == (15300.2, 15500.1)
+        assert first['volume'] == 151.0
+        assert str(first['time']) == '2022-12-26 00:00:00'
+
+    def test_compute_rollup_empty(self, ohlc_df):
+        rollup = compute_rollup(df=ohlc_df.iloc[:0], granularity='daily')
+        assert rollup.empty
+        assert list(rollup.columns) == ROLLUP_DATA['schema']
+
+    def test_update_rollup_full_rebuild(self, collection_settings, ohlc_df):
+        raw_storage = get_storage(
+            path=collection_settings['storage_path'], backend=collection_settings['storage_backend']
+        )
+        raw_storage.write(ohlc_df)
+        rollup_storage = get_rollup_storage(collection_settings=collection_settings, granularity='monthly')
+        update_rollup(raw_storage=raw_storage, rollup_storage=rollup_storage, granularity='monthly',
+                      new_data_df=ohlc_df.iloc[-1:])
+        rollup = sort_rollup(rollup_storage.read())
+        assert list(rollup['tmsp']) == [1669852800, 1672531200, 1672531200]
+        assert list(rollup['volume']) == [70.5, 90.5, 251.0]
+
+    def test_update_rollup_touched_buckets(self, collection_settings, ohlc_df):
+        raw_storage = get_storage(
+            path=collection_settings['storage_path'], backend=collection_settings['storage_backend']
+        )
+        rollup_storage = get_rollup_storage(collection_settings=collection_settings, granularity='daily')
+        raw_storage.write(ohlc_df.iloc[[0, 1, 3]])
+        update_rollup(raw_storage=raw_storage, rollup_storage=rollup_storage, granularity='daily')
+
+        new_data_df = ohlc_df.iloc[[2, 4]]
+        raw_storage.append(new_data_df)
+        updated = update_rollup(
+            raw_storage=raw_storage, rollup_storage=rollup_storage, granularity='daily', new_data_df=new_data_df
+        )
+        assert len(updated) == 2
+        assert set(updated['tmsp']) == {1672617600}
+        pd.testing.assert_frame_equal(
+            sort_rollup(rollup_storage.read()),
+            sort_rollup(compute_rollup(df=ohlc_df, granularity='daily'))
+        )
+
+    def test_update_rollups_reads_raw_data_once(self, collection_settings, ohlc_df, monkeypatch):
+        raw_storage = get_storage(
+            path=collection_settings['storage_path'], backend=collection_settings['storage_backend']
+        )
+        rollup_storages = {
+            granularity: get_rollup_storage(collection_settings=collection_settings, granularity=granularity)
+            for granularity in ROLLUP_DATA['granularities']
+        }
+        raw_storage.write(ohlc_df.iloc[[0, 1, 3]])
+        update_rollups(raw_storage=raw_storage, rollup_storages=rollup_storages)
+
+        reads, writes = [], []
+        read = raw_storage.read
+        monkeypatch.setattr(raw_storage, 'read', lambda **kwargs: reads.append(kwargs) or read(**kwargs))
+        for rollup_storage in rollup_storages.values():
+            monkeypatch.setattr(rollup_storage, 'write', writes.append)
+        new_data_df = ohlc_df.iloc[[2, 4]]
+        raw_storage.upsert(new_data_df)
+        updated = update_rollups(raw_storage=raw_storage, rollup_storages=rollup_storages, new_data_df=new_data_df)
+
+        assert reads == [{'asset_pairs': ['XXBTZEUR', 'XXBTZUSD'], 'start_tmsp': 1672531200}]
+        assert not writes
+        assert {granularity: len(rollup_df) for granularity, rollup_df in updated.items()} == \
+            {'daily': 2, 'weekly': 2, 'monthly': 2}
+        for granularity, rollup_storage in rollup_storages.items():
+            pd.testing.assert_frame_equal(
+                sort_rollup(rollup_storage.read()),
+                sort_rollup(compute_rollup(df=ohlc_df, granularity=granularity))
+            )
+
+    def test_get_rollup_storage(self, collection_settings):
+        storage = get_rollup_storage(collection_settings=collection_settings, granularity='weekly')
+        assert 'rollups_weekly' in storage.path
+        assert storage.ohlc_data_settings == ROLLUP_DATA
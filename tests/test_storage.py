@@ -0,0 +1,217 @@
+"""Tests for storage backends"""
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from modules.models import storage as storage_module
+from modules.models.config import OHLC_DATA
+from modules.models.exceptions import (NoExistingFile,
+                                       StorageBackendNotHandled,
+                                       UnexpectedSchemaError)
+from modules.models.storage import (CsvStorage, ParquetStorage, get_storage,
+                                    merge_last_write_wins, tmsp_to_month)
+from modules.models.utils import apply_dtypes
+
+
+def sort_ohlc(df):
+    return apply_dtypes(
+        df=df.astype({'asset_pair': str}).sort_values(['asset_pair', 'tmsp']).reset_index(drop=True),
+        dtypes=OHLC_DATA['dtypes']
+    )
+
+
+class TestStorage:
+
+    def test_get_storage(self, tmp_path):
+        assert isinstance(get_storage(path='data.csv'), CsvStorage)
+        assert isinstance(get_storage(path='data', backend='parquet'), ParquetStorage)
+        with pytest.raises(StorageBackendNotHandled):
+            get_storage(path='data', backend='foo')
+
+    def test_tmsp_to_month(self):
+        assert list(tmsp_to_month([1672444800, 1672531200])) == ['2022-12', '2023-01']
+
+    def test_read_no_existing_data(self, storage):
+        with pytest.raises(NoExistingFile):
+            storage.read()
+
+    def test_write_then_read(self, storage, ohlc_df):
+        storage.write(ohlc_df)
+        assert_frame_equal(sort_ohlc(storage.read()), ohlc_df)
+
+    def test_append(self, storage, ohlc_df):
+        storage.append(ohlc_df.iloc[:2])
+        storage.append(ohlc_df.iloc[2:])
+        assert_frame_equal(sort_ohlc(storage.read()), ohlc_df)
+
+    def test_write_overwrites(self, storage, ohlc_df):
+        storage.write(ohlc_df)
+        storage.write(ohlc_df.iloc[2:])
+        assert len(storage.read()) == 2
+
+    def test_read_filters(self, storage, ohlc_df):
+        storage.write(ohlc_df)
+        df = storage.read(
+            columns=['asset_pair', 'tmsp'],
+            asset_pairs=['XXBTZUSD'],
+            start_tmsp=1672531200,
+            end_tmsp=1672531200
+        )
+        assert list(df.columns) == ['asset_pair', 'tmsp']
+        assert df.astype({'asset_pair': str}).values.tolist() == [['XXBTZUSD', 1672531200]]
+
+    def test_csv_unexpected_schema(self, tmp_path):
+        path = str(tmp_path / 'data.csv')
+        pd.DataFrame({'foo': [1]}).to_csv(path, index=False)
+        with pytest.raises(UnexpectedSchemaError):
+            CsvStorage(path=path).read()
+
+    def test_parquet_layout(self, tmp_path, ohlc_df):
+        ParquetStorage(path=str(tmp_path / 'data')).write(ohlc_df)
+        assert sorted(p.relative_to(tmp_path / 'data').parent.as_posix() for p in (tmp_path / 'data').rglob('*.parquet')) == [
+            'asset_pair=XXBTZEUR/month=2022-12',
+            'asset_pair=XXBTZEUR/month=2023-01',
+            'asset_pair=XXBTZUSD/month=2023-01'
+        ]
+
+    def test_compact(self, storage, ohlc_df):
+        storage.append(ohlc_df.iloc[:1])
+        storage.append(ohlc_df.iloc[1:3])
+        storage.append(ohlc_df.iloc[3:])
+        storage.compact()
+        assert_frame_equal(sort_ohlc(storage.read()), ohlc_df)
+
+    def test_compact_same_second_appends(self, storage, ohlc_df, monkeypatch):
+        monkeypatch.setattr(storage_module, 'SEGMENT_CLOCK', storage_module.SegmentClock())
+        monkeypatch.setattr(storage_module.time, 'time_ns', lambda: 1672531200 * 10 ** 9)
+        for close_price in range(1, 21):
+            storage.append(ohlc_df.iloc[:1].assign(close_price=float(close_price)))
+            storage.append(ohlc_df.iloc[:1].assign(close_price=float(close_price) + .5))
+            storage.compact()
+            assert list(storage.read()['close_price']) == [close_price + .5]
+
+    def test_csv_append_writes_segments(self, tmp_path, ohlc_df):
+        storage = CsvStorage(path=str(tmp_path / 'data.csv'))
+        storage.write(ohlc_df.iloc[:2])
+        storage.append(ohlc_df.iloc[2:3])
+        storage.append(ohlc_df.iloc[3:])
+
+        segments = storage.read_manifest()['segments']
+        assert [segment['rows'] for segment in segments] == [1, 1]
+        assert len(pd.read_csv(storage.path)) == 2
+
+        storage.compact()
+        assert storage.read_manifest() == {'segments': [], 'history_max_tmsp': 1672617600}
+        assert sorted(p.name for p in tmp_path.iterdir()) == ['data.csv', 'data.manifest.json']
+        assert len(pd.read_csv(storage.path)) == 4
+
+    def test_parquet_compact_one_file_per_partition(self, tmp_path, ohlc_df):
+        storage = ParquetStorage(path=str(tmp_path / 'data'))
+        storage.append(ohlc_df.iloc[:2])
+        storage.append(ohlc_df.iloc[1:])
+        assert len(list((tmp_path / 'data').rglob('*.parquet'))) == 4
+
+        storage.compact()
+        assert len(list((tmp_path / 'data').rglob('*.parquet'))) == 3
+        assert_frame_equal(sort_ohlc(storage.read()), ohlc_df)
+
+    def test_read_typed_columns(self, storage, ohlc_df):
+        storage.write(ohlc_df)
+        df = storage.read()
+        assert {c: str(t) for c, t in df.dtypes.items()} == OHLC_DATA['dtypes']
+
+    def test_read_currency_filter(self, storage, ohlc_df):
+        storage.write(ohlc_df)
+        df = storage.read(columns=['tmsp', 'close_price'], currencies=['EUR'])
+        assert list(df.columns) == ['tmsp', 'close_price']
+        assert sorted(df.tmsp) == [1672444800, 1672531200]
+
+    def test_read_no_matching_rows(self, storage, ohlc_df):
+        storage.write(ohlc_df)
+        df = storage.read(asset_pairs=['FOO'])
+        assert df.empty
+        assert list(df.columns) == OHLC_DATA['schema']
+
+    def test_iter_chunks(self, storage, ohlc_df):
+        storage.write(ohlc_df.iloc[:3])
+        storage.append(ohlc_df.iloc[3:])
+        chunks = list(storage.iter_chunks(chunksize=1, columns=['asset_pair', 'tmsp'], currencies=['USD']))
+        assert all(len(chunk) == 1 for chunk in chunks)
+        assert sorted(pd.concat(chunks).tmsp) == [1672531200, 1672617600]
+
+    def test_merge_last_write_wins(self, ohlc_df):
+        updated_df = ohlc_df.iloc[[1, 2]].assign(volume=[1., 2.])
+        merged = merge_last_write_wins(frames=[ohlc_df, updated_df], keys=['asset_pair', 'tmsp'])
+        assert list(merged.asset_pair.astype(str)) == ['XXBTZEUR', 'XXBTZEUR', 'XXBTZUSD', 'XXBTZUSD']
+        assert list(merged.tmsp) == [1672444800, 1672531200, 1672531200, 1672617600]
+        assert list(merged.volume) == [70.5, 1., 2., 130.5]
+
+    def test_upsert(self, storage, ohlc_df):
+        storage.write(ohlc_df.iloc[:3])
+        storage.upsert(ohlc_df.iloc[[1, 2]].assign(volume=[1., 2.]))
+        storage.upsert(ohlc_df.iloc[[2, 3]].assign(volume=[3., 4.]))
+        df = sort_ohlc(storage.read())
+        assert list(df.tmsp) == list(ohlc_df.tmsp)
+        assert list(df.volume) == [70.5, 1., 3., 4.]
+
+    def test_upsert_no_existing_data(self, storage, ohlc_df):
+        storage.upsert(ohlc_df)
+        assert_frame_equal(sort_ohlc(storage.read()), ohlc_df)
+
+    def test_csv_upsert_only_writes_new_data(self, tmp_path, ohlc_df):
+        storage = CsvStorage(path=str(tmp_path / 'data.csv'))
+        storage.write(ohlc_df.iloc[:2])
+        history_bytes = storage.bytes_written
+
+        storage.upsert(ohlc_df.iloc[[1]].assign(volume=1.))
+        assert len(pd.read_csv(storage.path)) == 2  # the history is not rewritten
+        assert storage.bytes_written - history_bytes < history_bytes
+        assert list(sort_ohlc(storage.read()).volume) == [70.5, 1.]
+
+        storage.upsert(ohlc_df.iloc[[1, 2]].assign(volume=2.))  # merged with the previous segment (not bigger)
+        segments = storage.read_manifest()['segments']
+        assert [(segment['rows'], segment['min_tmsp']) for segment in segments] == [(2, 1672531200)]
+        storage.upsert(ohlc_df.iloc[[3]])
+        assert [segment['rows'] for segment in storage.read_manifest()['segments']] == [2, 1]
+        storage.upsert(ohlc_df.iloc[[0]].assign(volume=3.))
+        assert [segment['rows'] for segment in storage.read_manifest()['segments']] == [4]
+        assert len(list(tmp_path.glob('data.*.csv'))) == 1
+
+        assert list(sort_ohlc(storage.read()).volume) == [3., 2., 2., 130.5]
+        chunks = list(storage.iter_chunks(chunksize=1))
+        assert sorted(len(chunk) for chunk in chunks) == [1, 1, 1, 1]
+        storage.compact()
+        assert list(sort_ohlc(storage.read()).volume) == [3., 2., 2., 130.5]
+
+    def test_csv_read_skips_files_out_of_range(self, tmp_path, ohlc_df, monkeypatch):
+        storage = CsvStorage(path=str(tmp_path / 'data.csv'))
+        storage.write(ohlc_df.iloc[:1])
+        storage.append(ohlc_df.iloc[1:3])
+        storage.append(ohlc_df.iloc[3:])
+        read_paths = []
+        read_csv_as_df = storage_module.read_csv_as_df
+        monkeypatch.setattr(storage_module, 'read_csv_as_df', lambda path, **kwargs: (
+            read_paths.append((path, kwargs.get('nrows'))) or read_csv_as_df(path=path, **kwargs)
+        ))
+
+        df = storage.read(start_tmsp=1672617600)
+        assert list(df.tmsp) == [1672617600]
+        segment_path = storage.read_manifest()['segments'][1]['path']
+        assert {path for path, nrows in read_paths if nrows is None} == {segment_path}
+
+    def test_parquet_upsert_one_file_per_partition(self, tmp_path, ohlc_df):
+        storage = ParquetStorage(path=str(tmp_path / 'data'))
+        storage.append(ohlc_df.iloc[:2])
+        storage.append(ohlc_df.iloc[1:2])
+        storage.upsert(ohlc_df.iloc[1:])
+        assert len(list((tmp_path / 'data').rglob('*.parquet'))) == 3
+        assert_frame_equal(sort_ohlc(storage.read()), ohlc_df)
+
+    def test_bytes_written(self, storage, ohlc_df):
+        assert storage.bytes_written == 0
+        storage.write(ohlc_df.iloc[:2])
+        written = storage.bytes_written
+        assert written > 0
+        storage.upsert(ohlc_df.iloc[2:])
+        assert storage.bytes_written > written
@@ -0,0 +1,174 @@
+"""Tests for streaming ingestion from the WebSocket feed of Kraken"""
+
+import asyncio
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+from aiohttp import WSMsgType, web
+from aiohttp.test_utils import TestServer
+
+from modules.models.collect_data import KrakenDataCollector
+from modules.models.config import OHLC_DATA
+from modules.models.storage import get_storage
+from modules.models.stream_data import OHLCStreamer
+from modules.models.utils import apply_dtypes, read_json
+
+
+def ohlc_message(wsname, update_tmsp, end_tmsp, close_price):
+    return [
+        42,
+        [f'{update_tmsp}.123456', f'{end_tmsp}.000000', '100.0', '110.0', '90.0', str(close_price), '100.0', '1.5', 3],
+        'ohlc-1',
+        wsname
+    ]
+
+
+@pytest.fixture
+def recorded_messages():
+    """Messages of the feed: the candle of 00:00 is updated twice and closed, the one of 00:01 is in progress."""
+    return [
+        {'connectionID': 1, 'event': 'systemStatus', 'status': 'online', 'version': '1.9.1'},
+        {'channelName': 'ohlc-1', 'event': 'subscriptionStatus', 'pair': 'XBT/EUR', 'status': 'subscribed'},
+        ohlc_message('XBT/EUR', 1672531205, 1672531260, 101.),
+        ohlc_message('XBT/USD', 1672531207, 1672531260, 201.),
+        {'event': 'heartbeat'},
+        ohlc_message('XBT/EUR', 1672531230, 1672531260, 102.),
+        ohlc_message('XBT/EUR', 1672531262, 1672531320, 103.),
+        ohlc_message('XBT/EUR', 1672531200, 1672531260, 99.),  # late update of a closed candle, ignored
+        ohlc_message('DOGE/EUR', 1672531263, 1672531320, 1.)  # not targeted
+    ]
+
+
+@pytest.fixture
+def collector(tmp_path):
+    kdc = KrakenDataCollector(
+        collection_settings=dict(
+            query_period_in_minutes='1',
+            storage_path=str(tmp_path / 'data.csv'),
+            watermarks_path=str(tmp_path / 'watermarks.json'),
+            summary_path=str(tmp_path / 'summary.json')
+        ),
+        kraken_client=MagicMock()
+    )
+    kdc.assets = {
+        'XXBTZEUR': {'wsname': 'XBT/EUR', 'asset': 'XBT', 'currency': 'EUR'},
+        'XXBTZUSD': {'wsname': 'XBT/USD', 'asset': 'XBT', 'currency': 'USD'}
+    }
+    return kdc
+
+
+def run_against_fake_feed(streamer, connections, duration_in_seconds):
+    """Replay recorded messages to each connection of the streamer (then close it), and stream for a while."""
+    subscriptions = []
+
+    async def handle(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        msg = await ws.receive()
+        assert msg.type == WSMsgType.TEXT
+        subscriptions.append(msg.json())
+        for message in connections[min(len(subscriptions), len(connections)) - 1]:
+            await ws.send_json(message)
+        if len(subscriptions) < len(connections):
+            await ws.close()
+        else:
+            await asyncio.sleep(duration_in_seconds)
+        return ws
+
+    async def stream():
+        app = web.Application()
+        app.router.add_get('/', handle)
+        async with TestServer(app) as server:
+            streamer.stream_settings['ws_url'] = str(server.make_url('/'))
+            await streamer.stream(duration_in_seconds=duration_in_seconds)
+
+    asyncio.run(stream())
+    return subscriptions
+
+
+class TestOHLCStreamer:
+
+    def test_handle_message(self, collector, recorded_messages):
+        streamer = OHLCStreamer(collector=collector, storage=MagicMock())
+        for message in recorded_messages:
+            streamer.handle_message(message)
+
+        assert streamer.open_candles == {
+            'XXBTZEUR': [1672531260, '100.0', '110.0', '90.0', '103.0', '100.0', '1.5', 3],
+            'XXBTZUSD': [1672531200, '100.0', '110.0', '90.0', '201.0', '100.0', '1.5', 3]
+        }
+        df = streamer.take_batch()
+        assert list(zip(df.asset_pair, df.tmsp, df.close_price)) == [
+            ('XXBTZEUR', 1672531200, 102.), ('XXBTZEUR', 1672531260, 103.), ('XXBTZUSD', 1672531200, 201.)
+        ]
+        assert not streamer.updated
+        assert len(streamer.closed_candles) == 0
+
+    def test_stream_flushes_micro_batches(self, collector, recorded_messages):
+        storage = get_storage(path=collector.collection_settings['storage_path'])
+        streamer = OHLCStreamer(collector=collector, storage=storage, stream_settings={'flush_interval_in_seconds': 0.1})
+
+        subscriptions = run_against_fake_feed(streamer, connections=[recorded_messages], duration_in_seconds=0.5)
+
+        assert subscriptions == [{
+            'event': 'subscribe',
+            'pair': ['XBT/EUR', 'XBT/USD'],
+            'subscription': {'name': 'ohlc', 'interval': 1}
+        }]
+        df = storage.read()
+        assert list(zip(df.asset_pair, df.tmsp, df.close_price)) == [
+            ('XXBTZEUR', 1672531200, 102.), ('XXBTZEUR', 1672531260, 103.), ('XXBTZUSD', 1672531200, 201.)
+        ]
+        assert read_json(collector.collection_settings['watermarks_path']) == {
+            'XXBTZEUR': 1672531260, 'XXBTZUSD': 1672531200
+        }
+        assert read_json(collector.collection_settings['summary_path'])['rows'] == 3
+        counters = {counter['name']: counter['value'] for counter in collector.metrics.report()['counters']}
+        assert counters['stream_messages'] == len(recorded_messages)
+
+    def test_stream_reconnects(self, collector, recorded_messages):
+        storage = get_storage(path=collector.collection_settings['storage_path'])
+        streamer = OHLCStreamer(
+            collector=collector,
+            storage=storage,
+            stream_settings={'flush_interval_in_seconds': 0.1},
+            client_settings={'backoff_base_in_seconds': 0.01, 'backoff_max_in_seconds': 0.01}
+        )
+
+        subscriptions = run_against_fake_feed(
+            streamer,
+            connections=[recorded_messages[:4], [ohlc_message('XBT/USD', 1672531265, 1672531320, 202.)]],
+            duration_in_seconds=0.5
+        )
+
+        assert len(subscriptions) == 2
+        df = storage.read()
+        assert list(zip(df.asset_pair, df.tmsp, df.close_price)) == [
+            ('XXBTZEUR', 1672531200, 101.), ('XXBTZUSD', 1672531200, 201.), ('XXBTZUSD', 1672531260, 202.)
+        ]
+
+    def test_flush_only_writes_micro_batch(self, collector, recorded_messages):
+        storage = get_storage(path=collector.collection_settings['storage_path'])
+        history_df = apply_dtypes(
+            df=pd.DataFrame(
+                [
+                    ['XXBTZEUR', 'XBT/EUR', 'XBT', 'EUR', pd.Timestamp(tmsp, unit='s'), tmsp, 1., 2., 3.]
+                    for tmsp in range(1672531200 - 60 * 5000, 1672531200, 60)
+                ],
+                columns=OHLC_DATA['schema']
+            ),
+            dtypes=OHLC_DATA['dtypes']
+        )
+        storage.write(history_df)
+        history_bytes = storage.bytes_written
+        streamer = OHLCStreamer(collector=collector, storage=storage)
+        for message in recorded_messages:
+            streamer.handle_message(message)
+            asyncio.run(streamer.flush_updates())
+
+        assert storage.bytes_written - history_bytes < history_bytes / 10
+        assert len(pd.read_csv(storage.path)) == 5000
+        assert len(storage.read()) == 5003
+        counters = {counter['name']: counter['value'] for counter in collector.metrics.report()['counters']}
+        assert counters['stream_bytes_written'] == storage.bytes_written - history_bytes
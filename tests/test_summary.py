@@ -0,0 +1,65 @@
+"""Tests for the summary of stored data"""
+
+import pytest
+
+from modules.models.exceptions import NoExistingFile
+from modules.models.storage import get_storage
+from modules.models.summary import (merge_asset_pair_summaries, summarize,
+                                    summarize_storage, update_summary)
+
+
+@pytest.fixture
+def ohlc_rows():
+    return [
+        ['XXBTZEUR', 'XBT/EUR', 'XBT', 'EUR', '2022-12-31 00:00:00', 1672444800, 15400.0, 15500.1, 70.5],
+        ['XXBTZEUR', 'XBT/EUR', 'XBT', 'EUR', '2023-01-01 00:00:00', 1672531200, 15500.1, 15600.2, 80.5],
+        ['XXBTZUSD', 'XBT/USD', 'XBT', 'USD', '2023-01-01 00:00:00', 1672531200, 16500.1, 16600.2, 120.5],
+        ['XETHZUSD', 'ETH/USD', 'ETH', 'USD', '2023-01-02 00:00:00', 1672617600, 1200.2, 1210.3, 130.5]
+    ]
+
+
+class TestSummary:
+
+    def test_summarize(self, ohlc_df):
+        summary = summarize(ohlc_df)
+        assert summary['XXBTZEUR'] == {
+            'asset': 'XBT', 'currency': 'EUR', 'rows': 2, 'min_tmsp': 1672444800, 'max_tmsp': 1672531200
+        }
+        assert set(summary) == {'XXBTZEUR', 'XXBTZUSD', 'XETHZUSD'}
+
+    def test_summarize_empty(self, ohlc_df):
+        assert summarize(ohlc_df.iloc[:0]) == {}
+
+    def test_merge_asset_pair_summaries(self, ohlc_df):
+        merged = merge_asset_pair_summaries(summarize(ohlc_df.iloc[:1]), summarize(ohlc_df.iloc[1:]))
+        assert merged == summarize(ohlc_df)
+
+    def test_update_summary(self, ohlc_df):
+        summary = update_summary(
+            summary={'asset_pairs': summarize(ohlc_df.iloc[:2])},
+            new_data_df=ohlc_df.iloc[2:]
+        )
+        assert summary['asset_pairs'] == summarize(ohlc_df)
+        assert summary['assets'] == ['ETH', 'XBT']
+        assert summary['rows'] == 4
+        assert (summary['min_tmsp'], summary['max_tmsp']) == (1672444800, 1672617600)
+        assert 'last_run' in summary
+
+    def test_update_summary_replaced_rows_not_counted(self, ohlc_df):
+        summary = update_summary(
+            summary={'asset_pairs': summarize(ohlc_df.iloc[:2])},
+            new_data_df=ohlc_df.iloc[1:]
+        )
+        assert summary['asset_pairs'] == summarize(ohlc_df)
+        assert summary['rows'] == 4
+
+    @pytest.mark.parametrize('backend', ['csv', 'parquet'])
+    def test_summarize_storage(self, tmp_path, ohlc_df, backend):
+        storage = get_storage(path=str(tmp_path / ('data.csv' if backend == 'csv' else 'data')), backend=backend)
+        with pytest.raises(NoExistingFile):
+            summarize_storage(storage=storage)
+        storage.write(ohlc_df.iloc[:3])
+        storage.append(ohlc_df.iloc[3:])
+        summary = summarize_storage(storage=storage, chunksize=1)
+        assert summary['asset_pairs'] == summarize(ohlc_df)
+        assert summary['rows'] == 4
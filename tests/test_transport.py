@@ -0,0 +1,74 @@
+"""Tests for pooled HTTP sessions"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from modules.assets_mapping.update_assets_mapping import AssetMappingUpdater
+from modules.models.collect_data import KrakenDataCollector
+from modules.models.metrics import MetricsRegistry
+from modules.models.transport import PooledHTTPAdapter, build_session
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/slow':
+            time.sleep(0.5)
+        body = self.headers.get('Accept-Encoding', '').encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+class TestBuildSession:
+
+    def test_connections_reused(self, server_url):
+        metrics = MetricsRegistry()
+        session = build_session(pool_size=2, metrics=metrics)
+        responses = [session.get(f'{server_url}/') for _ in range(5)]
+
+        assert responses[0].text == 'gzip, deflate'
+        assert session.get_adapter(server_url).connection_stats() == {
+            'requests': 5, 'connections_opened': 1, 'reused': 4
+        }
+        counters = {counter['name']: counter['value'] for counter in metrics.report()['counters']}
+        assert counters == {'http_requests': 5, 'http_connections_opened': 1}
+
+    def test_default_timeout(self, server_url):
+        session = build_session(pool_size=1, transport_settings={'read_timeout_in_seconds': 0.1})
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            session.get(f'{server_url}/slow')
+        assert session.get(f'{server_url}/slow', timeout=2).status_code == 200
+
+    def test_collector_session_matches_workers(self):
+        kdc = KrakenDataCollector(collection_settings={'max_workers': '6'})
+        adapter = kdc.kraken_client.kraken_client.session.get_adapter('https://api.kraken.com')
+        assert isinstance(adapter, PooledHTTPAdapter)
+        assert adapter._pool_maxsize == 6
+        assert kdc.kraken_client.kraken_client.session.headers['User-Agent'].startswith('krakenex/')
+
+    def test_asset_mapping_updater_session(self, server_url):
+        updater = AssetMappingUpdater(url=f'{server_url}/')
+        updater.get_html()
+        updater.get_html()
+        assert updater.html == 'gzip, deflate'
+        assert updater.session.get_adapter(server_url).connection_stats()['reused'] == 1
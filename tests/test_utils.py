@@ -7,10 +7,12 @@ import pytest
 from pandas.testing import assert_frame_equal
 
 from modules.models.exceptions import (AccessDataframeFieldFailure,
-                                       FileTypeNotHandled,
+                                       FileTypeNotHandled, NoExistingFile,
                                        NotConsistentDataForDataframe)
 from modules.models.utils import (build_df_from_schema_and_data,
-                                  compute_max_for_given_filter, read_csv_as_df)
+                                  compute_max_by_group,
+                                  compute_max_for_given_filter, read_csv_as_df,
+                                  read_json, suffix_path, write_json)
 
 
 class TestReadCsv:
@@ -21,6 +23,30 @@ class TestReadCsv:
         with pytest.raises(FileTypeNotHandled):
             read_csv_as_df(path=path)
 
+    def test_path_does_not_exist(self, tmp_path):
+        with pytest.raises(NoExistingFile):
+            read_csv_as_df(path=str(tmp_path / 'data.csv'))
+
+    def test_read_csv_projection_and_dtypes(self, tmp_path):
+        path = str(tmp_path / 'data.csv')
+        pd.DataFrame(
+            {"foo": ["a", "b", "a"], "bar": ["2023-01-01 00:00:00"] * 3, "baz": [1, 2, 3]}
+        ).to_csv(path, index=False)
+
+        df = read_csv_as_df(
+            path=path,
+            columns=["foo", "bar"],
+            dtypes={"foo": "category", "bar": "datetime64[ns]", "baz": "float64"}
+        )
+        assert list(df.columns) == ["foo", "bar"]
+        assert str(df.foo.dtype) == "category"
+        assert str(df.bar.dtype).startswith("datetime64")
+
+    def test_read_csv_chunks(self, tmp_path):
+        path = str(tmp_path / 'data.csv')
+        pd.DataFrame({"foo": range(5)}).to_csv(path, index=False)
+        assert [len(chunk) for chunk in read_csv_as_df(path=path, chunksize=2)] == [2, 2, 1]
+
 
 class TestBuildDf:
 
@@ -88,3 +114,47 @@ class TestMaxComputationWithFilter:
                 filter_field="bars",
                 filter_value="baz"
             )
+
+
+class TestMaxComputationByGroup:
+
+    def test_compute_max_by_group(self):
+        df = pd.DataFrame(
+            {
+                "foo": [100, 101, 7, 3],
+                "bar": ["baz", "baz", "qux", "qux"]
+            }
+        )
+        assert compute_max_by_group(df=df, maxed_field="foo", group_field="bar") == {"baz": 101, "qux": 7}
+
+    def test_compute_max_by_group_empty(self):
+        df = pd.DataFrame(columns=["foo", "bar"])
+        assert compute_max_by_group(df=df, maxed_field="foo", group_field="bar") == {}
+
+    def test_compute_max_by_group_field_fail(self, dataframe):
+        with pytest.raises(AccessDataframeFieldFailure):
+            compute_max_by_group(df=dataframe, maxed_field="foo", group_field="bars")
+
+
+class TestJson:
+
+    def test_write_then_read_json(self, tmp_path):
+        path = str(tmp_path / "file.json")
+        write_json(data={"foo": 1}, path=path)
+        assert read_json(path=path) == {"foo": 1}
+
+    def test_read_json_no_file(self, tmp_path):
+        with pytest.raises(NoExistingFile):
+            read_json(path=str(tmp_path / "file.json"))
+
+
+class TestSuffixPath:
+
+    def test_suffix_path_file(self):
+        assert suffix_path(path='s3://foo/data.csv', suffix='_60m') == 's3://foo/data_60m.csv'
+
+    def test_suffix_path_directory(self):
+        assert suffix_path(path='s3://foo/data/', suffix='_60m') == 's3://foo/data_60m'
+
+    def test_suffix_path_relative(self):
+        assert suffix_path(path='data.csv', suffix='_60m') == 'data_60m.csv'